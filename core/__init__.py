@@ -12,8 +12,85 @@ def create_app():
         MAIL_USE_TLS=True,
         MAIL_USERNAME='seu@email.com',
         MAIL_PASSWORD='suasenha',
+        MAIL_DEFAULT_SENDER='seu@email.com',
+        MAIL_BACKEND='smtp',       # smtp, arquivo (.eml em MAIL_FILE_DIR) ou console
+        MAIL_FILE_DIR=None,        # padrão: <instance>/emails
+        MAIL_BATCH_SIZE=20,        # mensagens por conexão SMTP
+        MAIL_MAX_RETRIES=5,
+        MAIL_RETRY_BACKOFF=2,      # segundos; dobra a cada nova tentativa
+        MAIL_QUEUE_MAX=1000,
         UPLOAD_FOLDER='static/uploads',
-        MAX_CONTENT_LENGTH=16 * 1024 * 1024  # 16MB
+        MAX_CONTENT_LENGTH=16 * 1024 * 1024,  # 16MB
+
+        # Banco de dados e pool de conexões
+        DB_HOST='localhost',
+        DB_USER='root',
+        DB_PASSWORD='',
+        DB_NAME='habitta',
+        DB_POOL_SIZE=5,            # conexões mantidas abertas
+        DB_POOL_MAX_OVERFLOW=10,   # conexões extras em picos
+        DB_POOL_RECYCLE=3600,      # idade máxima (s) de uma conexão
+        DB_POOL_TIMEOUT=30,        # espera máxima (s) por uma conexão livre
+
+        # Instrumentação de queries
+        DB_INSTRUMENTATION=True,
+        DB_SLOW_QUERY_MS=200,      # acima disso a query vai para o log de lentas
+        DB_QUERY_BUDGETS={},       # {'blueprint.endpoint': máximo de queries}
+
+        # Caches em memória verificam versoes_dados no máximo a cada N segundos
+        MATCHING_REFRESH_SECONDS=5,
+
+        # Totais das listagens paginadas ficam em cache por N segundos (?total=exato ignora)
+        PAGINATION_COUNT_TTL=60,
+        SELECAO_POR_PAGINA=24,  # candidatos por página na seleção manual de imóveis
+
+        # Exportações CSV saem em streaming; gzip só se o cliente aceitar
+        EXPORT_CSV_GZIP=False,
+        # XLSX é montado em memória até este tamanho e depois vai para o disco
+        EXPORT_SPOOL_MAX_BYTES=8 * 1024 * 1024,
+        # Exportações em segundo plano (core/services/export_jobs.py)
+        EXPORT_WORKERS=2,
+        EXPORT_DIR=None,           # padrão: <instance>/exports
+        EXPORT_TTL_SECONDS=3600,   # validade dos arquivos gerados
+
+        # Usuários ficam em cache por N segundos (invalidados nas escritas em usuarios)
+        USER_CACHE_TTL=300,
+        # Totais do dashboard (invalidados nas escritas deste worker)
+        DASHBOARD_STATS_TTL=30,
+        # Gráficos do dashboard leem rollup_diario (core/services/rollups.py)
+        ROLLUP_REFRESH_SECONDS=300,  # idade máxima antes de refazer os dias recentes
+        ROLLUP_JANELA_DIAS=2,        # dias refeitos (hoje e ontem)
+        CHART_MAX_DIAS=365,
+        # Resultados do autocomplete da busca ficam em cache por N segundos
+        BUSCA_AUTOCOMPLETE_TTL=30,
+
+        # Ranking das recomendações geradas (core/services/ranking.py)
+        RECOMENDACAO_TOP_K=20,
+        RECOMENDACAO_LOTE_TAMANHO=500,  # clientes por transação no lote (flask recomendacoes gerar)
+        RECOMENDACAO_PESOS={
+            "faixa": 0.4,    # renda dentro da faixa do imóvel
+            "centro": 0.2,   # renda perto do centro da faixa
+            "valor": 0.1,    # valor médio perto da renda
+            "bairro": 0.3,   # bairro de interesse (vizinho vale PESO_VIZINHO)
+        },
+        RECOMENDACAO_PESO_VIZINHO=0.5,
+        # bairro -> bairros vizinhos (simétrico); vazio: só o bairro de interesse
+        RECOMENDACAO_BAIRROS_VIZINHOS={},
+
+        # Senhas: custo do bcrypt e pool que limita hashes simultâneos
+        BCRYPT_LOG_ROUNDS=12,      # custo de novos hashes (rehash no login se menor)
+        BCRYPT_MAX_ROUNDS=14,      # hashes acima disso também são refeitos
+        BCRYPT_WORKERS=2,          # hashes executando ao mesmo tempo
+        BCRYPT_QUEUE_TIMEOUT=5,    # espera máxima (s) por uma vaga no pool
+
+        # Limite de tentativas de login/recuperação: tipo -> (tentativas, janela em s)
+        THROTTLE_ENABLED=True,
+        THROTTLE_LIMITS={
+            "cpf": (5, 300),
+            "email": (3, 900),
+            "ip": (20, 60),
+        },
+        THROTTLE_MAX_KEYS=10000,   # chaves mantidas por limitador
     )
     
     # Inicializa extensões
@@ -26,6 +103,8 @@ def create_app():
         clientes,
         estabelecimentos,
         recomendacoes,
+        exportacoes,
+        busca,
         main
     )
     
@@ -35,5 +114,23 @@ def create_app():
     app.register_blueprint(clientes.clientes_bp)
     app.register_blueprint(estabelecimentos.estabelecimentos_bp)
     app.register_blueprint(recomendacoes.recomendacoes_bp)
+    app.register_blueprint(exportacoes.exportacoes_bp)
+    app.register_blueprint(busca.busca_bp)
+
+    # Exportações em segundo plano
+    from .services import export_jobs
+    export_jobs.init_app(app)
+
+    # Atualização das recomendações afetadas por escritas em estabelecimentos
+    from .services import recomendacoes_lote
+    recomendacoes_lote.init_app(app)
+
+    # Tipos e bairros dos formulários (globais do Jinja)
+    from .services import referencias
+    referencias.init_app(app)
+
+    # Comandos de linha (flask ...)
+    from . import cli
+    cli.init_app(app)
     
     return app
\ No newline at end of file
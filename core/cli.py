@@ -0,0 +1,80 @@
+import time
+
+import click
+from flask.cli import AppGroup
+
+from core.utils.db_connection import pooled_connection
+
+estatisticas_cli = AppGroup("estatisticas", help="Tabelas de resumo pré-calculadas")
+recomendacoes_cli = AppGroup("recomendacoes", help="Recomendações em lote")
+
+
+@estatisticas_cli.command("reconstruir")
+def reconstruir_estatisticas():
+    """Recalcula client_offer_stats para todos os clientes"""
+    from core.services import client_stats
+
+    inicio = time.perf_counter()
+    with pooled_connection() as conn:
+        total, sem_ofertas = client_stats.reconstruir(conn)
+    click.echo(
+        f"{total} clientes recalculados ({sem_ofertas} sem ofertas) "
+        f"em {time.perf_counter() - inicio:.1f}s"
+    )
+
+
+@estatisticas_cli.command("rollups")
+@click.option("--dias", type=int, default=None, help="Dias recentes a refazer (padrão: ROLLUP_JANELA_DIAS)")
+@click.option("--tudo", is_flag=True, help="Refaz o histórico inteiro")
+def atualizar_rollups(dias, tudo):
+    """Recalcula as contagens diárias dos gráficos do dashboard"""
+    from flask import current_app
+    from core.services import rollups
+
+    inicio = time.perf_counter()
+    with pooled_connection() as conn:
+        if tudo:
+            rollups.atualizar(conn)
+        else:
+            rollups.atualizar_recentes(conn, dias or current_app.config["ROLLUP_JANELA_DIAS"])
+    click.echo(f"Contagens diárias atualizadas em {time.perf_counter() - inicio:.1f}s")
+
+
+@recomendacoes_cli.command("gerar")
+@click.option("--tamanho", type=int, default=None, help="Clientes por bloco (padrão: RECOMENDACAO_LOTE_TAMANHO)")
+@click.option("--k", type=int, default=None, help="Imóveis por recomendação (padrão: RECOMENDACAO_TOP_K)")
+@click.option("--novo", is_flag=True, help="Começa um lote novo em vez de retomar o interrompido")
+def gerar_recomendacoes(tamanho, k, novo):
+    """Gera recomendações para todos os clientes ativos"""
+    from core.services import recomendacoes_lote
+
+    def progresso(lote):
+        click.echo(
+            f"  até o cliente {lote['ultimo_cliente_id']}: "
+            f"{lote['clientes_processados']} clientes, {lote['recomendacoes_criadas']} recomendações"
+        )
+
+    try:
+        resumo = recomendacoes_lote.executar(tamanho=tamanho, k=k, novo=novo, progresso=progresso)
+    except recomendacoes_lote.LoteEmExecucao:
+        raise click.ClickException("Já existe um lote de recomendações em execução")
+    click.echo(
+        f"Lote {resumo['lote_id']}: {resumo['recomendacoes']} recomendações para "
+        f"{resumo['clientes']} clientes em {resumo['segundos']}s "
+        f"({resumo['clientes_por_segundo']} clientes/s)"
+    )
+
+
+@recomendacoes_cli.command("pendentes")
+def atualizar_pendentes():
+    """Atualiza as recomendações dos clientes afetados por mudanças em imóveis"""
+    from core.services import recomendacoes_lote
+
+    inicio = time.perf_counter()
+    total = recomendacoes_lote.atualizar_pendentes()
+    click.echo(f"{total} clientes atualizados em {time.perf_counter() - inicio:.1f}s")
+
+
+def init_app(app):
+    app.cli.add_command(estatisticas_cli)
+    app.cli.add_command(recomendacoes_cli)
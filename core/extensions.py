@@ -14,6 +14,13 @@ def init_app(app):
     login_manager.login_view = 'auth.tela_login'
     
     # Configurações adicionais
-    from core.utils import logging, file_handlers
+    from core.utils import (
+        logging, file_handlers, db_connection, db_instrumentation, senhas, throttle, mail_queue
+    )
+    db_connection.init_app(app)
+    db_instrumentation.init_app(app)
+    senhas.init_app(app)
+    throttle.init_app(app)
+    mail_queue.init_app(app)
     logging.configure_logging(app)
     file_handlers.configure_avatar_handler(app)
\ No newline at end of file
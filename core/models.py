@@ -1,7 +1,13 @@
+from flask import current_app
 from flask_login import UserMixin
 from core.extensions import login_manager
+from core.utils.cache import TTLCache
 from core.utils.db_connection import get_db_connection
 
+# Usuários carregados por id; evita um SELECT em usuarios a cada requisição
+usuarios_cache = TTLCache(maxsize=1024)
+
+
 class User(UserMixin):
     def __init__(self, id, nome, email, cpf, nivel, avatar=None):
         self.id = id
@@ -10,29 +16,39 @@ class User(UserMixin):
         self.cpf = cpf
         self.nivel = nivel
         self.avatar = avatar
-        
+
+
+def invalidar_usuario(user_id):
+    """Chamar após qualquer escrita em usuarios"""
+    usuarios_cache.pop(int(user_id))
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
     try:
-        cursor.execute(
-            "SELECT id, nome, email, cpf, nivel FROM usuarios WHERE id = %s", 
-            (user_id,)
-        )
-        user_data = cursor.fetchone()
-        
-        if user_data:
-            return User(
-                id=user_data["id"],
-                nome=user_data["nome"],
-                email=user_data["email"],
-                cpf=user_data["cpf"],
-                nivel=user_data["nivel"]
-            )
+        user_id = int(user_id)
+    except (TypeError, ValueError):
         return None
-        
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+    user = usuarios_cache.get(user_id)
+    if user is not None:
+        return user
+
+    cursor = get_db_connection().cursor(dictionary=True)
+    cursor.execute(
+        "SELECT id, nome, email, cpf, nivel, avatar FROM usuarios WHERE id = %s", 
+        (user_id,)
+    )
+    user_data = cursor.fetchone()
+    
+    if user_data:
+        user = User(
+            id=user_data["id"],
+            nome=user_data["nome"],
+            email=user_data["email"],
+            cpf=user_data["cpf"],
+            nivel=user_data["nivel"],
+            avatar=user_data["avatar"]
+        )
+        usuarios_cache.set(user_id, user, current_app.config["USER_CACHE_TTL"])
+        return user
+    return None
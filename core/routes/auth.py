@@ -1,12 +1,15 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required
-from core.extensions import bcrypt, mail
+from flask_mail import Message
 from core.utils.db_connection import get_db_connection
-from core.models import User
+from core.utils import mail_queue, senhas, throttle
+from core.utils.throttle import limitar_tentativas
+from core.models import User, invalidar_usuario
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route("/tela/login", methods=["GET", "POST"])
+@limitar_tentativas("pages/auth/login.html", campos=("cpf",))
 def tela_login():
     if request.method == "POST":
         cpf = request.form.get("cpf", "").replace(".", "").replace("-", "")
@@ -37,7 +40,19 @@ def tela_login():
             )
             user_data = cursor.fetchone()
 
-            if user_data and bcrypt.check_password_hash(user_data["senha"], senha):
+            if user_data and senhas.verificar(user_data["senha"], senha):
+                # Custo fora do alvo atual: refaz o hash com a senha em mãos
+                if senhas.precisa_rehash(user_data["senha"]):
+                    try:
+                        cursor.execute(
+                            "UPDATE usuarios SET senha = %s WHERE id = %s",
+                            (senhas.gerar_hash(senha), user_data["id"]),
+                        )
+                        conn.commit()
+                        invalidar_usuario(user_data["id"])
+                    except senhas.HashingSobrecarregado:
+                        pass  # fica para o próximo login
+
                 user = User(
                     id=user_data["id"],
                     nome=user_data["nome"],
@@ -48,6 +63,7 @@ def tela_login():
                 )
 
                 login_user(user, remember=lembrar)
+                throttle.resetar("cpf", cpf)
                 flash("Login realizado com sucesso!", "success")
 
                 # Redireciona para página inicial ou URL armazenada
@@ -55,11 +71,10 @@ def tela_login():
                 return redirect(next_page or url_for("main.index"))
             else:
                 flash("CPF ou senha incorretos", "danger")
+        except senhas.HashingSobrecarregado:
+            flash("Servidor ocupado. Tente novamente em instantes.", "warning")
         except Exception as e:
             flash("Erro ao processar login: " + str(e), "danger")
-        finally:
-            cursor.close()
-            conn.close()
 
     return render_template("pages/auth/login.html")
 
@@ -102,7 +117,7 @@ def register():
                 return redirect(url_for('auth.register'))
 
             # Criar hash da senha
-            senha_hash = bcrypt.generate_password_hash(senha).decode('utf-8')
+            senha_hash = senhas.gerar_hash(senha)
 
             # Inserir novo usuário
             cursor.execute(
@@ -122,16 +137,11 @@ def register():
             print(f'Erro no registro: {str(e)}')
             flash('Erro durante o registro', 'danger')
             return redirect(url_for('auth.register'))
-            
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
 
     return render_template('pages/auth/register.html')
 
 @auth_bp.route("/recuperar-senha", methods=["GET", "POST"])
+@limitar_tentativas("pages/auth/forgot-password.html", campos=("email",))
 def recuperar_senha():
     if request.method == "POST":
         email = request.form.get("email", "").strip().lower()
@@ -180,19 +190,17 @@ def recuperar_senha():
             Caso não tenha solicitado esta redefinição, ignore este e-mail.
             """
 
-            mail.send(msg)
+            mail_queue.enfileirar(msg)
             flash("Um e-mail com instruções foi enviado!", "success")
 
         except Exception as e:
             print(f"Erro ao processar recuperação: {str(e)}")
             flash("Erro ao processar sua solicitação", "danger")
-        finally:
-            cursor.close()
-            conn.close()
 
     return render_template("pages/auth/forgot-password.html")
 
 @auth_bp.route("/redefinir-senha/<token>", methods=["GET", "POST"])
+@limitar_tentativas("pages/auth/forgot-password.html")
 def redefinir_senha(token):
     # Implementação da lógica para redefinir a senha
     # Verificar token válido e permitir nova senha
@@ -0,0 +1,34 @@
+from flask import Blueprint, request, jsonify, url_for
+from flask_login import login_required
+from core.utils.db_connection import get_db_connection
+from core.services import busca
+
+busca_bp = Blueprint("busca", __name__, url_prefix="/search")
+
+
+def _com_url(resultados):
+    for resultado in resultados:
+        if resultado["tipo"] == "cliente":
+            resultado["url"] = url_for("recomendacoes.cliente", cliente_id=resultado["id"], modo="ver")
+        else:
+            resultado["url"] = url_for("estabelecimentos.listar", busca=resultado["texto"])
+    return resultados
+
+
+@busca_bp.route("/")
+@login_required
+def buscar():
+    """Clientes e imóveis que casam com ?q=, ordenados por relevância"""
+    limite = max(1, min(request.args.get("limite", 50, type=int) or 50, 100))
+    cursor = get_db_connection().cursor(dictionary=True)
+    return jsonify(_com_url(busca.buscar(cursor, request.args.get("q", ""), limite)))
+
+
+@busca_bp.route("/autocomplete")
+@login_required
+def autocomplete():
+    limite = max(1, min(request.args.get("limite", 8, type=int) or 8, 20))
+    cursor = get_db_connection().cursor(dictionary=True)
+    resultados = busca.autocomplete(cursor, request.args.get("q", ""), limite)
+    # Cópias: o cache guarda a lista sem as URLs
+    return jsonify(_com_url([dict(r) for r in resultados]))
@@ -6,15 +6,14 @@ from flask import (
     url_for,
     flash,
     jsonify,
-    make_response,
 )
 from flask_login import login_required, current_user
 from core.utils.db_connection import get_db_connection
 from core.utils.decorators import nivel_requerido
-import csv
+from core.utils.versioning import bump_version, get_version
+from core.services import busca as busca_textual, client_stats, dashboard_stats, exports, indice_clientes, intervalos
+from core.utils import datatables, pagination
 import traceback
-from io import StringIO, BytesIO
-import openpyxl
 
 clientes_bp = Blueprint("clientes", __name__, url_prefix="/clientes")
 
@@ -24,13 +23,19 @@ def get_redirect_url():
     return url_for("clientes.listar")
 
 
+def invalidar_clientes():
+    """Caches do worker após o commit de uma escrita em clientes"""
+    pagination.invalidar_contagens("clientes")
+    client_stats.invalidar()
+    busca_textual.invalidar()
+    dashboard_stats.invalidar()
+
+
 @clientes_bp.route("/cadastrar", methods=["GET", "POST"])
 @login_required
 @nivel_requerido("comum")
 def cadastrar():
     if request.method == "POST":
-        conn = None
-        cursor = None
         try:
             dados = {
                 "nome": request.form.get("nome", "").strip(),
@@ -75,8 +80,18 @@ def cadastrar():
                     dados["interesse_bairro"],
                 ),
             )
+            cliente_id = cursor.lastrowid
+            client_stats.recalcular_clientes(conn, [cliente_id])
+            bump_version(cursor, "clientes", "client_offer_stats")
+            versao = get_version(cursor, "clientes")
 
             conn.commit()
+            indice_clientes.registrar(
+                cliente_id,
+                (dados["interesse_tipo"], dados["interesse_bairro"], dados["renda_mensal"]),
+                versao,
+            )
+            invalidar_clientes()
             flash("Cliente cadastrado com sucesso!", "success")
             return redirect(get_redirect_url())
 
@@ -85,12 +100,6 @@ def cadastrar():
             flash("Erro ao processar cadastro", "danger")
             return redirect(get_redirect_url())
 
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
     return render_template(
         "pages/clientes/cadastrar.html", usuario=current_user, active_page='clientes', cliente={})
 
@@ -101,78 +110,22 @@ def cadastrar():
 def listar():
     filtro = request.args.get("filtro", "todos")  # Mudei de status_filtro para filtro
     busca = request.args.get("busca", "").strip()
-    page = int(request.args.get("page", 1))
-    per_page = 10
-
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    # Query base
-    query = """
-        SELECT 
-            id, nome, renda_mensal, telefone, email, 
-            interesse_tipo, interesse_bairro, status
-        FROM clientes
-        WHERE 1=1
-    """
-    params = []
-
-    # Filtro por busca (nome)
-    if busca:
-        query += " AND nome LIKE %s "
-        params.append(f"%{busca}%")
-
-    # Filtro por status - AGORA USANDO 'filtro'
-    if filtro == "ativo":
-        query += " AND status = 'ativo' "
-    elif filtro == "concluido":
-        query += " AND status = 'concluido' "
-    elif filtro == "inativo":
-        query += " AND status = 'inativo' "
-
-    # Ordenação
-    query += " ORDER BY nome ASC "
-
-    # Query para contar total de registros (sem paginação)
-    count_query = f"SELECT COUNT(*) AS total FROM clientes WHERE 1=1"
-    count_params = []
-
-    if busca:
-        count_query += " AND nome LIKE %s "
-        count_params.append(f"%{busca}%")
-
-    if filtro == "ativo":
-        count_query += " AND status = 'ativo' "
-    elif filtro == "concluido":
-        count_query += " AND status = 'concluido' "
-    elif filtro == "inativo":
-        count_query += " AND status = 'inativo' "
-
-    # Aplicar paginação na query principal
-    query += " LIMIT %s OFFSET %s"
-    params.extend([per_page, (page - 1) * per_page])
-
-    # Executar query principal
-    cursor.execute(query, params)
-    clientes = cursor.fetchall()
-    
-    # Executar query de contagem
-    cursor.execute(count_query, count_params)
-    total = cursor.fetchone()["total"]
-
-    # Contar totais por status para o resumo
-    cursor.execute("""
-        SELECT
-            COUNT(*) AS total,
-            SUM(CASE WHEN status = 'ativo' THEN 1 ELSE 0 END) AS ativos,
-            SUM(CASE WHEN status = 'concluido' THEN 1 ELSE 0 END) AS concluidos,
-            SUM(CASE WHEN status = 'inativo' THEN 1 ELSE 0 END) AS inativos
-        FROM clientes
-    """)
-    resumo = cursor.fetchone()
-
-    cursor.close()
-    conn.close()
+
+    # As linhas vêm de clientes.dados (DataTables server-side); aqui só o resumo
+    def contar_resumo():
+        cursor = get_db_connection().cursor(dictionary=True)
+        cursor.execute("""
+            SELECT
+                COUNT(*) AS total,
+                SUM(CASE WHEN status = 'ativo' THEN 1 ELSE 0 END) AS ativos,
+                SUM(CASE WHEN status = 'concluido' THEN 1 ELSE 0 END) AS concluidos,
+                SUM(CASE WHEN status = 'inativo' THEN 1 ELSE 0 END) AS inativos
+            FROM clientes
+        """)
+        return cursor.fetchone()
+
+    # Contar totais por status para o resumo (em cache, invalidado nas escritas)
+    resumo = pagination.contagens.get_or_set(("clientes", "resumo"), contar_resumo)
 
     return render_template(
         "pages/clientes/listar.html", 
@@ -180,12 +133,46 @@ def listar():
         active_page='clientes',
         filtro=filtro,  # Agora usando filtro
         busca=busca, 
-        clientes=clientes,
-        page=page,
-        per_page=per_page,
-        total=total,
         resumo=resumo
-    )  
+    )
+
+
+@clientes_bp.route("/dados")
+@login_required
+@nivel_requerido("comum")
+def dados():
+    """Página da tabela de clientes no formato server-side do DataTables"""
+    filtro = request.args.get("filtro", "todos")
+    where, params = [], []
+    if filtro in ("ativo", "concluido", "inativo"):
+        where.append("status = %s")
+        params.append(filtro)
+    elif filtro == "sem_faixa":
+        # Renda fora de todas as faixas de preço (índice de intervalos em memória)
+        condicao, condicao_params = intervalos.condicao_sem_faixa(get_db_connection())
+        where.append(condicao)
+        params.extend(condicao_params)
+
+    cursor = get_db_connection().cursor(dictionary=True)
+    return jsonify(
+        datatables.responder(
+            cursor,
+            request.args,
+            "clientes",
+            colunas=["t.id", "t.nome", "t.interesse_tipo", "t.interesse_bairro", "t.renda_mensal"],
+            ordenaveis={
+                "nome": "nome",
+                "interesse_tipo": "interesse_tipo",
+                "interesse_bairro": "interesse_bairro",
+                "renda_mensal": "renda_mensal",
+            },
+            where=where,
+            params=params,
+            buscar=lambda termo: busca_textual.condicao("clientes", None, termo),
+        )
+    )
+
+
 @clientes_bp.route("/<int:id>/modal")
 def ver_modal(id):
     try:
@@ -202,9 +189,6 @@ def ver_modal(id):
     except Exception as e:
         return f"<div class='alert alert-danger'>Erro: {str(e)}</div>", 500
 
-    finally:
-        cursor.close()
-        conn.close()
 
 
 @clientes_bp.route("/editar/<int:id>/modal")
@@ -223,9 +207,6 @@ def editar_modal(id):
     except Exception as e:
         return f"<div class='alert alert-danger'>Erro: {str(e)}</div>", 500
 
-    finally:
-        cursor.close()
-        conn.close()
         
 @clientes_bp.route("/editar/<int:id>", methods=["POST"])
 def atualizar(id):
@@ -267,7 +248,14 @@ def atualizar(id):
                 id,
             ),
         )
+        client_stats.recalcular_clientes(conn, [id])
+        bump_version(cursor, "clientes", "client_offer_stats")
+        versao = get_version(cursor, "clientes")
         conn.commit()
+        indice_clientes.registrar(
+            id, (dados["interesse_tipo"], dados["interesse_bairro"], dados["renda_mensal"]), versao
+        )
+        invalidar_clientes()
 
         return jsonify(
             {
@@ -283,11 +271,6 @@ def atualizar(id):
             500,
         )
 
-    finally:
-        if "cursor" in locals():
-            cursor.close()
-        if "conn" in locals():
-            conn.close()
 
 
 
@@ -297,8 +280,13 @@ def excluir(id):
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        cursor.execute("DELETE FROM client_offer_stats WHERE cliente_id = %s", (id,))
         cursor.execute("DELETE FROM clientes WHERE id = %s", (id,))
+        bump_version(cursor, "clientes", "client_offer_stats")
+        versao = get_version(cursor, "clientes")
         conn.commit()
+        indice_clientes.registrar(id, None, versao)
+        invalidar_clientes()
 
         flash("Cliente excluído com sucesso!", "success")
         return jsonify(
@@ -312,91 +300,16 @@ def excluir(id):
         print(f"Erro ao excluir: {str(e)}")
         return jsonify({"success": False, "message": "Erro ao excluir cliente"}), 500
 
-    finally:
-        if "cursor" in locals():
-            cursor.close()
-        if "conn" in locals():
-            conn.close()
 
 
 @clientes_bp.route("/exportar/<formato>")
 def exportar(formato):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(
-        "SELECT nome, renda_mensal, telefone, email, interesse_tipo, interesse_bairro FROM clientes"
-    )
-    dados = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    exportacao = exports.clientes()
 
     if formato == "csv":
-        si = StringIO()
-        cw = csv.writer(si)
-        cw.writerow(
-            [
-                "Nome",
-                "Renda Mensal (R$)",
-                "Telefone",
-                "Email",
-                "Tipo interesse",
-                "Bairro interesse",
-            ]
-        )
-
-        for est in dados:
-            cw.writerow(
-                [
-                    est["nome"],
-                    est["renda_mensal"],
-                    est["telefone"],
-                    est["email"],
-                    est["interesse_tipo"],
-                    est["interesse_bairro"],
-                ]
-            )
-
-        output = make_response(si.getvalue())
-        output.headers["Content-type"] = "text/csv"
-        output.headers["Content-Disposition"] = "attachment; filename=clientes.csv"
-        return output
+        return exports.resposta_csv(exportacao)
 
     elif formato == "excel":
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Clientes"
-        ws.append(
-            [
-                "Nome",
-                "Renda Mensal (R$)",
-                "Telefone",
-                "Email",
-                "Tipo interesse",
-                "Bairro interesse",
-            ]
-        )
-
-        for est in dados:
-            ws.append(
-                [
-                    est["nome"],
-                    est["renda_mensal"],
-                    est["telefone"],
-                    est["email"],
-                    est["interesse_tipo"],
-                    est["interesse_bairro"],
-                ]
-            )
-
-        virtual_workbook = BytesIO()
-        wb.save(virtual_workbook)
-        virtual_workbook.seek(0)
-
-        output = make_response(virtual_workbook.read())
-        output.headers["Content-type"] = (
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        output.headers["Content-Disposition"] = "attachment; filename=clientes.xlsx"
-        return output
+        return exports.resposta_xlsx(exportacao)
 
     return redirect(get_redirect_url())
@@ -6,14 +6,13 @@ from flask import (
     url_for,
     flash,
     jsonify,
-    make_response,
 )
 from flask_login import login_required, current_user
 from core.utils.db_connection import get_db_connection
 from core.utils.decorators import nivel_requerido
-import csv
-from io import StringIO, BytesIO
-import openpyxl
+from core.utils.versioning import bump_version
+from core.services import busca, matching, client_stats, dashboard_stats, exports, intervalos, recomendacoes_lote, referencias
+from core.utils import datatables, pagination
 
 estabelecimentos_bp = Blueprint(
     "estabelecimentos", __name__, url_prefix="/estabelecimentos"
@@ -25,26 +24,60 @@ def get_redirect_url():
     return url_for("estabelecimentos.listar")
 
 
+def invalidar_estabelecimentos(afetados=(), faixa_nova=None):
+    """Caches do worker após o commit de uma escrita em estabelecimentos.
+
+    ``faixa_nova`` (faixa_min, faixa_max) de uma inclusão é fundida no índice de
+    faixas sem recarregá-lo; ``afetados`` são os clientes enfileirados por
+    ``recomendacoes_lote.atualizar_afetados``.
+    """
+    matching.invalidar()
+    referencias.invalidar()
+    if faixa_nova is not None:
+        intervalos.adicionar(*faixa_nova)
+    else:
+        intervalos.invalidar()
+    pagination.invalidar_contagens("estabelecimentos")
+    busca.invalidar()
+    dashboard_stats.invalidar()
+    if afetados:
+        client_stats.invalidar()
+        recomendacoes_lote.agendar_pendentes()
+
+
 @estabelecimentos_bp.route("/listar")
 @login_required
 @nivel_requerido("comum")
 def listar():
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute(
-        "SELECT id, nome, tipo, bairro, faixa_min, faixa_max FROM estabelecimentos"
-    )
-    estabelecimentos = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
-
+    # As linhas vêm de estabelecimentos.dados (DataTables server-side)
     return render_template(
         "pages/estabelecimentos/listar.html",
         usuario=current_user,
         active_page="estabelecimentos",
-        estabelecimentos=estabelecimentos,
+        busca=request.args.get("busca", "").strip(),
+    )
+
+
+@estabelecimentos_bp.route("/dados")
+@login_required
+@nivel_requerido("comum")
+def dados():
+    """Página da tabela de estabelecimentos no formato server-side do DataTables"""
+    cursor = get_db_connection().cursor(dictionary=True)
+    return jsonify(
+        datatables.responder(
+            cursor,
+            request.args,
+            "estabelecimentos",
+            colunas=["t.id", "t.nome", "t.tipo", "t.bairro", "t.faixa_min", "t.faixa_max"],
+            ordenaveis={
+                "nome": "nome",
+                "tipo": "tipo",
+                "bairro": "bairro",
+                "faixa_min": "faixa_min",
+            },
+            buscar=lambda termo: busca.condicao("estabelecimentos", None, termo),
+        )
     )
 
 
@@ -52,17 +85,12 @@ def listar():
 @login_required
 @nivel_requerido("comum")
 def novo():
-    conn = None
-    cursor = None
-    
     try:
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         
-        # Buscar TODOS os tipos da tabela de tipos
-        cursor.execute("SELECT nome FROM tipos_estabelecimento ORDER BY nome")
-        tipos = [row['nome'] for row in cursor.fetchall()]
-        
+        # Os tipos do formulário vêm do cache de referências (tipos_estabelecimento() no template)
+
         if request.method == "POST":
             try:
                 # Obter e validar dados
@@ -73,8 +101,7 @@ def novo():
                         "pages/estabelecimentos/novo.html",
                         usuario=current_user,
                         active_page="estabelecimentos",
-                        estabelecimento=request.form,
-                        tipos=tipos
+                        estabelecimento=request.form
                     )
 
                 tipo = request.form.get("tipo", "")
@@ -89,14 +116,16 @@ def novo():
                         "pages/estabelecimentos/novo.html",
                         usuario=current_user,
                         active_page="estabelecimentos",
-                        estabelecimento=request.form,
-                        tipos=tipos
+                        estabelecimento=request.form
                     )
 
                 contato_nome = request.form.get("contato_nome", "").strip()
                 contato_telefone = request.form.get("contato_telefone", "").strip()
                 observacoes = request.form.get("observacoes", "").strip()
 
+                # Motor com o estado confirmado, lido antes da escrita
+                engine = matching.get_engine(conn, verificar=True)
+
                 cursor.execute(
                     """
                     INSERT INTO estabelecimentos 
@@ -116,8 +145,15 @@ def novo():
                         observacoes,
                     ),
                 )
+                afetados = recomendacoes_lote.atualizar_afetados(
+                    conn, cursor, None, (tipo, bairro, faixa_min, faixa_max, valor_medio), engine
+                )
 
+                bump_version(cursor, "estabelecimentos")
+                if afetados:
+                    bump_version(cursor, "client_offer_stats")
                 conn.commit()
+                invalidar_estabelecimentos(afetados, faixa_nova=(faixa_min, faixa_max))
                 flash("Estabelecimento salvo com sucesso!", "success")
                 return redirect(get_redirect_url())
 
@@ -128,27 +164,19 @@ def novo():
                     "pages/estabelecimentos/novo.html",
                     usuario=current_user,
                     active_page="estabelecimentos",
-                    estabelecimento=request.form,
-                    tipos=tipos
+                    estabelecimento=request.form
                 )
 
     except Exception as e:
         print(f"Erro de conexão: {str(e)}")
         flash("Erro de conexão com o banco de dados", "danger")
         return redirect(url_for("estabelecimentos.novo"))
-        
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
     return render_template(
         "pages/estabelecimentos/novo.html",
         usuario=current_user,
         active_page="estabelecimentos",
-        estabelecimento={},
-        tipos=tipos  # Passar os tipos para o template
+        estabelecimento={}
     )
 
 @estabelecimentos_bp.route("/excluir/<int:id>", methods=["POST"])
@@ -156,8 +184,15 @@ def excluir(id):
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        engine = matching.get_engine(conn, verificar=True)
+        antes = client_stats.buscar_estabelecimento(cursor, id)
         cursor.execute("DELETE FROM estabelecimentos WHERE id = %s", (id,))
+        afetados = recomendacoes_lote.atualizar_afetados(conn, cursor, antes, None, engine)
+        bump_version(cursor, "estabelecimentos")
+        if afetados:
+            bump_version(cursor, "client_offer_stats")
         conn.commit()
+        invalidar_estabelecimentos(afetados)
 
         flash("Estabelecimento excluído com sucesso!", "success")
         return jsonify(
@@ -174,11 +209,6 @@ def excluir(id):
             500,
         )
 
-    finally:
-        if "cursor" in locals():
-            cursor.close()
-        if "conn" in locals():
-            conn.close()
 
 
 @estabelecimentos_bp.route("/<int:id>/modal")
@@ -202,9 +232,6 @@ def ver_modal(id):
     except Exception as e:
         return f"<div class='alert alert-danger'>Erro: {str(e)}</div>", 500
 
-    finally:
-        cursor.close()
-        conn.close()
 
 
 @estabelecimentos_bp.route("/editar/<int:id>/modal")
@@ -228,9 +255,6 @@ def editar_modal(id):
     except Exception as e:
         return f"<div class='alert alert-danger'>Erro: {str(e)}</div>", 500
 
-    finally:
-        cursor.close()
-        conn.close()
 
 
 @estabelecimentos_bp.route("/editar/<int:id>", methods=["POST"])
@@ -256,6 +280,8 @@ def atualizar(id):
 
         conn = get_db_connection()
         cursor = conn.cursor()
+        engine = matching.get_engine(conn, verificar=True)
+        antes = client_stats.buscar_estabelecimento(cursor, id)
         cursor.execute(
             """
             UPDATE estabelecimentos 
@@ -277,7 +303,19 @@ def atualizar(id):
                 id,
             ),
         )
+        # Só os clientes que ganharam, perderam ou reordenaram o imóvel (índice reverso)
+        afetados = recomendacoes_lote.atualizar_afetados(
+            conn,
+            cursor,
+            antes,
+            (dados["tipo"], dados["bairro"], dados["faixa_min"], dados["faixa_max"], dados["valor_medio"]),
+            engine,
+        )
+        bump_version(cursor, "estabelecimentos")
+        if afetados:
+            bump_version(cursor, "client_offer_stats")
         conn.commit()
+        invalidar_estabelecimentos(afetados)
 
         return jsonify(
             {
@@ -293,77 +331,16 @@ def atualizar(id):
             500,
         )
 
-    finally:
-        if "cursor" in locals():
-            cursor.close()
-        if "conn" in locals():
-            conn.close()
 
 
 @estabelecimentos_bp.route("/exportar/<formato>")
 def exportar(formato):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(
-        "SELECT nome, tipo, bairro, faixa_min, faixa_max FROM estabelecimentos"
-    )
-    dados = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    exportacao = exports.estabelecimentos()
 
     if formato == "csv":
-        si = StringIO()
-        cw = csv.writer(si)
-        cw.writerow(
-            ["Nome", "Tipo", "Bairro", "Faixa Mínima (R$)", "Faixa Máxima (R$)"]
-        )
-
-        for est in dados:
-            cw.writerow(
-                [
-                    est["nome"],
-                    est["tipo"],
-                    est["bairro"],
-                    f"{est['faixa_min']:.2f}",
-                    f"{est['faixa_max']:.2f}",
-                ]
-            )
-
-        output = make_response(si.getvalue())
-        output.headers["Content-type"] = "text/csv"
-        output.headers["Content-Disposition"] = (
-            "attachment; filename=estabelecimentos.csv"
-        )
-        return output
+        return exports.resposta_csv(exportacao)
 
     elif formato == "excel":
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Estabelecimentos"
-        ws.append(["Nome", "Tipo", "Bairro", "Faixa Mínima (R$)", "Faixa Máxima (R$)"])
-
-        for est in dados:
-            ws.append(
-                [
-                    est["nome"],
-                    est["tipo"],
-                    est["bairro"],
-                    float(est["faixa_min"]),
-                    float(est["faixa_max"]),
-                ]
-            )
-
-        virtual_workbook = BytesIO()
-        wb.save(virtual_workbook)
-        virtual_workbook.seek(0)
-
-        output = make_response(virtual_workbook.read())
-        output.headers["Content-type"] = (
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        output.headers["Content-Disposition"] = (
-            "attachment; filename=estabelecimentos.xlsx"
-        )
-        return output
+        return exports.resposta_xlsx(exportacao)
 
     return redirect(get_redirect_url())
@@ -0,0 +1,54 @@
+from flask import Blueprint, request, jsonify, send_file, url_for, abort
+from flask_login import login_required
+from core.services import export_jobs
+
+exportacoes_bp = Blueprint("exportacoes", __name__, url_prefix="/exportacoes")
+
+
+def job_json(job):
+    dados = job.as_dict()
+    dados["status_url"] = url_for("exportacoes.status", job_id=job.id)
+    if job.status == "concluido":
+        dados["download_url"] = url_for("exportacoes.download", job_id=job.id)
+    return dados
+
+
+@exportacoes_bp.route("/<entidade>/<formato>", methods=["POST"])
+@login_required
+def submeter(entidade, formato):
+    """Agenda a exportação e devolve o job (202) ou o arquivo já pronto (200)"""
+    if entidade not in export_jobs.ENTIDADES or formato not in export_jobs.EXTENSOES:
+        abort(404)
+
+    filtros = {}
+    if entidade == "recomendacoes":
+        filtros = {
+            "filtro": request.values.get("filtro", "todos"),
+            "busca": request.values.get("busca", "").strip(),
+        }
+
+    job = export_jobs.submeter(entidade, formato, filtros)
+    return jsonify(job_json(job)), 200 if job.status == "concluido" else 202
+
+
+@exportacoes_bp.route("/<job_id>")
+@login_required
+def status(job_id):
+    job = export_jobs.get_jobs().status(job_id)
+    if job is None:
+        return jsonify({"status": "desconhecido"}), 404
+    return jsonify(job_json(job))
+
+
+@exportacoes_bp.route("/<job_id>/download")
+@login_required
+def download(job_id):
+    job = export_jobs.get_jobs().status(job_id)
+    if job is None or job.status != "concluido":
+        abort(404)
+    return send_file(
+        export_jobs.get_jobs().caminho(job.id, job.formato),
+        mimetype=export_jobs.MIMETYPES[job.formato],
+        as_attachment=True,
+        download_name=f"{job.entidade}.{export_jobs.EXTENSOES[job.formato]}",
+    )
@@ -1,6 +1,9 @@
-from flask import Blueprint, render_template, redirect, url_for
+from flask import Blueprint, render_template, redirect, url_for, jsonify, request, current_app, abort
 from flask_login import login_required, current_user
+from core.services import busca, dashboard_stats, referencias, rollups
 from core.utils.db_connection import get_db_connection
+import datetime
+import hashlib
 import logging
 
 # Configuração de logging
@@ -8,16 +11,6 @@ logger = logging.getLogger(__name__)
 
 main_bp = Blueprint('main', __name__)
 
-def get_total(cursor, query, params=None):
-    """Função auxiliar para obter um valor de contagem do banco de dados"""
-    try:
-        cursor.execute(query, params or ())
-        result = cursor.fetchone()
-        return result[0] if result else 0
-    except Exception as e:
-        logger.error(f"Erro ao executar query: {query}. Erro: {str(e)}")
-        return 0
-
 @main_bp.route('/')
 @login_required
 def index():
@@ -29,46 +22,116 @@ def index():
 @main_bp.route('/dashboard')
 @login_required
 def dashboard():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    """Só o esqueleto da página; cada card busca seu valor em main.widget"""
+    return render_template("dashboard.html", usuario=current_user, active_page='dashboard')
+
 
+@main_bp.route('/dashboard/widgets/<nome>')
+@login_required
+def widget(nome):
+    """Valor de um card do dashboard; uma falha afeta só o próprio card"""
+    if nome not in dashboard_stats.WIDGETS:
+        abort(404)
     try:
-        total_clientes = get_total(cursor, "SELECT COUNT(*) FROM clientes")
-        total_estabelecimentos_comercial = get_total(
-            cursor, "SELECT COUNT(*) FROM estabelecimentos WHERE tipo = 'comercial'"
-        )
-        total_estabelecimentos_residencial = get_total(
-            cursor, "SELECT COUNT(*) FROM estabelecimentos WHERE tipo = 'residencial'"
-        )
-        total_clientes_sem_ofertas = get_total(
-            cursor,
-            """
-            SELECT COUNT(*) FROM clientes c 
-            WHERE NOT EXISTS (
-                SELECT 1 FROM estabelecimentos e 
-                WHERE c.renda_mensal BETWEEN e.faixa_min AND e.faixa_max
-            )
-            """,
-        )
-
-        return render_template(
-            "dashboard.html",
-            usuario=current_user,
-            active_page='dashboard',
-            total_clientes=total_clientes,
-            total_estabelecimentos_comercial=total_estabelecimentos_comercial,
-            total_estabelecimentos_residencial=total_estabelecimentos_residencial,
-            total_clientes_sem_ofertas=total_clientes_sem_ofertas,
-        )       
-        
+        valor = dashboard_stats.obter(nome)
     except Exception as e:
-        logger.error(f"Erro na rota dashboard: {str(e)}")
-        # Em produção, você pode redirecionar para uma página de erro
-        return render_template("dashboard.html", 
-                            error="Erro ao carregar dados",
-                            active_page='dashboard')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
\ No newline at end of file
+        logger.error(f"Erro no widget {nome} do dashboard: {str(e)}")
+        return jsonify({"nome": nome, "erro": "Erro ao carregar dados"}), 503
+
+    response = jsonify({"nome": nome, "valor": valor})
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config["DASHBOARD_STATS_TTL"]
+    return response
+
+@main_bp.route('/status/caches')
+@login_required
+def status_caches():
+    """Acertos e erros dos caches em memória deste processo"""
+    from core.models import usuarios_cache
+    from core.utils.pagination import contagens
+    return jsonify({
+        "usuarios": usuarios_cache.stats(),
+        "contagens": contagens.stats(),
+        "dashboard": dashboard_stats.stats(),
+        "busca": busca.stats(),
+    })
+
+
+@main_bp.route('/referencias/tipos')
+@login_required
+def referencias_tipos():
+    """Tipos de estabelecimento para os selects dos formulários"""
+    return jsonify(referencias.tipos_estabelecimento())
+
+
+@main_bp.route('/referencias/bairros')
+@login_required
+def referencias_bairros():
+    """Bairros conhecidos; ?q= filtra por prefixo (autocomplete)"""
+    limite = max(1, min(request.args.get("limite", 20, type=int) or 20, 100))
+    return jsonify(referencias.bairros(request.args.get("q", "").strip(), limite))
+
+
+def _periodo():
+    """(desde, até) a partir de ?dias=N, limitado a CHART_MAX_DIAS"""
+    dias = request.args.get("dias", 30, type=int) or 30
+    dias = max(1, min(dias, current_app.config["CHART_MAX_DIAS"]))
+    ate = datetime.date.today()
+    return ate - datetime.timedelta(days=dias - 1), ate
+
+
+def _grafico(chave, calcular):
+    """Resposta JSON de um gráfico com ETag/Last-Modified da versão dos rollups.
+
+    Se as contagens estão velhas, os dias recentes são refeitos antes, a não
+    ser que outro pedido já esteja refazendo (ou a atualização falhe): aí
+    valem as contagens atuais. Um If-None-Match com a versão atual responde
+    304 sem ler ``rollup_diario``.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    versao, atualizado_em, idade = rollups.versao(cursor)
+    if idade is None or idade > current_app.config["ROLLUP_REFRESH_SECONDS"]:
+        try:
+            if rollups.atualizar_recentes(conn, current_app.config["ROLLUP_JANELA_DIAS"], espera=0):
+                versao, atualizado_em, idade = rollups.versao(cursor)
+        except Exception:
+            logger.exception("Falha ao atualizar rollup_diario; servindo as contagens atuais")
+
+    etag = hashlib.sha1(f"{chave}:{versao}".encode("utf-8")).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(calcular(cursor))
+    response.set_etag(etag)
+    response.last_modified = atualizado_em
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+@main_bp.route('/dashboard/graficos/diario')
+@login_required
+def grafico_diario():
+    """Novos clientes e novas recomendações por dia"""
+    desde, ate = _periodo()
+    return _grafico(
+        f"diario:{desde}:{ate}",
+        lambda cursor: rollups.serie_diaria(
+            cursor, ["novos_clientes", "novas_recomendacoes"], desde, ate
+        ),
+    )
+
+
+@main_bp.route('/dashboard/graficos/recomendacoes/<por>')
+@login_required
+def grafico_recomendacoes(por):
+    """Recomendações do período por status ou por tipo de estabelecimento"""
+    metrica = {"status": "recomendacoes_status", "tipo": "recomendacoes_tipo"}.get(por)
+    if metrica is None:
+        abort(404)
+    desde, ate = _periodo()
+    return _grafico(
+        f"{metrica}:{desde}:{ate}",
+        lambda cursor: rollups.distribuicao(cursor, metrica, desde, ate),
+    )
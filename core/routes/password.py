@@ -1,13 +1,15 @@
 from flask import Blueprint, request, redirect, url_for, flash, render_template
 from flask_mail import Message
-from core.extensions import mail
+from core.utils import mail_queue
 from core.utils.db_connection import get_db_connection
+from core.utils.throttle import limitar_tentativas
 import secrets
 import datetime
 
 password_bp = Blueprint('password', __name__)
 
 @password_bp.route('/recuperar-senha', methods=['GET', 'POST'])
+@limitar_tentativas('auth/forgot-password.html', campos=('email',))
 def recuperar_senha():
     if request.method == 'POST':
         email = request.form.get('email', '').strip().lower()
@@ -46,20 +48,18 @@ def recuperar_senha():
             
             Link expira em 1 hora.
             """
-            mail.send(msg)
+            mail_queue.enfileirar(msg)
             
             flash('Um e-mail com instruções foi enviado!', 'success')
 
         except Exception as e:
             print(f'Erro ao processar recuperação: {str(e)}')
             flash('Erro ao processar sua solicitação', 'danger')
-        finally:
-            cursor.close()
-            conn.close()
 
     return render_template('auth/forgot-password.html')
 
 @password_bp.route('/redefinir-senha/<token>', methods=['GET', 'POST'])
+@limitar_tentativas('auth/forgot-password.html')
 def redefinir_senha(token):
     # Implementação da redefinição de senha
     pass
\ No newline at end of file
@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify, url_for
 from flask_login import login_required, login_user, current_user
 from core.utils.db_connection import get_db_connection
-from core.extensions import bcrypt
-from core.models import User
+from core.utils import senhas
+from core.models import User, invalidar_usuario
 from core.utils.file_handlers import save_avatar, validate_image
 import os
 from werkzeug.utils import secure_filename
@@ -47,7 +47,6 @@ def atualizar_perfil():
             (cpf, current_user.id)
         )
         if cursor.fetchone():
-            conn.close()
             return jsonify({
                 "success": False,
                 "message": "Este CPF já está cadastrado para outro usuário."
@@ -69,18 +68,18 @@ def atualizar_perfil():
         }
 
         if senha:
-            update_fields["senha"] = bcrypt.generate_password_hash(senha).decode("utf-8")
+            update_fields["senha"] = senhas.gerar_hash(senha)
 
         # Monta e executa a query
         set_clause = ", ".join([f"{field} = %s" for field in update_fields.keys()])
         query = f"UPDATE usuarios SET {set_clause} WHERE id = %s"
         cursor.execute(query, tuple(update_fields.values()) + (current_user.id,))
         conn.commit()
+        invalidar_usuario(current_user.id)
 
         # Recarrega os dados do usuário
         cursor.execute("SELECT * FROM usuarios WHERE id = %s", (current_user.id,))
         updated_user_data = cursor.fetchone()
-        conn.close()
 
         if not updated_user_data:
             return jsonify({
@@ -115,10 +114,4 @@ def atualizar_perfil():
         return jsonify({
             "success": False,
             "message": "Erro ao atualizar perfil. Por favor, tente novamente."
-        }), 500
-
-    finally:
-        if "cursor" in locals():
-            cursor.close()
-        if "conn" in locals():
-            conn.close()
\ No newline at end of file
+        }), 500
\ No newline at end of file
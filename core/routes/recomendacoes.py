@@ -5,13 +5,16 @@ from flask import (
     redirect,
     url_for,
     flash,
-    make_response,
+    current_app,
+    jsonify,
 )
 from flask_login import login_required, current_user
 from core.utils.db_connection import get_db_connection
-import csv
-from io import StringIO, BytesIO
-import openpyxl
+from core.utils.db_instrumentation import query_budget
+from core.utils.decorators import nivel_requerido
+from core.services import busca as busca_textual, matching, ranking, client_stats, exports, recomendacoes_lote, selecao
+from core.utils import pagination
+from core.utils.versioning import bump_version
 
 # Cria o Blueprint com prefixo '/recomendacoes'
 recomendacoes_bp = Blueprint("recomendacoes", __name__)  # Nome do blueprint
@@ -20,6 +23,7 @@ recomendacoes_bp = Blueprint("recomendacoes", __name__)  # Nome do blueprint
 # Listar Recomendações (com paginação/filtro)
 @recomendacoes_bp.route("/listar")
 @login_required
+@query_budget(6)
 def listar():
     filtro = request.args.get("filtro", "todos")
     busca = request.args.get("busca", "").strip()
@@ -29,80 +33,64 @@ def listar():
     conn = get_db_connection()
     cursor = conn.cursor(dictionary=True)
 
-    query = """
-        SELECT 
-            c.id,
-            c.nome,
-            c.renda_mensal,
-            c.telefone,
-            c.email,
-            c.interesse_tipo,
-            c.interesse_bairro,
-            COUNT(DISTINCT r.id) AS total_recomendacoes,
-            COUNT(DISTINCT e.id) AS total_ofertas
-        FROM clientes c
-        LEFT JOIN recomendacoes r ON r.cliente_id = c.id
-        LEFT JOIN estabelecimentos e 
-            ON e.faixa_min <= c.renda_mensal
-            AND e.tipo = c.interesse_tipo
-            AND e.bairro = c.interesse_bairro
-    """
+    # Ofertas e recomendações vêm pré-calculadas em client_offer_stats
+    where = []
     params = []
 
     if busca:
-        query += " WHERE c.nome LIKE %s "
-        params.append(f"%{busca}%")
-
-    query += " GROUP BY c.id "
-
-    if filtro == "com":
-        query += " HAVING total_recomendacoes > 0 "
-    elif filtro == "sem":
-        query += " HAVING total_recomendacoes = 0 AND total_ofertas > 0 "
-    elif filtro == "sem_ofertas":
-        query += " HAVING total_ofertas = 0 "
-
-    query += " ORDER BY c.nome ASC "
-    count_query = f"SELECT COUNT(*) AS total FROM ({query}) AS subquery"
-    query += " LIMIT %s OFFSET %s"
-    params.extend([per_page, (page - 1) * per_page])
+        condicao_busca, params_busca = busca_textual.condicao("clientes", "c", busca)
+        where.append(condicao_busca)
+        params.extend(params_busca)
 
-    cursor.execute(query, params)
-    clientes = cursor.fetchall()
+    condicao = client_stats.condicao_filtro(filtro)
+    if condicao:
+        where.append(condicao)
 
-    cursor.execute(count_query, params[:-2])
-    total = cursor.fetchone()["total"]
+    base = """
+        FROM clientes c
+        JOIN client_offer_stats s ON s.cliente_id = c.id
+    """
 
-    cursor.execute(
+    pagina = pagination.paginar(
+        cursor,
         """
         SELECT
-            SUM(CASE WHEN total_recomendacoes > 0 THEN 1 ELSE 0 END) AS com_recomendacao,
-            SUM(CASE WHEN total_recomendacoes = 0 AND total_ofertas > 0 THEN 1 ELSE 0 END) AS sem_recomendacao,
-            SUM(CASE WHEN total_ofertas = 0 THEN 1 ELSE 0 END) AS sem_ofertas,
-            COUNT(*) AS total
-        FROM (
-            SELECT 
-                c.id,
-                COUNT(DISTINCT r.id) AS total_recomendacoes,
-                COUNT(DISTINCT e.id) AS total_ofertas
-            FROM clientes c
-            LEFT JOIN recomendacoes r ON r.cliente_id = c.id
-            LEFT JOIN estabelecimentos e 
-                ON e.faixa_min <= c.renda_mensal
-                AND e.tipo = c.interesse_tipo
-                AND e.bairro = c.interesse_bairro
-            GROUP BY c.id
-        ) AS sub
-    """
+            c.id,
+            c.nome,
+            c.renda_mensal,
+            c.telefone,
+            c.email,
+            c.interesse_tipo,
+            c.interesse_bairro,
+            s.total_recomendacoes,
+            s.total_ofertas
+        """,
+        base,
+        where,
+        params,
+        request.args.get("cursor"),
+        per_page,
+        col_nome="c.nome",
+        col_id="c.id",
+    )
+
+    total, total_exato = pagination.contar(
+        cursor,
+        "recomendacoes",
+        base,
+        where,
+        params,
+        exato=request.args.get("total") == "exato",
     )
-    resumo = cursor.fetchone()
 
-    cursor.close()
-    conn.close()
+    resumo = pagination.contagens.get_or_set(
+        ("recomendacoes", "resumo"), lambda: client_stats.resumo(cursor)
+    )
 
     return render_template(
         "pages/recomendacoes/listar.html",
-        clientes=clientes,
+        clientes=pagina.itens,
+        pagina=pagina,
         usuario=current_user,
         active_page="recomendacoes",
         filtro=filtro,
@@ -110,6 +98,7 @@ def listar():
         page=page,
         per_page=per_page,
         total=total,
+        total_exato=total_exato,
         resumo=resumo,
     )
 
@@ -136,9 +125,6 @@ def finalizar_selecao():
     except Exception as e:
         conn.rollback()
         flash(f"Erro ao finalizar seleção: {str(e)}", "error")
-    finally:
-        cursor.close()
-        conn.close()
     
     return redirect(url_for('recomendacoes.cliente', 
                           cliente_id=cliente_id, 
@@ -170,43 +156,77 @@ def cliente(cliente_id):
     if recomendacoes:
         recomendacao = recomendacoes[0]
     
+    selecao_ctx = {}
+
     # Buscar estabelecimentos conforme o modo
     if modo == 'selecionar':
-        if recomendacao:
-            # Buscar TODOS estabelecimentos com info de seleção
-            cursor.execute("""
-                SELECT 
-                    e.*,
-                    CASE WHEN re.estabelecimento_id IS NOT NULL THEN 1 ELSE 0 END as selecionado
-                FROM estabelecimentos e
-                LEFT JOIN recomendacao_estabelecimentos re 
-                    ON e.id = re.estabelecimento_id 
-                    AND re.recomendacao_id = %s
-                ORDER BY selecionado DESC, e.nome ASC
-            """, (recomendacao['id'],))
-        else:
+        if not recomendacao:
             # Criar recomendação nova para seleção manual
             cursor.execute("""
                 INSERT INTO recomendacoes (cliente_id, status) 
                 VALUES (%s, 'selecionar')
             """, (cliente_id,))
-            conn.commit()
             recomendacao_id = cursor.lastrowid
+            client_stats.recalcular_clientes(conn, [cliente_id])
+            bump_version(cursor, "client_offer_stats")
+            conn.commit()
+            client_stats.invalidar()
             
             cursor.execute("SELECT * FROM recomendacoes WHERE id = %s", (recomendacao_id,))
             recomendacao = cursor.fetchone()
-            
-            cursor.execute("SELECT * FROM estabelecimentos ORDER BY nome ASC")
-        
-        imoveis = cursor.fetchall()
-        
+
+        # Sem filtro na URL, começa pelo tipo e bairro de interesse do cliente
+        filtrado = any(campo in request.args for campo in ("tipo", "bairro", "faixa_min", "faixa_max"))
+        filtros = {
+            "tipo": request.args.get("tipo", "" if filtrado else (cliente["interesse_tipo"] or "")).strip(),
+            "bairro": request.args.get("bairro", "" if filtrado else (cliente["interesse_bairro"] or "")).strip(),
+            "faixa_min": request.args.get("faixa_min", type=float),
+            "faixa_max": request.args.get("faixa_max", type=float),
+        }
+        page = request.args.get("page", 1, type=int)
+        per_page = current_app.config["SELECAO_POR_PAGINA"]
+
+        # Selecionados fixos no topo; abaixo, uma página dos demais candidatos
+        fixados = selecao.fixados(cursor, recomendacao['id'])
+        pagina, total, total_exato = selecao.candidatos(
+            cursor, recomendacao['id'], filtros, request.args.get("cursor"), per_page
+        )
+        imoveis = selecao.marcar_compatibilidade(fixados + pagina.itens, cliente)
+        selecao_ctx = dict(
+            filtros=filtros,
+            pagina=pagina,
+            page=page,
+            per_page=per_page,
+            total=total,
+            total_exato=total_exato,
+            total_selecionados=len(fixados),
+        )
+
     elif modo == 'gerar':
-        # Buscar estabelecimentos compatíveis (sua lógica atual)
-        cursor.execute("""
-            SELECT * FROM estabelecimentos 
-            WHERE tipo = %s AND bairro = %s AND faixa_min <= %s
-        """, (cliente['interesse_tipo'], cliente['interesse_bairro'], cliente['renda_mensal']))
-        imoveis = cursor.fetchall()
+        # Candidatos do motor de compatibilidade, só os k melhores por nota
+        melhores = ranking.get_pontuador().top_k(
+            matching.get_engine(conn), cliente, current_app.config["RECOMENDACAO_TOP_K"]
+        )
+        imoveis = []
+        if melhores:
+            ids = [estabelecimento_id for _, estabelecimento_id in melhores]
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(f"""
+                SELECT * FROM estabelecimentos 
+                WHERE id IN ({placeholders})
+            """, ids)
+            por_id = {imovel['id']: imovel for imovel in cursor.fetchall()}
+            bairro_cliente = matching.normalizar(cliente['interesse_bairro'])
+            for nota, estabelecimento_id in melhores:
+                imovel = por_id.get(estabelecimento_id)
+                if imovel is None:
+                    continue
+                imovel['pontuacao'] = round(nota * 100)
+                imovel['compat_bairro'] = matching.normalizar(imovel['bairro']) == bairro_cliente
+                imovel['compat_renda'] = (
+                    imovel['faixa_max'] is None or cliente['renda_mensal'] <= imovel['faixa_max']
+                )
+                imoveis.append(imovel)
         for imovel in imoveis:
             imovel['selecionado'] = False
     
@@ -222,16 +242,14 @@ def cliente(cliente_id):
             imoveis = cursor.fetchall()
         else:
             imoveis = []
-    
-    cursor.close()
-    conn.close()
-    
+
     return render_template("pages/recomendacoes/recomendacoes_cliente.html", 
                          cliente=cliente,
                          recomendacoes=recomendacoes,
                          recomendacao=recomendacao,
                          imoveis=imoveis,
-                         modo=modo)
+                         modo=modo,
+                         **selecao_ctx)
 
 # Rota temporária para verificar estabelecimentos
 @recomendacoes_bp.route("/debug_estabelecimentos")
@@ -246,9 +264,6 @@ def debug_estabelecimentos():
     cursor.execute("SELECT * FROM estabelecimentos LIMIT 5")
     primeiros = cursor.fetchall()
 
-    cursor.close()
-    conn.close()
-
     return f"Total de estabelecimentos: {total}<br>Primeiros: {primeiros}"
 
 
@@ -276,26 +291,21 @@ def selecionar_imovel():
                 VALUES (%s, 'selecionar')
             """, (cliente_id,))
             recomendacao_id = cursor.lastrowid
+            client_stats.recalcular_clientes(conn, [cliente_id])
+            bump_version(cursor, "client_offer_stats")
         else:
             recomendacao_id = recomendacao[0]
         
         # Inserir na tabela de junção
-        cursor.execute("""
-            INSERT INTO recomendacao_estabelecimentos 
-            (recomendacao_id, estabelecimento_id) 
-            VALUES (%s, %s)
-            ON DUPLICATE KEY UPDATE estabelecimento_id = VALUES(estabelecimento_id)
-        """, (recomendacao_id, estabelecimento_id))
+        selecao.aplicar(cursor, recomendacao_id, adicionar=[estabelecimento_id])
         
         conn.commit()
+        client_stats.invalidar()
         flash("Imóvel selecionado com sucesso! ✅", "success")
         
     except Exception as e:
         conn.rollback()
         flash(f"Erro ao selecionar imóvel: {str(e)}", "error")
-    finally:
-        cursor.close()
-        conn.close()
     
     return redirect(url_for('recomendacoes.cliente', 
                           cliente_id=cliente_id, 
@@ -324,13 +334,7 @@ def desselecionar_imovel():
 
         if recomendacao:
             # Remover estabelecimento da recomendação
-            cursor.execute(
-                """
-                DELETE FROM recomendacao_estabelecimentos 
-                WHERE recomendacao_id = %s AND estabelecimento_id = %s
-            """,
-                (recomendacao[0], estabelecimento_id),
-            )
+            selecao.aplicar(cursor, recomendacao[0], remover=[estabelecimento_id])
 
             conn.commit()
             flash("Imóvel removido da seleção!", "info")
@@ -341,10 +345,6 @@ def desselecionar_imovel():
         conn.rollback()
         flash(f"Erro ao remover imóvel: {str(e)}", "error")
 
-    finally:
-        cursor.close()
-        conn.close()
-
     return redirect(url_for("recomendacoes.cliente", cliente_id=cliente_id, modo=modo))
 
 @recomendacoes_bp.route("/remover_selecao", methods=["POST"])
@@ -366,10 +366,7 @@ def remover_selecao():
         
         if recomendacao:
             # Remover da tabela de junção
-            cursor.execute("""
-                DELETE FROM recomendacao_estabelecimentos 
-                WHERE recomendacao_id = %s AND estabelecimento_id = %s
-            """, (recomendacao[0], estabelecimento_id))
+            selecao.aplicar(cursor, recomendacao[0], remover=[estabelecimento_id])
             
             conn.commit()
             flash("Imóvel removido da seleção! ❌", "info")
@@ -379,15 +376,87 @@ def remover_selecao():
     except Exception as e:
         conn.rollback()
         flash(f"Erro ao remover: {str(e)}", "error")
-    finally:
-        cursor.close()
-        conn.close()
     
     return redirect(url_for('recomendacoes.cliente', 
                           cliente_id=cliente_id, 
                           modo='selecionar'))
 
 
+@recomendacoes_bp.route("/recomendacao/<int:recomendacao_id>/selecao", methods=["POST"])
+@login_required
+def atualizar_selecao(recomendacao_id):
+    """Aplica um lote de inclusões/remoções e devolve a seleção resultante (JSON).
+
+    Corpo: ``{"adicionar": [ids], "remover": [ids]}``.
+    """
+    dados = request.get_json(silent=True) or {}
+    try:
+        adicionar = selecao.normalizar_ids(dados.get("adicionar"))
+        remover = selecao.normalizar_ids(dados.get("remover"))
+    except (TypeError, ValueError):
+        return jsonify({"erro": "IDs de estabelecimento inválidos"}), 400
+
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+
+    cursor.execute(
+        "SELECT id, status FROM recomendacoes WHERE id = %s FOR UPDATE",
+        (recomendacao_id,),
+    )
+    recomendacao = cursor.fetchone()
+    if recomendacao is None:
+        conn.rollback()
+        return jsonify({"erro": "Recomendação não encontrada"}), 404
+    if recomendacao["status"] == "finalizada":
+        conn.rollback()
+        return jsonify({"erro": "Recomendação finalizada não pode ser alterada"}), 409
+
+    try:
+        incluidos, removidos = selecao.aplicar(cursor, recomendacao_id, adicionar, remover)
+        selecionados = selecao.selecionados(cursor, recomendacao_id)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        current_app.logger.exception("Erro ao atualizar seleção da recomendação %s", recomendacao_id)
+        return jsonify({"erro": f"Erro ao atualizar seleção: {e}"}), 500
+
+    return jsonify(
+        {
+            "recomendacao_id": recomendacao_id,
+            "selecionados": selecionados,
+            "total": len(selecionados),
+            "incluidos": incluidos,
+            "removidos": removidos,
+        }
+    )
+
+
+@recomendacoes_bp.route("/gerar_em_lote", methods=["POST"])
+@login_required
+@nivel_requerido("admin")
+def gerar_em_lote():
+    """Dispara a geração para todos os clientes ativos (retoma o lote interrompido)"""
+    recomendacoes_lote.executar_em_segundo_plano(novo=request.form.get("novo") == "1")
+    return jsonify({"status_url": url_for("recomendacoes.status_lote")}), 202
+
+
+@recomendacoes_bp.route("/gerar_em_lote/status")
+@login_required
+@nivel_requerido("admin")
+def status_lote():
+    """Última execução do lote (progresso, erro, vazão)"""
+    cursor = get_db_connection().cursor(dictionary=True)
+    cursor.execute("SELECT * FROM recomendacoes_lotes ORDER BY id DESC LIMIT 1")
+    lote = cursor.fetchone()
+    if lote is None:
+        return jsonify({"status": "nenhum"}), 404
+    segundos = (lote["atualizado_em"] - lote["iniciado_em"]).total_seconds()
+    lote["clientes_por_segundo"] = (
+        round(lote["clientes_processados"] / segundos, 1) if segundos > 0 else None
+    )
+    return jsonify(lote)
+
+
 # Nova Recomendação
 @recomendacoes_bp.route("/cliente/<int:cliente_id>/nova", methods=["POST"])
 @login_required
@@ -405,14 +474,14 @@ def nova(cliente_id):
             (cliente_id,),
         )
         recomendacao_id = cursor.lastrowid
+        client_stats.recalcular_clientes(conn, [cliente_id])
+        bump_version(cursor, "client_offer_stats")
         conn.commit()
+        client_stats.invalidar()
         flash("Nova recomendação criada!", "success")
     except Exception as e:
         conn.rollback()
         flash("Erro ao criar recomendação", "danger")
-    finally:
-        cursor.close()
-        conn.close()
 
     return redirect(
         url_for(
@@ -449,9 +518,6 @@ def salvar(cliente_id):
     except Exception as e:
         conn.rollback()
         flash("Erro ao salvar", "danger")
-    finally:
-        cursor.close()
-        conn.close()
 
     return redirect(
         url_for(
@@ -471,6 +537,11 @@ def excluir(recomendacao_id):
     cursor = conn.cursor()
 
     try:
+        cursor.execute(
+            "SELECT cliente_id FROM recomendacoes WHERE id = %s", (recomendacao_id,)
+        )
+        dono = cursor.fetchone()
+
         # Primeiro excluir os relacionamentos na tabela de junção
         cursor.execute(
             "DELETE FROM recomendacao_estabelecimentos WHERE recomendacao_id = %s",
@@ -479,18 +550,18 @@ def excluir(recomendacao_id):
 
         # Depois excluir a recomendação
         cursor.execute("DELETE FROM recomendacoes WHERE id = %s", (recomendacao_id,))
+        if dono:
+            client_stats.recalcular_clientes(conn, [dono[0]])
+            bump_version(cursor, "client_offer_stats")
 
         conn.commit()
+        client_stats.invalidar()
         flash("Recomendação excluída com sucesso!", "success")
 
     except Exception as e:
         conn.rollback()
         flash(f"Erro ao excluir recomendação: {str(e)}", "error")
 
-    finally:
-        cursor.close()
-        conn.close()
-
     return redirect(url_for("recomendacoes.cliente", cliente_id=cliente_id))
 
 
@@ -500,105 +571,12 @@ def excluir(recomendacao_id):
 def exportar(formato):
     filtro = request.args.get("filtro", "todos")
     busca = request.args.get("busca", "").strip()
-
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    query = """
-    SELECT 
-        c.id, c.nome, c.renda_mensal, c.telefone, c.email, 
-        c.interesse_tipo, c.interesse_bairro,
-        COUNT(r.id) AS total_recomendacoes
-    FROM clientes c
-    LEFT JOIN recomendacoes r ON r.cliente_id = c.id
-    """
-    params = []
-
-    if busca:
-        query += " WHERE c.nome LIKE %s"
-        params.append(f"%{busca}%")
-    query += " GROUP BY c.id"
-    if filtro == "com":
-        query += " HAVING COUNT(r.id) > 0"
-    elif filtro == "sem":
-        query += " HAVING COUNT(r.id) = 0"
-
-    cursor.execute(query, params)
-    dados = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    exportacao = exports.recomendacoes(filtro, busca)
 
     if formato == "csv":
-        si = StringIO()
-        cw = csv.writer(si)
-        cw.writerow(
-            [
-                "ID",
-                "Nome",
-                "Renda",
-                "Telefone",
-                "Email",
-                "Interesse",
-                "Bairro",
-                "Total Recomendações",
-            ]
-        )
-        for row in dados:
-            cw.writerow(
-                [
-                    row["id"],
-                    row["nome"],
-                    row["renda_mensal"],
-                    row["telefone"],
-                    row["email"],
-                    row["interesse_tipo"],
-                    row["interesse_bairro"],
-                    row["total_recomendacoes"],
-                ]
-            )
-        output = make_response(si.getvalue())
-        output.headers["Content-type"] = "text/csv"
-        output.headers["Content-Disposition"] = "attachment; filename=recomendacoes.csv"
-        return output
+        return exports.resposta_csv(exportacao)
 
     elif formato == "excel":
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.append(
-            [
-                "ID",
-                "Nome",
-                "Renda",
-                "Telefone",
-                "Email",
-                "Interesse",
-                "Bairro",
-                "Total Recomendações",
-            ]
-        )
-        for row in dados:
-            ws.append(
-                [
-                    row["id"],
-                    row["nome"],
-                    row["renda_mensal"],
-                    row["telefone"],
-                    row["email"],
-                    row["interesse_tipo"],
-                    row["interesse_bairro"],
-                    row["total_recomendacoes"],
-                ]
-            )
-        virtual_workbook = BytesIO()
-        wb.save(virtual_workbook)
-        virtual_workbook.seek(0)
-        output = make_response(virtual_workbook.read())
-        output.headers["Content-type"] = (
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        output.headers["Content-Disposition"] = (
-            "attachment; filename=recomendacoes.xlsx"
-        )
-        return output
+        return exports.resposta_xlsx(exportacao)
 
     return redirect(url_for("recomendacoes.listar"))
@@ -0,0 +1,131 @@
+"""Busca textual de clientes e imóveis sobre os índices FULLTEXT (ngram).
+
+``condicao`` monta o filtro ``MATCH ... AGAINST`` usado nas listagens e
+exportações; cada palavra digitada vira uma frase obrigatória no modo
+booleano, então o resultado é o mesmo de vários ``LIKE '%palavra%'`` com AND,
+mas resolvido pelo índice. Isso só vale com os índices criados sem stopwords
+(``innodb_ft_enable_stopword = OFF``, migrations 006 e 010): com a lista
+padrão o ngram descarta os bigramas que contêm "a", "de", "an"..., e nomes
+como "Ana" ou "Maria" deixam de ser encontrados. Palavras menores que o ngram não existem no índice
+e são ignoradas; se nenhuma sobrar, cai no ``LIKE`` por prefixo do nome.
+
+``autocomplete`` devolve os melhores resultados das duas tabelas por
+relevância, com cache curto por termo (``BUSCA_AUTOCOMPLETE_TTL``).
+"""
+import re
+
+from flask import current_app
+
+from core.services.matching import normalizar
+from core.utils.cache import TTLCache
+from core.utils.datatables import escapar_like
+
+# ngram_token_size do servidor; o MySQL também precisa rodar com
+# innodb_ft_enable_stopword = OFF, ou um OPTIMIZE/ALTER que reconstrua os
+# índices volta a aplicar as stopwords em inglês
+TAMANHO_NGRAM = 2
+COLUNAS = {
+    "clientes": ("nome", "email", "telefone", "interesse_bairro"),
+    "estabelecimentos": ("nome", "bairro"),
+}
+# Operadores do modo booleano que não podem vir do usuário
+_OPERADORES = re.compile(r'[+\-<>()~*"@]+')
+
+_cache = TTLCache(maxsize=1024)
+
+
+def palavras(busca):
+    return [p for p in _OPERADORES.sub(" ", busca or "").split() if len(p) >= TAMANHO_NGRAM]
+
+
+def expressao(busca):
+    """Expressão do modo booleano: todas as palavras, cada uma como frase"""
+    return " ".join(f'+"{p}"' for p in palavras(busca))
+
+
+def _match(tabela, alias):
+    prefixo = f"{alias}." if alias else ""
+    return f"MATCH({', '.join(prefixo + c for c in COLUNAS[tabela])}) AGAINST (%s IN BOOLEAN MODE)"
+
+
+def condicao(tabela, alias, busca):
+    """(sql, params) do filtro de busca sobre ``tabela`` (com ``alias`` opcional)"""
+    termo = expressao(busca)
+    if termo:
+        return _match(tabela, alias), [termo]
+    prefixo = f"{alias}." if alias else ""
+    return f"{prefixo}nome LIKE %s", [escapar_like(busca.strip()) + "%"]
+
+
+def _buscar(cursor, termo, limite):
+    cursor.execute(
+        f"""
+        SELECT id, nome, email, telefone, {_match("clientes", None)} AS relevancia
+        FROM clientes
+        WHERE {_match("clientes", None)}
+        ORDER BY relevancia DESC, nome
+        LIMIT %s
+        """,
+        (termo, termo, limite),
+    )
+    resultados = [
+        {
+            "tipo": "cliente",
+            "id": row["id"],
+            "texto": row["nome"],
+            "detalhe": row["email"] or row["telefone"] or "",
+            "relevancia": float(row["relevancia"]),
+        }
+        for row in cursor.fetchall()
+    ]
+
+    cursor.execute(
+        f"""
+        SELECT id, nome, tipo, bairro, {_match("estabelecimentos", None)} AS relevancia
+        FROM estabelecimentos
+        WHERE {_match("estabelecimentos", None)}
+        ORDER BY relevancia DESC, nome
+        LIMIT %s
+        """,
+        (termo, termo, limite),
+    )
+    resultados.extend(
+        {
+            "tipo": "imovel",
+            "id": row["id"],
+            "texto": row["nome"],
+            "detalhe": f"{row['tipo']} · {row['bairro']}",
+            "relevancia": float(row["relevancia"]),
+        }
+        for row in cursor.fetchall()
+    )
+
+    resultados.sort(key=lambda r: (-r["relevancia"], r["texto"]))
+    return resultados[:limite]
+
+
+def buscar(cursor, busca, limite=50):
+    """Clientes e imóveis que casam com ``busca``, do mais para o menos relevante"""
+    termo = expressao(busca)
+    if not termo:
+        return []
+    return _buscar(cursor, termo, limite)
+
+
+def autocomplete(cursor, busca, limite=8):
+    termo = expressao(busca)
+    if not termo:
+        return []
+    return _cache.get_or_set(
+        (normalizar(termo), limite),
+        lambda: _buscar(cursor, termo, limite),
+        current_app.config["BUSCA_AUTOCOMPLETE_TTL"],
+    )
+
+
+def invalidar():
+    _cache.clear()
+
+
+def stats():
+    return _cache.stats()
@@ -0,0 +1,159 @@
+"""Manutenção incremental da tabela ``client_offer_stats``.
+
+As rotas de escrita chamam ``recalcular_clientes`` na mesma transação da
+alteração, antes do commit; só as linhas dos clientes afetados são
+recalculadas. Quem chama incrementa a versão ``client_offer_stats`` uma vez
+por transação (junto do seu ``bump_version``) e, depois do commit, descarta as
+contagens em cache da listagem de recomendações (``invalidar``).
+
+As ofertas saem do motor de compatibilidade, a mesma definição de
+compatibilidade (``matching.chave``) usada por ``reconstruir``.
+"""
+from decimal import Decimal
+
+import numpy as np
+
+from core.services import matching, offer_stats
+from core.utils.pagination import invalidar_contagens
+from core.utils.versioning import bump_version
+
+
+def _casa(lado, cliente):
+    """O estabelecimento ``(tipo, bairro, faixa_min, ...)`` é compatível com o cliente?"""
+    if lado is None or lado[2] in (None, "") or cliente["renda_mensal"] is None:
+        return False
+    return (
+        matching.chave(lado[0], lado[1])
+        == matching.chave(cliente["interesse_tipo"], cliente["interesse_bairro"])
+        and Decimal(str(lado[2])) <= cliente["renda_mensal"]
+    )
+
+
+def recalcular_clientes(conn, cliente_ids, antes=None, depois=None, engine=None):
+    """Recalcula as linhas dos clientes informados (sem incrementar a versão).
+
+    O motor só enxerga estabelecimentos confirmados. Numa escrita em
+    estabelecimentos ainda aberta, ``antes``/``depois`` são o
+    ``(tipo, bairro, faixa_min, ...)`` antigo e o novo do imóvel (``None`` na
+    inclusão/exclusão): a contagem desconta um e soma o outro. Nesse caso
+    ``engine`` é obrigatório e deve ter sido obtido antes da escrita, para não
+    carregar a alteração pendente.
+    """
+    cliente_ids = sorted({int(i) for i in cliente_ids if i is not None})
+    if not cliente_ids:
+        return
+
+    if engine is None:
+        if antes is not None or depois is not None:
+            raise ValueError("antes/depois exigem o motor carregado antes da escrita")
+        engine = matching.get_engine(conn, verificar=True)
+
+    cursor = conn.cursor(dictionary=True)
+    placeholders = ", ".join(["%s"] * len(cliente_ids))
+    cursor.execute(
+        f"""
+        SELECT id, interesse_tipo, interesse_bairro, renda_mensal
+        FROM clientes WHERE id IN ({placeholders})
+        """,
+        cliente_ids,
+    )
+    clientes = cursor.fetchall()
+    cursor.execute(
+        f"""
+        SELECT cliente_id, COUNT(*) AS total FROM recomendacoes
+        WHERE cliente_id IN ({placeholders})
+        GROUP BY cliente_id
+        """,
+        cliente_ids,
+    )
+    recomendacoes = {row["cliente_id"]: row["total"] for row in cursor.fetchall()}
+
+    linhas = []
+    for cliente, ofertas in zip(clientes, engine.contar_lote(clientes)):
+        ofertas += _casa(depois, cliente) - _casa(antes, cliente)
+        linhas.append((cliente["id"], max(ofertas, 0), recomendacoes.get(cliente["id"], 0)))
+
+    cursor.executemany(
+        """
+        INSERT INTO client_offer_stats (cliente_id, total_ofertas, total_recomendacoes, calculado_em)
+        VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+        ON DUPLICATE KEY UPDATE
+            total_ofertas = VALUES(total_ofertas),
+            total_recomendacoes = VALUES(total_recomendacoes),
+            calculado_em = VALUES(calculado_em)
+        """,
+        linhas,
+    )
+
+
+def invalidar():
+    """Descarta as contagens em cache da listagem de recomendações (depois do commit)"""
+    invalidar_contagens("recomendacoes")
+
+
+def buscar_estabelecimento(cursor, estabelecimento_id):
+    """(tipo, bairro, faixa_min, faixa_max, valor_medio) atuais, para achar quem deixa de casar"""
+    cursor.execute(
+        """
+        SELECT tipo, bairro, faixa_min, faixa_max, valor_medio
+        FROM estabelecimentos WHERE id = %s
+        """,
+        (estabelecimento_id,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return row["tipo"], row["bairro"], row["faixa_min"], row["faixa_max"], row["valor_medio"]
+    return tuple(row)
+
+
+def resumo(cursor):
+    """Contagens dos filtros da listagem de recomendações"""
+    cursor.execute(
+        """
+        SELECT
+            COALESCE(SUM(total_recomendacoes > 0), 0) AS com_recomendacao,
+            COALESCE(SUM(total_recomendacoes = 0 AND total_ofertas > 0), 0) AS sem_recomendacao,
+            COALESCE(SUM(total_ofertas = 0), 0) AS sem_ofertas,
+            COUNT(*) AS total
+        FROM client_offer_stats
+        """
+    )
+    return cursor.fetchone()
+
+
+def condicao_filtro(filtro):
+    """Cláusula sobre ``s`` (client_offer_stats) equivalente ao filtro da listagem"""
+    return {
+        "com": "s.total_recomendacoes > 0",
+        "sem": "s.total_recomendacoes = 0 AND s.total_ofertas > 0",
+        "sem_ofertas": "s.total_ofertas = 0",
+    }.get(filtro)
+
+
+def reconstruir(conn, lote=5000):
+    """Refaz a tabela inteira a partir das contagens vetorizadas"""
+    stats = offer_stats.calcular(conn)
+    cursor = conn.cursor()
+    linhas = list(
+        zip(
+            stats.ids.tolist(),
+            stats.total_ofertas.tolist(),
+            stats.total_recomendacoes.tolist(),
+        )
+    )
+
+    cursor.execute("DELETE FROM client_offer_stats")
+    for inicio in range(0, len(linhas), lote):
+        cursor.executemany(
+            """
+            INSERT INTO client_offer_stats (cliente_id, total_ofertas, total_recomendacoes)
+            VALUES (%s, %s, %s)
+            """,
+            linhas[inicio:inicio + lote],
+        )
+    bump_version(cursor, "client_offer_stats")
+    conn.commit()
+    invalidar()
+    return len(linhas), int(np.count_nonzero(stats.total_ofertas == 0))
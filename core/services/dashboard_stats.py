@@ -0,0 +1,69 @@
+"""Números dos cards do dashboard, cada um com sua entrada de cache (TTL curto).
+
+Os quatro totais em SQL saem de uma única consulta e são guardados juntos; o
+de clientes fora de qualquer faixa vem do índice de intervalos e fica em uma
+entrada própria, para que uma falha ou lentidão nele não afete os outros.
+
+As rotas que escrevem em clientes ou estabelecimentos chamam ``invalidar()``
+depois do commit; nos demais workers o valor expira em
+``DASHBOARD_STATS_TTL`` segundos.
+"""
+from flask import current_app
+
+from core.services import intervalos
+from core.utils.cache import TTLCache
+from core.utils.db_connection import get_db_connection
+
+_cache = TTLCache(maxsize=4)
+
+
+def calcular(cursor):
+    cursor.execute(
+        """
+        SELECT
+            (SELECT COUNT(*) FROM clientes) AS total_clientes,
+            (SELECT COUNT(*) FROM estabelecimentos
+              WHERE tipo = 'comercial') AS total_estabelecimentos_comercial,
+            (SELECT COUNT(*) FROM estabelecimentos
+              WHERE tipo = 'residencial') AS total_estabelecimentos_residencial,
+            -- Mesmo critério de "sem ofertas" da tela de recomendações
+            (SELECT COUNT(*) FROM client_offer_stats
+              WHERE total_ofertas = 0) AS total_clientes_sem_ofertas
+        """
+    )
+    return {chave: int(valor or 0) for chave, valor in cursor.fetchone().items()}
+
+
+def _totais():
+    return calcular(get_db_connection().cursor(dictionary=True))
+
+
+def _sem_faixa():
+    return {"total_clientes_sem_faixa": intervalos.contar_sem_faixa(get_db_connection())}
+
+
+# widget -> (entrada do cache, função que calcula a entrada)
+WIDGETS = {
+    "total_clientes": ("totais", _totais),
+    "total_estabelecimentos_comercial": ("totais", _totais),
+    "total_estabelecimentos_residencial": ("totais", _totais),
+    "total_clientes_sem_ofertas": ("totais", _totais),
+    "total_clientes_sem_faixa": ("sem_faixa", _sem_faixa),
+}
+
+
+def obter(widget):
+    """Valor de um card do dashboard (do cache, se ainda válido)"""
+    entrada, calcular_entrada = WIDGETS[widget]
+    valores = _cache.get_or_set(
+        entrada, calcular_entrada, current_app.config["DASHBOARD_STATS_TTL"]
+    )
+    return valores[widget]
+
+
+def invalidar():
+    _cache.clear()
+
+
+def stats():
+    return _cache.stats()
@@ -0,0 +1,241 @@
+"""Exportações em segundo plano.
+
+``submeter`` devolve na hora um job; a geração roda em um pool de threads e o
+arquivo final fica em ``EXPORT_DIR`` por ``EXPORT_TTL_SECONDS``. O id do job é
+a própria chave do arquivo (entidade + hash de formato, filtros e versões dos
+dados), então um pedido repetido sobre dados inalterados reaproveita o arquivo
+pronto e qualquer worker encontra o resultado no disco.
+
+O estado do job (status, progresso, erro) também fica no disco, em
+``<id>.json`` ao lado do arquivo, regravado a cada mudança e no máximo uma
+vez por segundo durante a geração: o worker que responde à consulta não
+precisa ser o que está gerando. Um job ``executando`` cujo estado não é
+regravado há ``ABANDONO_SEGUNDOS`` é dado como interrompido.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from core.services import exports
+from core.utils.db_connection import get_db_connection, pooled_connection
+from core.utils.versioning import get_versions
+
+logger = logging.getLogger(__name__)
+
+ENTIDADES = {
+    "clientes": exports.clientes,
+    "sem_faixa": exports.clientes_sem_faixa,
+    "estabelecimentos": exports.estabelecimentos,
+    "recomendacoes": exports.recomendacoes,
+}
+EXTENSOES = {"csv": "csv", "excel": "xlsx"}
+MIMETYPES = {"csv": "text/csv", "excel": exports.XLSX_MIMETYPE}
+JOB_ID = re.compile(r"^([a-z_]+)-[0-9a-f]{40}$")
+ABANDONO_SEGUNDOS = 120
+
+
+class Job:
+    def __init__(self, id, entidade, formato):
+        self.id = id
+        self.entidade = entidade
+        self.formato = formato
+        self.status = "pendente"  # pendente, executando, concluido, erro
+        self.linhas = 0
+        self.total = None
+        self.erro = None
+
+    @classmethod
+    def de_dict(cls, dados):
+        job = cls(dados["id"], dados["entidade"], dados["formato"])
+        for campo in ("status", "linhas", "total", "erro"):
+            setattr(job, campo, dados.get(campo))
+        return job
+
+    def as_dict(self):
+        progresso = None
+        if self.status == "concluido":
+            progresso = 100
+        elif self.total:
+            progresso = min(99, int(self.linhas * 100 / self.total))
+        return {
+            "id": self.id,
+            "entidade": self.entidade,
+            "formato": self.formato,
+            "status": self.status,
+            "linhas": self.linhas,
+            "total": self.total,
+            "progresso": progresso,
+            "erro": self.erro,
+        }
+
+
+class ExportJobs:
+    def __init__(self, app):
+        self.app = app
+        self.diretorio = app.config["EXPORT_DIR"] or os.path.join(app.instance_path, "exports")
+        self.ttl = app.config["EXPORT_TTL_SECONDS"]
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config["EXPORT_WORKERS"], thread_name_prefix="exportacao"
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def caminho(self, job_id, formato):
+        return os.path.join(self.diretorio, f"{job_id}.{EXTENSOES[formato]}")
+
+    def caminho_status(self, job_id):
+        return os.path.join(self.diretorio, f"{job_id}.json")
+
+    def _salvar(self, job):
+        """Grava o estado do job (troca atômica), visível para todos os workers"""
+        destino = self.caminho_status(job.id)
+        temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            with open(temporario, "w", encoding="utf-8") as arquivo:
+                json.dump(job.as_dict(), arquivo)
+            os.replace(temporario, destino)
+        except OSError:
+            logger.exception("Falha ao gravar o estado da exportação %s", job.id)
+
+    def _ler(self, job_id):
+        """Job gravado no disco por qualquer worker, ou ``None``"""
+        caminho = self.caminho_status(job_id)
+        try:
+            with open(caminho, encoding="utf-8") as arquivo:
+                dados = json.load(arquivo)
+            idade = time.time() - os.path.getmtime(caminho)
+        except (OSError, ValueError):
+            return None
+        job = Job.de_dict(dados)
+        if job.status == "concluido" and not self._valido(self.caminho(job_id, job.formato)):
+            return None
+        if job.status == "executando" and idade > ABANDONO_SEGUNDOS:
+            job.status = "erro"
+            job.erro = "Exportação interrompida"
+        return job
+
+    def _valido(self, caminho):
+        try:
+            return time.time() - os.path.getmtime(caminho) < self.ttl
+        except OSError:
+            return False
+
+    def limpar(self):
+        """Remove arquivos vencidos (e restos de gerações interrompidas)"""
+        os.makedirs(self.diretorio, exist_ok=True)
+        limite = time.time() - self.ttl
+        for nome in os.listdir(self.diretorio):
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+            except OSError:
+                pass
+        with self._lock:
+            for job_id in [j for j, job in self._jobs.items()
+                           if job.status in ("concluido", "erro")
+                           and not self._valido(self.caminho(j, job.formato))]:
+                del self._jobs[job_id]
+
+    def submeter(self, entidade, formato, exportacao, versoes):
+        chave = json.dumps([formato, exportacao.filtros, versoes], sort_keys=True, default=str)
+        job_id = f"{entidade}-{hashlib.sha1(chave.encode('utf-8')).hexdigest()}"
+        caminho = self.caminho(job_id, formato)
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in ("pendente", "executando"):
+                return job
+            # Outro worker já gerando o mesmo arquivo
+            gravado = self._ler(job_id)
+            if gravado is not None and gravado.status == "executando":
+                return gravado
+            job = Job(job_id, entidade, formato)
+            self._jobs[job_id] = job
+            if self._valido(caminho):
+                job.status = "concluido"
+                return job
+            self._salvar(job)
+
+        self._executor.submit(self._executar, job, exportacao, caminho)
+        return job
+
+    def _executar(self, job, exportacao, caminho):
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.part"
+        job.status = "executando"
+        self._salvar(job)
+        gravado_em = time.monotonic()
+
+        def progresso(linhas):
+            nonlocal gravado_em
+            job.linhas = linhas
+            if time.monotonic() - gravado_em >= 1:
+                self._salvar(job)
+                gravado_em = time.monotonic()
+
+        try:
+            with self.app.app_context():
+                with pooled_connection(self.app) as conn:
+                    job.total = exports.contar(conn, exportacao)
+                self._salvar(job)
+
+                if job.formato == "csv":
+                    with open(temporario, "wb") as arquivo:
+                        for pedaco in exports.gerar_csv(exportacao, app=self.app, progresso=progresso):
+                            arquivo.write(pedaco)
+                else:
+                    exports.gerar_xlsx(exportacao, temporario, app=self.app, progresso=progresso)
+
+            os.replace(temporario, caminho)
+            job.status = "concluido"
+        except Exception as e:
+            logger.exception("Falha na exportação %s (%s)", job.entidade, job.formato)
+            job.status = "erro"
+            job.erro = str(e)
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        self._salvar(job)
+
+    def status(self, job_id):
+        """Job deste processo, o estado gravado por outro worker ou o arquivo pronto no disco"""
+        validado = JOB_ID.match(job_id)
+        if not validado:
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        job = self._ler(job_id)
+        if job is not None:
+            return job
+        for formato in EXTENSOES:
+            if self._valido(self.caminho(job_id, formato)):
+                job = Job(job_id, validado.group(1), formato)
+                job.status = "concluido"
+                return job
+        return None
+
+
+def get_jobs(app=None):
+    app = app or current_app
+    return app.extensions["export_jobs"]
+
+
+def submeter(entidade, formato, filtros=None):
+    """Cria (ou reaproveita) o job de exportação da entidade com os filtros"""
+    jobs = get_jobs()
+    jobs.limpar()
+    exportacao = ENTIDADES[entidade](**(filtros or {}))
+    versoes = get_versions(get_db_connection().cursor(), *exportacao.versoes)
+    return jobs.submeter(entidade, formato, exportacao, versoes)
+
+
+def init_app(app):
+    app.extensions["export_jobs"] = ExportJobs(app)
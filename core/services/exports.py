@@ -0,0 +1,218 @@
+"""Exportações de clientes, estabelecimentos e recomendações.
+
+Cada entidade é descrita por uma ``Exportacao`` (SQL, cabeçalho e formatação
+das linhas). O CSV é gerado sob demanda: as linhas saem em lotes de um cursor
+não bufferizado em uma conexão própria do pool e cada lote é enviado assim que
+escrito, então a memória não cresce com o número de linhas. O XLSX usa
+planilhas write-only do openpyxl e é montado em um arquivo temporário que só
+vai para o disco se passar de ``EXPORT_SPOOL_MAX_BYTES``.
+"""
+import csv
+import tempfile
+import zlib
+from io import StringIO
+
+import openpyxl
+from flask import Response, current_app, request, send_file, stream_with_context
+
+from core.services import busca as busca_textual, client_stats, intervalos
+from core.utils.db_connection import get_db_connection, pooled_connection
+
+LOTE = 1000
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class Exportacao:
+    """``versoes`` são os conjuntos de ``versoes_dados`` dos quais o resultado
+    depende; ``filtros`` identificam a seleção (usados na chave dos arquivos)."""
+
+    def __init__(self, nome, titulo, cabecalho, sql, params=(),
+                 formatar_csv=None, formatar_xlsx=None, versoes=(), filtros=None):
+        self.nome = nome
+        self.titulo = titulo
+        self.cabecalho = cabecalho
+        self.sql = sql
+        self.params = tuple(params)
+        self.versoes = tuple(versoes)
+        self.filtros = filtros or {}
+        self.formatar_csv = formatar_csv or list
+        self.formatar_xlsx = formatar_xlsx or list
+
+
+def clientes():
+    return Exportacao(
+        "clientes",
+        "Clientes",
+        ["Nome", "Renda Mensal (R$)", "Telefone", "Email", "Tipo interesse", "Bairro interesse"],
+        """
+        SELECT nome, renda_mensal, telefone, email, interesse_tipo, interesse_bairro
+        FROM clientes
+        """,
+        versoes=("clientes",),
+    )
+
+
+def clientes_sem_faixa():
+    """Clientes cuja renda não cai em nenhuma faixa de preço (índice de intervalos)"""
+    condicao, params = intervalos.condicao_sem_faixa(get_db_connection())
+    return Exportacao(
+        "clientes_sem_faixa",
+        "Clientes sem faixa",
+        ["Nome", "Renda Mensal (R$)", "Telefone", "Email", "Tipo interesse", "Bairro interesse"],
+        f"""
+        SELECT nome, renda_mensal, telefone, email, interesse_tipo, interesse_bairro
+        FROM clientes
+        WHERE {condicao}
+        ORDER BY nome, id
+        """,
+        params,
+        versoes=("clientes", "estabelecimentos"),
+    )
+
+
+def estabelecimentos():
+    return Exportacao(
+        "estabelecimentos",
+        "Estabelecimentos",
+        ["Nome", "Tipo", "Bairro", "Faixa Mínima (R$)", "Faixa Máxima (R$)"],
+        "SELECT nome, tipo, bairro, faixa_min, faixa_max FROM estabelecimentos",
+        formatar_csv=lambda row: [row[0], row[1], row[2], f"{row[3]:.2f}", f"{row[4]:.2f}"],
+        formatar_xlsx=lambda row: [row[0], row[1], row[2], float(row[3]), float(row[4])],
+        versoes=("estabelecimentos",),
+    )
+
+
+def recomendacoes(filtro="todos", busca=""):
+    """Mesmo filtro da listagem de recomendações"""
+    where = []
+    params = []
+    if busca:
+        condicao_busca, params_busca = busca_textual.condicao("clientes", "c", busca)
+        where.append(condicao_busca)
+        params.extend(params_busca)
+    condicao = client_stats.condicao_filtro(filtro)
+    if condicao:
+        where.append(condicao)
+
+    sql = """
+        SELECT
+            c.id, c.nome, c.renda_mensal, c.telefone, c.email,
+            c.interesse_tipo, c.interesse_bairro,
+            s.total_recomendacoes
+        FROM clientes c
+        JOIN client_offer_stats s ON s.cliente_id = c.id
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY c.nome ASC, c.id ASC"
+
+    return Exportacao(
+        "recomendacoes",
+        "Recomendações",
+        ["ID", "Nome", "Renda", "Telefone", "Email", "Interesse", "Bairro", "Total Recomendações"],
+        sql,
+        params,
+        versoes=("clientes", "client_offer_stats"),
+        filtros={"filtro": filtro, "busca": busca},
+    )
+
+
+def contar(conn, exportacao):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM ({exportacao.sql}) AS exportacao", exportacao.params)
+    return cursor.fetchone()[0]
+
+
+def linhas(conn, exportacao, lote=LOTE, progresso=None):
+    """Itera as linhas (tuplas) da exportação sem carregar o resultado inteiro.
+
+    ``progresso(n)`` é chamado a cada lote com o total de linhas lidas até ali.
+    """
+    cursor = conn.cursor(buffered=False)
+    cursor.execute(exportacao.sql, exportacao.params)
+    lidas = 0
+    while True:
+        bloco = cursor.fetchmany(lote)
+        if not bloco:
+            break
+        yield from bloco
+        lidas += len(bloco)
+        if progresso:
+            progresso(lidas)
+
+
+def gerar_csv(exportacao, compactar=False, app=None, lote=LOTE, progresso=None):
+    """Gera o CSV em pedaços de bytes; com ``compactar`` o fluxo sai em gzip"""
+    compressor = zlib.compressobj(wbits=31) if compactar else None
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    def esvaziar():
+        dados = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(dados) if compressor else dados
+
+    # O cabeçalho sai antes da consulta, para o download começar na hora
+    writer.writerow(exportacao.cabecalho)
+    yield esvaziar()
+
+    with pooled_connection(app) as conn:
+        for n, linha in enumerate(linhas(conn, exportacao, lote, progresso), 1):
+            writer.writerow(exportacao.formatar_csv(linha))
+            if n % lote == 0:
+                pedaco = esvaziar()
+                if pedaco:
+                    yield pedaco
+
+    fim = esvaziar()
+    if compressor:
+        fim += compressor.flush()
+    if fim:
+        yield fim
+
+
+def resposta_csv(exportacao):
+    """Resposta em streaming; usa gzip se EXPORT_CSV_GZIP e o cliente aceitar"""
+    compactar = current_app.config["EXPORT_CSV_GZIP"] and "gzip" in request.accept_encodings
+    response = Response(
+        stream_with_context(gerar_csv(exportacao, compactar)),
+        mimetype="text/csv",
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename={exportacao.nome}.csv"
+    if compactar:
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+    return response
+
+
+def gerar_xlsx(exportacao, destino, app=None, lote=LOTE, progresso=None):
+    """Escreve o XLSX em ``destino`` (caminho ou arquivo) com memória constante"""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(exportacao.titulo[:31])
+    ws.append(exportacao.cabecalho)
+
+    with pooled_connection(app) as conn:
+        for linha in linhas(conn, exportacao, lote, progresso):
+            ws.append(exportacao.formatar_xlsx(linha))
+
+    wb.save(destino)
+
+
+def resposta_xlsx(exportacao):
+    arquivo = tempfile.SpooledTemporaryFile(
+        max_size=current_app.config["EXPORT_SPOOL_MAX_BYTES"]
+    )
+    try:
+        gerar_xlsx(exportacao, arquivo)
+        arquivo.seek(0)
+    except Exception:
+        arquivo.close()
+        raise
+    # send_file fecha o arquivo quando a resposta termina
+    return send_file(
+        arquivo,
+        mimetype=XLSX_MIMETYPE,
+        as_attachment=True,
+        download_name=f"{exportacao.nome}.xlsx",
+    )
@@ -0,0 +1,188 @@
+"""Índice reverso: (tipo, bairro) -> clientes ordenados por renda.
+
+É o espelho do motor de compatibilidade. Dado um estabelecimento
+``(tipo, bairro, faixa_min)``, os clientes que casam com ele são o sufixo do
+grupo com ``renda_mensal >= faixa_min``, achado por busca binária. Numa escrita
+em estabelecimentos, ``afetados(antes, depois)`` devolve exatamente os
+clientes que ganharam ou perderam o estabelecimento:
+
+- mesmo grupo: rendas entre a faixa_min antiga e a nova;
+- grupo diferente (ou inclusão/exclusão): o sufixo de cada grupo.
+
+Com ``vizinhos`` (os do ranking) entram também os clientes dos bairros
+vizinhos, que têm o imóvel entre os candidatos. Quando só ``faixa_max`` ou
+``valor_medio`` mudam, ninguém ganha nem perde o imóvel, mas a nota muda para
+todos os candidatos: ``reordenados`` devolve esses clientes.
+
+O custo é proporcional ao número de clientes afetados, não ao da base.
+
+Escritas em clientes não recarregam o índice do worker que as fez:
+``registrar`` tira/põe o cliente no grupo e adota a versão lida na transação
+da escrita, se nenhuma outra escrita entrou no meio. Os demais workers
+recarregam quando a versão ``clientes`` muda. As listas de um grupo nunca são
+alteradas no lugar: a escrita troca o par (rendas, ids) por cópias, então
+``entre``/``afetados`` leem sem lock um par consistente.
+"""
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+
+from flask import current_app
+
+from core.services.matching import chave, normalizar
+from core.utils.versioning import VersionedCache
+
+
+class IndiceClientes(VersionedCache):
+    def __init__(self, intervalo=5.0):
+        super().__init__("clientes", intervalo=intervalo)
+        self._grupos = {}
+        self._clientes = {}  # id -> (chave, renda), para achar o cliente no grupo
+
+    def carregar(self, cursor):
+        cursor.execute(
+            """
+            SELECT id, interesse_tipo, interesse_bairro, renda_mensal
+            FROM clientes
+            WHERE renda_mensal IS NOT NULL
+            ORDER BY renda_mensal, id
+            """
+        )
+        grupos, clientes = {}, {}
+        for row in cursor.fetchall():
+            grupo = chave(row["interesse_tipo"], row["interesse_bairro"])
+            rendas, ids = grupos.setdefault(grupo, ([], []))
+            rendas.append(row["renda_mensal"])
+            ids.append(row["id"])
+            clientes[row["id"]] = (grupo, row["renda_mensal"])
+        self._grupos = grupos
+        self._clientes = clientes
+
+    def _posicao(self, rendas, ids, renda, cliente_id):
+        """Posição de (renda, id) no grupo, que é ordenado pelos dois"""
+        return bisect_left(
+            ids, cliente_id, bisect_left(rendas, renda), bisect_right(rendas, renda)
+        )
+
+    # remover/inserir: só sob self._lock (via registrar)
+    def remover(self, cliente_id):
+        atual = self._clientes.pop(cliente_id, None)
+        if atual is None:
+            return
+        grupo, renda = atual
+        rendas, ids = self._grupos[grupo]
+        pos = self._posicao(rendas, ids, renda, cliente_id)
+        self._grupos[grupo] = (rendas[:pos] + rendas[pos + 1:], ids[:pos] + ids[pos + 1:])
+
+    def inserir(self, cliente_id, tipo, bairro, renda):
+        """Põe (ou move) o cliente no grupo; renda ``None`` só o retira"""
+        self.remover(cliente_id)
+        if renda is None:
+            return
+        grupo = chave(tipo, bairro)
+        rendas, ids = self._grupos.get(grupo, ([], []))
+        pos = self._posicao(rendas, ids, renda, cliente_id)
+        self._grupos[grupo] = (
+            rendas[:pos] + [renda] + rendas[pos:],
+            ids[:pos] + [cliente_id] + ids[pos:],
+        )
+        self._clientes[cliente_id] = (grupo, renda)
+
+    def registrar(self, cliente_id, depois, versao):
+        """Aplica a escrita de um cliente (``depois`` = (tipo, bairro, renda) ou ``None``).
+
+        ``versao`` é a de ``clientes`` logo após o ``bump_version`` da escrita;
+        se o índice estava na anterior, passa a ela sem recarregar.
+        """
+        with self._lock:
+            if self.versoes is None:
+                return  # a carga já vai ler o cliente
+            if depois is None:
+                self.remover(cliente_id)
+            else:
+                self.inserir(cliente_id, *depois)
+            if self.versoes.get("clientes") == versao - 1:
+                self.versoes = {"clientes": versao}
+
+    def entre(self, tipo, bairro, minimo, maximo=None):
+        """IDs do grupo com ``minimo <= renda`` (e ``renda < maximo``, se informado)"""
+        grupo = self._grupos.get(chave(tipo, bairro))
+        if grupo is None or minimo is None:
+            return []
+        rendas, ids = grupo
+        inicio = bisect_left(rendas, minimo)
+        fim = bisect_left(rendas, maximo) if maximo is not None else len(rendas)
+        return ids[inicio:fim]
+
+    def afetados(self, antes, depois, vizinhos=None):
+        """Clientes cuja compatibilidade muda de ``antes`` para ``depois``.
+
+        Cada lado é ``(tipo, bairro, faixa_min)`` ou ``None`` (inclusão/exclusão);
+        ``vizinhos`` é o mapa bairro -> bairros próximos do ranking.
+        """
+        vizinhos = vizinhos or {}
+        ids = set()
+        if antes and depois and chave(*antes[:2]) == chave(*depois[:2]):
+            if antes[2] is None or depois[2] is None:
+                menor, maior = depois[2] if antes[2] is None else antes[2], None
+            else:
+                menor, maior = sorted((antes[2], depois[2]))
+            for bairro in (antes[1], *vizinhos.get(normalizar(antes[1]), ())):
+                ids.update(self.entre(antes[0], bairro, menor, maior))
+            return sorted(ids)
+
+        for lado in (antes, depois):
+            if lado:
+                for bairro in (lado[1], *vizinhos.get(normalizar(lado[1]), ())):
+                    ids.update(self.entre(lado[0], bairro, lado[2]))
+        return sorted(ids)
+
+
+_indice = IndiceClientes()
+
+
+def get_indice(conn, verificar=False):
+    """Índice do processo; ``verificar=True`` confere a versão agora (usado nas escritas)"""
+    _indice.intervalo = current_app.config["MATCHING_REFRESH_SECONDS"]
+    return _indice.atualizar(conn, forcar=verificar)
+
+
+def _renda(valor):
+    """Renda/faixa como Decimal, comparável às rendas carregadas do banco"""
+    return None if valor in (None, "") else Decimal(str(valor))
+
+
+def _lado(lado):
+    """(tipo, bairro, faixa_min) de ``(tipo, bairro, faixa_min, faixa_max, valor_medio)``"""
+    if lado is None:
+        return None
+    tipo, bairro, faixa_min = lado[:3]
+    return tipo, bairro, _renda(faixa_min)
+
+
+def registrar(cliente_id, depois, versao):
+    """Aplica no índice do processo a escrita já confirmada de um cliente.
+
+    ``depois`` é ``(tipo, bairro, renda)`` ou ``None`` (exclusão); ``versao`` é
+    a de ``clientes`` lida na transação, logo após o ``bump_version``.
+    """
+    if depois is not None:
+        tipo, bairro, renda = depois
+        depois = (tipo, bairro, _renda(renda))
+    _indice.registrar(cliente_id, depois, versao)
+
+
+def afetados(conn, antes, depois, vizinhos=None):
+    return get_indice(conn, verificar=True).afetados(_lado(antes), _lado(depois), vizinhos)
+
+
+def reordenados(conn, antes, depois, vizinhos=None):
+    """Candidatos do imóvel cuja nota muda porque ``faixa_max``/``valor_medio`` mudaram"""
+    if antes is None or depois is None:
+        return []
+    if [_renda(v) for v in antes[3:]] == [_renda(v) for v in depois[3:]]:
+        return []
+    return get_indice(conn, verificar=True).afetados(None, _lado(depois), vizinhos)
+
+
+def invalidar():
+    _indice.invalidar()
@@ -0,0 +1,155 @@
+"""Clientes cuja renda não cai em nenhuma faixa de preço cadastrada.
+
+As faixas ``[faixa_min, faixa_max]`` dos estabelecimentos são fundidas em
+intervalos disjuntos e ordenados, guardados como dois arrays NumPy. Saber se
+uma renda está coberta vira uma busca binária pelo último intervalo que começa
+antes dela: todos os clientes são classificados em O((n + m) log m), sem a
+subconsulta correlacionada por cliente.
+
+Para filtrar no SQL (listagem e exportação), ``condicao_sem_faixa`` devolve o
+mesmo critério como predicado de intervalos sobre ``renda_mensal``: um
+``BETWEEN`` por faixa fundida até ``MAX_FAIXAS_SQL``; acima disso as faixas
+vão num único parâmetro JSON, lido com ``JSON_TABLE`` (MySQL 8), e o SQL não
+cresce com o número de faixas.
+
+Um estabelecimento novo é fundido no índice na hora (``adicionar``); edições e
+exclusões descartam o índice (``invalidar``), que é refeito na próxima consulta.
+Os demais workers recarregam quando a versão ``estabelecimentos`` muda.
+"""
+import json
+
+import numpy as np
+from flask import current_app
+
+from core.utils.versioning import VersionedCache
+
+MAX_FAIXAS_SQL = 32
+
+
+def fundir(inicios, fins):
+    """Une intervalos fechados sobrepostos; retorna (inícios, fins) ordenados"""
+    inicios = np.asarray(inicios, dtype=float)
+    fins = np.asarray(fins, dtype=float)
+    if not len(inicios):
+        return np.empty(0), np.empty(0)
+
+    ordem = np.argsort(inicios, kind="stable")
+    inicios, fins = inicios[ordem], fins[ordem]
+    # Maior fim visto até cada posição; um intervalo novo começa quando o
+    # início passa desse fim
+    alcance = np.maximum.accumulate(fins)
+    novo = np.empty(len(inicios), dtype=bool)
+    novo[0] = True
+    novo[1:] = inicios[1:] > alcance[:-1]
+    grupos = np.flatnonzero(novo)
+    return inicios[grupos], np.maximum.reduceat(fins, grupos)
+
+
+def cobertas(inicios, fins, rendas):
+    """Máscara booleana: renda dentro de algum intervalo (NaN nunca está)"""
+    rendas = np.asarray(rendas, dtype=float)
+    if not len(inicios):
+        return np.zeros(len(rendas), dtype=bool)
+    pos = np.searchsorted(inicios, rendas, side="right") - 1
+    dentro = pos >= 0
+    dentro[dentro] = rendas[dentro] <= fins[pos[dentro]]
+    return dentro
+
+
+class IndiceFaixas(VersionedCache):
+    """Faixas de preço de todos os estabelecimentos, fundidas"""
+
+    def __init__(self, intervalo=5.0):
+        super().__init__("estabelecimentos", intervalo=intervalo)
+        self._intervalos = (np.empty(0), np.empty(0))
+
+    def carregar(self, cursor):
+        cursor.execute(
+            """
+            SELECT faixa_min, faixa_max
+            FROM estabelecimentos
+            WHERE faixa_min IS NOT NULL AND faixa_max IS NOT NULL
+              AND faixa_min <= faixa_max
+            """
+        )
+        rows = cursor.fetchall()
+        self._intervalos = fundir(
+            [float(row["faixa_min"]) for row in rows],
+            [float(row["faixa_max"]) for row in rows],
+        )
+
+    def adicionar(self, faixa_min, faixa_max):
+        """Funde uma faixa nova sem recarregar do banco"""
+        if faixa_min is None or faixa_max is None or faixa_min > faixa_max:
+            return
+        with self._lock:
+            # Só sobre um índice já carregado; senão a carga pega a faixa
+            if self.versoes is None:
+                return
+            inicios, fins = self._intervalos
+            self._intervalos = fundir(
+                np.append(inicios, float(faixa_min)), np.append(fins, float(faixa_max))
+            )
+
+    def intervalos(self):
+        return self._intervalos
+
+    def cobertas(self, rendas):
+        return cobertas(*self._intervalos, rendas)
+
+
+_indice = IndiceFaixas()
+
+
+def get_indice(conn):
+    """Índice do processo, atualizado se ``estabelecimentos`` mudou"""
+    _indice.intervalo = current_app.config["MATCHING_REFRESH_SECONDS"]
+    return _indice.atualizar(conn)
+
+
+def adicionar(faixa_min, faixa_max):
+    _indice.adicionar(faixa_min, faixa_max)
+
+
+def invalidar():
+    _indice.invalidar()
+
+
+def sem_faixa(conn):
+    """IDs (ordenados) dos clientes cuja renda não está em nenhuma faixa"""
+    indice = get_indice(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, renda_mensal FROM clientes ORDER BY id")
+    rows = cursor.fetchall()
+    if not rows:
+        return np.empty(0, dtype=np.int64)
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    rendas = np.fromiter(
+        (np.nan if row[1] is None else float(row[1]) for row in rows),
+        dtype=float,
+        count=len(rows),
+    )
+    return ids[~indice.cobertas(rendas)]
+
+
+def condicao_sem_faixa(conn, coluna="renda_mensal"):
+    """(sql, params): renda nula ou fora de todos os intervalos fundidos"""
+    inicios, fins = get_indice(conn).intervalos()
+    if not len(inicios):
+        return "1 = 1", []
+    if len(inicios) <= MAX_FAIXAS_SQL:
+        faixas = " OR ".join([f"{coluna} BETWEEN %s AND %s"] * len(inicios))
+        params = [float(valor) for par in zip(inicios, fins) for valor in par]
+        return f"({coluna} IS NULL OR NOT ({faixas}))", params
+
+    sql = f"""({coluna} IS NULL OR NOT EXISTS (
+        SELECT 1 FROM JSON_TABLE(
+            %s, '$[*]' COLUMNS (inicio DOUBLE PATH '$[0]', fim DOUBLE PATH '$[1]')
+        ) AS faixas
+        WHERE {coluna} BETWEEN faixas.inicio AND faixas.fim
+    ))"""
+    return sql, [json.dumps(list(zip(inicios.tolist(), fins.tolist())))]
+
+
+def contar_sem_faixa(conn):
+    return int(len(sem_faixa(conn)))
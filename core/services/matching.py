@@ -0,0 +1,126 @@
+"""Motor de compatibilidade cliente x estabelecimento.
+
+Um estabelecimento é compatível com o cliente quando
+``tipo = interesse_tipo AND bairro = interesse_bairro AND faixa_min <= renda_mensal``.
+Em vez de reavaliar esse predicado no banco para cada cliente, os
+estabelecimentos ficam agrupados em memória por (tipo, bairro), cada grupo com
+as faixas mínimas ordenadas: a busca de um cliente vira uma busca binária.
+"""
+import unicodedata
+from bisect import bisect_right
+from functools import lru_cache
+
+import numpy as np
+from flask import current_app
+
+from core.utils.versioning import VersionedCache
+
+
+def normalizar(valor):
+    """Normaliza texto como a collation do MySQL (sem caixa, acento e espaços nas pontas)"""
+    if valor is None:
+        return ""
+    decomposto = unicodedata.normalize("NFKD", str(valor).strip())
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+@lru_cache(maxsize=4096)
+def chave(tipo, bairro):
+    return normalizar(tipo), normalizar(bairro)
+
+
+class MatchingEngine(VersionedCache):
+    """Índice de estabelecimentos por (tipo, bairro) ordenado por ``faixa_min``"""
+
+    def __init__(self, intervalo=5.0):
+        super().__init__("estabelecimentos", intervalo=intervalo)
+        self._grupos = {}
+        self._detalhes = {}
+        self._arrays = ({}, np.empty(0, dtype=np.int64), np.empty(0))
+
+    def carregar(self, cursor):
+        cursor.execute(
+            """
+            SELECT id, tipo, bairro, faixa_min, faixa_max, valor_medio
+            FROM estabelecimentos
+            WHERE faixa_min IS NOT NULL
+            ORDER BY faixa_min, id
+            """
+        )
+        grupos = {}
+        detalhes = {}
+        for row in cursor.fetchall():
+            faixas, ids = grupos.setdefault(chave(row["tipo"], row["bairro"]), ([], []))
+            faixas.append(row["faixa_min"])
+            ids.append(row["id"])
+            detalhes[row["id"]] = (row["faixa_min"], row["faixa_max"], row["valor_medio"])
+
+        # O mesmo índice em arrays NumPy, ordenados por (código do grupo, faixa_min)
+        codigos = {k: codigo for codigo, k in enumerate(grupos)}
+        est_faixa = np.asarray(
+            [float(f) for faixas, _ in grupos.values() for f in faixas], dtype=float
+        )
+        est_chave = np.repeat(
+            np.arange(len(grupos), dtype=np.int64),
+            [len(faixas) for faixas, _ in grupos.values()],
+        )
+
+        # Troca atômica: leitores concorrentes veem o índice antigo ou o novo
+        self._grupos = grupos
+        self._detalhes = detalhes
+        self._arrays = (codigos, est_chave, est_faixa)
+
+    def _limite(self, grupo, renda):
+        if grupo is None or renda is None:
+            return 0
+        return bisect_right(grupo[0], renda)
+
+    def compativeis(self, tipo, bairro, renda):
+        """IDs dos estabelecimentos compatíveis, em ordem crescente de faixa_min"""
+        grupo = self._grupos.get(chave(tipo, bairro))
+        limite = self._limite(grupo, renda)
+        return grupo[1][:limite] if limite else []
+
+    def detalhes(self, estabelecimento_id):
+        """(faixa_min, faixa_max, valor_medio) do estabelecimento indexado"""
+        return self._detalhes.get(estabelecimento_id)
+
+    def contar(self, tipo, bairro, renda):
+        return self._limite(self._grupos.get(chave(tipo, bairro)), renda)
+
+    def arrays(self):
+        """(códigos dos grupos, chave por estabelecimento, faixa_min), ordenados"""
+        return self._arrays
+
+    def contar_lote(self, clientes):
+        """Conta as ofertas de vários clientes de uma vez.
+
+        ``clientes`` é um iterável de dicts com ``interesse_tipo``,
+        ``interesse_bairro`` e ``renda_mensal``; retorna as contagens na mesma
+        ordem. Cada (tipo, bairro) é normalizado e resolvido uma única vez.
+        """
+        grupos = self._grupos
+        resolvidos = {}
+        contagens = []
+        for cliente in clientes:
+            bruto = (cliente["interesse_tipo"], cliente["interesse_bairro"])
+            if bruto not in resolvidos:
+                resolvidos[bruto] = grupos.get(chave(*bruto))
+            contagens.append(self._limite(resolvidos[bruto], cliente["renda_mensal"]))
+        return contagens
+
+
+_engine = MatchingEngine()
+
+
+def get_engine(conn, verificar=False):
+    """Engine do processo, atualizado se ``estabelecimentos`` mudou.
+
+    ``verificar=True`` confere a versão agora, sem esperar o intervalo (escritas).
+    """
+    _engine.intervalo = current_app.config["MATCHING_REFRESH_SECONDS"]
+    return _engine.atualizar(conn, forcar=verificar)
+
+
+def invalidar():
+    _engine.invalidar()
@@ -0,0 +1,103 @@
+"""Contagem vetorizada de ofertas e recomendações para todos os clientes.
+
+Usada para reconstruir ``client_offer_stats`` inteira
+(``client_stats.reconstruir``): clientes e estabelecimentos viram arrays NumPy
+e a contagem de todos os clientes sai de duas buscas binárias vetorizadas.
+"""
+import numpy as np
+
+from core.services import matching
+
+
+def contar_ofertas(cli_chave, cli_renda, est_chave, est_faixa):
+    """Número de estabelecimentos compatíveis com cada cliente.
+
+    ``est_chave``/``est_faixa`` precisam estar ordenados por (chave, faixa).
+    Clientes com chave negativa (grupo inexistente) ou renda NaN contam zero.
+
+    Faixas e rendas ganham um rank comum, o que permite combinar grupo e valor
+    em uma única chave inteira ``chave * base + rank``: o número de ofertas é a
+    posição dessa chave menos o início do grupo do cliente.
+    """
+    contagem = np.zeros(len(cli_chave), dtype=np.int64)
+    if not len(est_chave) or not len(cli_chave):
+        return contagem
+
+    cli_renda = np.where(np.isnan(cli_renda), -np.inf, cli_renda)
+    _, ranks = np.unique(np.concatenate([est_faixa, cli_renda]), return_inverse=True)
+    ranks = ranks.reshape(-1).astype(np.int64)
+    base = int(ranks.max()) + 1
+
+    est_comp = est_chave * base + ranks[: len(est_faixa)]
+    cli_comp = cli_chave * base + ranks[len(est_faixa):]
+
+    inicio = np.searchsorted(est_chave, cli_chave, side="left")
+    fim = np.searchsorted(est_comp, cli_comp, side="right")
+    validos = cli_chave >= 0
+    contagem[validos] = (fim - inicio)[validos]
+    return contagem
+
+
+def contar_recomendacoes(cli_ids, rec_cliente_ids, rec_totais):
+    """Distribui ``rec_totais`` (por cliente_id) na ordem de ``cli_ids``"""
+    contagem = np.zeros(len(cli_ids), dtype=np.int64)
+    if not len(rec_cliente_ids) or not len(cli_ids):
+        return contagem
+
+    ordem = np.argsort(cli_ids, kind="stable")
+    ids_ordenados = cli_ids[ordem]
+    pos = np.searchsorted(ids_ordenados, rec_cliente_ids)
+    pos = np.minimum(pos, len(ids_ordenados) - 1)
+    encontrados = ids_ordenados[pos] == rec_cliente_ids
+    np.add.at(contagem, ordem[pos[encontrados]], rec_totais[encontrados])
+    return contagem
+
+
+class OfferStats:
+    """Ofertas e recomendações por cliente, na ordem de ``ids``"""
+
+    def __init__(self, ids, total_ofertas, total_recomendacoes):
+        self.ids = ids
+        self.total_ofertas = total_ofertas
+        self.total_recomendacoes = total_recomendacoes
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def calcular(conn):
+    """Carrega clientes e recomendações e calcula as contagens em lote"""
+    engine = matching.get_engine(conn)
+    codigos, est_chave, est_faixa = engine.arrays()
+    cursor = conn.cursor()
+
+    cursor.execute(
+        """
+        SELECT id, interesse_tipo, interesse_bairro, renda_mensal
+        FROM clientes
+        ORDER BY id
+        """
+    )
+    clientes = cursor.fetchall()
+
+    n = len(clientes)
+    cli_ids = np.fromiter((c[0] for c in clientes), dtype=np.int64, count=n)
+    cli_chave = np.fromiter(
+        (codigos.get(matching.chave(c[1], c[2]), -1) for c in clientes),
+        dtype=np.int64,
+        count=n,
+    )
+    cli_renda = np.fromiter(
+        (np.nan if c[3] is None else float(c[3]) for c in clientes), dtype=float, count=n
+    )
+
+    cursor.execute("SELECT cliente_id, COUNT(*) FROM recomendacoes GROUP BY cliente_id")
+    recomendacoes = cursor.fetchall()
+    rec_cliente_ids = np.fromiter((r[0] for r in recomendacoes), dtype=np.int64)
+    rec_totais = np.fromiter((r[1] for r in recomendacoes), dtype=np.int64)
+
+    return OfferStats(
+        cli_ids,
+        contar_ofertas(cli_chave, cli_renda, est_chave, est_faixa),
+        contar_recomendacoes(cli_ids, rec_cliente_ids, rec_totais),
+    )
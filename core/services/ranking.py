@@ -0,0 +1,103 @@
+"""Pontuação e top-k dos estabelecimentos candidatos de cada cliente.
+
+Os candidatos são os mesmos do motor de compatibilidade (mesmo tipo,
+``faixa_min <= renda``) no bairro de interesse e, com peso menor, nos bairros
+vizinhos configurados em ``RECOMENDACAO_BAIRROS_VIZINHOS``. Cada candidato
+recebe uma nota de 0 a 1, soma ponderada (``RECOMENDACAO_PESOS``) de:
+
+- ``faixa``: 1 com a renda dentro de [faixa_min, faixa_max]; acima do teto cai
+  na proporção ``faixa_max / renda``;
+- ``centro``: proximidade da renda ao centro da faixa;
+- ``valor``: proximidade do ``valor_medio`` à renda;
+- ``bairro``: 1 no bairro de interesse, ``RECOMENDACAO_PESO_VIZINHO`` no vizinho.
+
+Só os ``k`` melhores ficam em um heap mínimo de tamanho ``k``, então o custo é
+O(candidatos · log k) por cliente e a memória não depende do número de
+candidatos.
+"""
+import heapq
+
+from flask import current_app
+
+from core.services.matching import chave, normalizar
+
+
+class Pontuador:
+    def __init__(self, pesos, peso_vizinho=0.5, vizinhos=None):
+        total = sum(pesos.values()) or 1.0
+        self.pesos = {nome: peso / total for nome, peso in pesos.items()}
+        self.peso_vizinho = peso_vizinho
+        # Vizinhança simétrica, nas chaves normalizadas do motor
+        self.vizinhos = {}
+        for bairro, proximos in (vizinhos or {}).items():
+            for proximo in proximos:
+                self.vizinhos.setdefault(normalizar(bairro), set()).add(normalizar(proximo))
+                self.vizinhos.setdefault(normalizar(proximo), set()).add(normalizar(bairro))
+
+    def pontuar(self, renda, faixa_min, faixa_max, valor_medio, bairro_exato=True):
+        renda = float(renda)
+        faixa_min = float(faixa_min)
+        faixa_max = float(faixa_max) if faixa_max is not None else faixa_min
+
+        if renda <= faixa_max:
+            faixa = 1.0
+        else:
+            faixa = faixa_max / renda if renda > 0 else 0.0
+
+        meia_faixa = (faixa_max - faixa_min) / 2
+        centro = 1.0
+        if meia_faixa > 0:
+            centro = max(0.0, 1.0 - abs(renda - (faixa_min + meia_faixa)) / (meia_faixa * 2))
+
+        valor = 0.0
+        if valor_medio is not None and renda > 0:
+            valor = max(0.0, 1.0 - abs(float(valor_medio) - renda) / renda)
+
+        bairro = 1.0 if bairro_exato else self.peso_vizinho
+        return (
+            self.pesos.get("faixa", 0) * faixa
+            + self.pesos.get("centro", 0) * centro
+            + self.pesos.get("valor", 0) * valor
+            + self.pesos.get("bairro", 0) * bairro
+        )
+
+    def top_k(self, engine, cliente, k):
+        """[(nota, estabelecimento_id)] dos ``k`` melhores, da maior nota para a menor"""
+        renda = cliente["renda_mensal"]
+        if renda is None:
+            return []
+        tipo, bairro = chave(cliente["interesse_tipo"], cliente["interesse_bairro"])
+
+        grupos = [(bairro, True)]
+        grupos.extend((vizinho, False) for vizinho in sorted(self.vizinhos.get(bairro, ())))
+
+        heap = []
+        for bairro_grupo, exato in grupos:
+            for estabelecimento_id in engine.compativeis(tipo, bairro_grupo, renda):
+                detalhes = engine.detalhes(estabelecimento_id)
+                if detalhes is None:
+                    continue
+                item = (self.pontuar(renda, *detalhes, bairro_exato=exato), -estabelecimento_id)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+        # Empate na nota: menor id primeiro
+        return [(nota, -negativo) for nota, negativo in sorted(heap, reverse=True)]
+
+    def top_k_lote(self, engine, clientes, k):
+        """{cliente_id: [(nota, estabelecimento_id)]} para vários clientes de uma vez"""
+        return {cliente["id"]: self.top_k(engine, cliente, k) for cliente in clientes}
+
+
+def get_pontuador(app=None):
+    """Pontuador com os pesos da configuração (um por app)"""
+    app = app or current_app
+    if "pontuador" not in app.extensions:
+        app.extensions["pontuador"] = Pontuador(
+            app.config["RECOMENDACAO_PESOS"],
+            app.config["RECOMENDACAO_PESO_VIZINHO"],
+            app.config["RECOMENDACAO_BAIRROS_VIZINHOS"],
+        )
+    return app.extensions["pontuador"]
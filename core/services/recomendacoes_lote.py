@@ -0,0 +1,387 @@
+"""Geração de recomendações para todos os clientes ativos, em blocos.
+
+Os clientes com ``status = 'ativo'`` são percorridos em ordem de id, em blocos
+de ``tamanho`` clientes. Para cada bloco os candidatos saem do ranking em
+memória (``ranking.Pontuador.top_k_lote``) e as linhas de ``recomendacoes`` e
+``recomendacao_estabelecimentos`` são gravadas com ``executemany`` em uma
+única transação, junto com o progresso do lote (``recomendacoes_lotes``).
+Se o processo cair, o bloco em andamento é desfeito e ``executar`` retoma do
+último cliente confirmado.
+
+Clientes que já têm uma recomendação ativa ou em seleção são pulados, e os
+sem candidatos não ganham recomendação vazia. Um lock nomeado do MySQL impede
+duas execuções ao mesmo tempo, em qualquer worker.
+
+Depois, escritas em estabelecimentos chamam ``atualizar_afetados``: o índice
+reverso de clientes diz quem ganhou ou perdeu o imóvel, só esses têm
+``client_offer_stats`` recalculado e entram em ``recomendacoes_pendentes``,
+junto com os clientes cuja nota do imóvel mudou (bairros vizinhos,
+``faixa_max``, ``valor_medio``).
+``atualizar_pendentes`` (em segundo plano, via ``agendar_pendentes``) refaz
+os imóveis das recomendações geradas em lote desses clientes; as montadas à
+mão não são alteradas.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from core.services import client_stats, indice_clientes, matching, ranking
+from core.utils.db_connection import pooled_connection
+from core.utils.versioning import bump_version
+
+logger = logging.getLogger(__name__)
+
+LOCK = "habitta_recomendacoes_lote"
+LOCK_PENDENTES = "habitta_recomendacoes_pendentes"
+
+
+class LoteEmExecucao(Exception):
+    """Outra execução do lote está em andamento"""
+
+
+def _lote_pendente(cursor):
+    cursor.execute(
+        """
+        SELECT * FROM recomendacoes_lotes
+        WHERE status IN ('executando', 'interrompido')
+        ORDER BY id DESC
+        LIMIT 1
+        """
+    )
+    return cursor.fetchone()
+
+
+def _novo_lote(conn, cursor):
+    cursor.execute("INSERT INTO recomendacoes_lotes (status) VALUES ('executando')")
+    lote_id = cursor.lastrowid
+    conn.commit()
+    cursor.execute("SELECT * FROM recomendacoes_lotes WHERE id = %s", (lote_id,))
+    return cursor.fetchone()
+
+
+def status(cursor, lote_id):
+    cursor.execute("SELECT * FROM recomendacoes_lotes WHERE id = %s", (lote_id,))
+    return cursor.fetchone()
+
+
+def _proximo_bloco(cursor, ultimo_id, tamanho):
+    cursor.execute(
+        """
+        SELECT c.id, c.interesse_tipo, c.interesse_bairro, c.renda_mensal
+        FROM clientes c
+        WHERE c.status = 'ativo' AND c.id > %s
+        ORDER BY c.id
+        LIMIT %s
+        """,
+        (ultimo_id, tamanho),
+    )
+    return cursor.fetchall()
+
+
+def _com_recomendacao(cursor, cliente_ids):
+    placeholders = ", ".join(["%s"] * len(cliente_ids))
+    cursor.execute(
+        f"""
+        SELECT DISTINCT cliente_id FROM recomendacoes
+        WHERE cliente_id IN ({placeholders}) AND status IN ('ativa', 'selecionar')
+        """,
+        cliente_ids,
+    )
+    return {row["cliente_id"] for row in cursor.fetchall()}
+
+
+def _gravar_bloco(conn, cursor, lote_id, melhores):
+    """Insere as recomendações do bloco; retorna quantas foram criadas"""
+    clientes = [cliente_id for cliente_id, itens in melhores.items() if itens]
+    if not clientes:
+        return 0
+
+    cursor.executemany(
+        "INSERT INTO recomendacoes (cliente_id, status, lote_id) VALUES (%s, 'ativa', %s)",
+        [(cliente_id, lote_id) for cliente_id in clientes],
+    )
+    # Ids gerados, sem depender de auto-incremento consecutivo
+    placeholders = ", ".join(["%s"] * len(clientes))
+    cursor.execute(
+        f"""
+        SELECT id, cliente_id FROM recomendacoes
+        WHERE lote_id = %s AND cliente_id IN ({placeholders})
+        """,
+        (lote_id, *clientes),
+    )
+    recomendacao_por_cliente = {row["cliente_id"]: row["id"] for row in cursor.fetchall()}
+
+    _inserir_imoveis(cursor, recomendacao_por_cliente, melhores)
+    client_stats.recalcular_clientes(conn, clientes)
+    return len(clientes)
+
+
+def _inserir_imoveis(cursor, recomendacao_por_cliente, melhores):
+    linhas = [
+        (recomendacao_id, estabelecimento_id)
+        for cliente_id, recomendacao_id in recomendacao_por_cliente.items()
+        for _, estabelecimento_id in melhores.get(cliente_id, ())
+    ]
+    if linhas:
+        cursor.executemany(
+            """
+            INSERT INTO recomendacao_estabelecimentos (recomendacao_id, estabelecimento_id)
+            VALUES (%s, %s)
+            """,
+            linhas,
+        )
+
+
+def executar(app=None, tamanho=None, k=None, novo=False, progresso=None):
+    """Gera as recomendações, retomando o último lote interrompido (``novo=False``).
+
+    ``progresso(lote)`` é chamado a cada bloco confirmado com a linha atual de
+    ``recomendacoes_lotes``. Retorna o resumo com a vazão da execução.
+    """
+    app = app or current_app._get_current_object()
+    tamanho = tamanho or app.config["RECOMENDACAO_LOTE_TAMANHO"]
+    k = k or app.config["RECOMENDACAO_TOP_K"]
+    pontuador = ranking.get_pontuador(app)
+
+    with app.app_context(), pooled_connection(app) as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT GET_LOCK(%s, 0) AS obtido", (LOCK,))
+        if not cursor.fetchone()["obtido"]:
+            raise LoteEmExecucao()
+
+        try:
+            lote = None if novo else _lote_pendente(cursor)
+            if lote is None:
+                lote = _novo_lote(conn, cursor)
+            elif lote["status"] != "executando":
+                cursor.execute(
+                    "UPDATE recomendacoes_lotes SET status = 'executando', erro = NULL WHERE id = %s",
+                    (lote["id"],),
+                )
+                conn.commit()
+
+            inicio = time.perf_counter()
+            processados = criadas = 0
+            try:
+                while True:
+                    bloco = _proximo_bloco(cursor, lote["ultimo_cliente_id"], tamanho)
+                    if not bloco:
+                        break
+
+                    engine = matching.get_engine(conn)
+                    ja_tem = _com_recomendacao(cursor, [c["id"] for c in bloco])
+                    melhores = pontuador.top_k_lote(
+                        engine, [c for c in bloco if c["id"] not in ja_tem], k
+                    )
+                    novas = _gravar_bloco(conn, cursor, lote["id"], melhores)
+
+                    cursor.execute(
+                        """
+                        UPDATE recomendacoes_lotes
+                        SET ultimo_cliente_id = %s,
+                            clientes_processados = clientes_processados + %s,
+                            recomendacoes_criadas = recomendacoes_criadas + %s
+                        WHERE id = %s
+                        """,
+                        (bloco[-1]["id"], len(bloco), novas, lote["id"]),
+                    )
+                    conn.commit()
+                    client_stats.invalidar()
+
+                    processados += len(bloco)
+                    criadas += novas
+                    lote = status(cursor, lote["id"])
+                    logger.info(
+                        "Lote %s: %d clientes, %d recomendações (%.0f clientes/s)",
+                        lote["id"], lote["clientes_processados"], lote["recomendacoes_criadas"],
+                        processados / max(time.perf_counter() - inicio, 1e-9),
+                    )
+                    if progresso:
+                        progresso(lote)
+            except Exception as e:
+                conn.rollback()
+                cursor.execute(
+                    "UPDATE recomendacoes_lotes SET status = 'interrompido', erro = %s WHERE id = %s",
+                    (str(e), lote["id"]),
+                )
+                bump_version(cursor, "client_offer_stats")
+                conn.commit()
+                raise
+
+            cursor.execute(
+                """
+                UPDATE recomendacoes_lotes
+                SET status = 'concluido', concluido_em = CURRENT_TIMESTAMP
+                WHERE id = %s
+                """,
+                (lote["id"],),
+            )
+            # Versão de client_offer_stats: uma vez por execução, não por bloco
+            bump_version(cursor, "client_offer_stats")
+            conn.commit()
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK,))
+            cursor.fetchall()
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "lote_id": lote["id"],
+        "clientes": processados,
+        "recomendacoes": criadas,
+        "segundos": round(segundos, 2),
+        "clientes_por_segundo": round(processados / segundos, 1) if segundos else None,
+    }
+
+
+def executar_em_segundo_plano(app=None, **opcoes):
+    """Dispara ``executar`` em uma thread; erros ficam no log e na tabela do lote"""
+    app = app or current_app._get_current_object()
+
+    def rodar():
+        try:
+            executar(app, **opcoes)
+        except LoteEmExecucao:
+            logger.info("Lote de recomendações já em execução")
+        except Exception:
+            logger.exception("Falha no lote de recomendações")
+
+    thread = threading.Thread(target=rodar, name="recomendacoes-lote", daemon=True)
+    thread.start()
+    return thread
+
+
+def atualizar_afetados(conn, cursor, antes, depois, engine):
+    """Recalcula e enfileira só os clientes cujo resultado muda com o imóvel.
+
+    ``antes``/``depois`` são ``(tipo, bairro, faixa_min, faixa_max, valor_medio)``
+    do estabelecimento (``None`` na inclusão/exclusão) e ``engine`` o motor de
+    compatibilidade obtido antes da escrita. Quem ganhou ou perdeu o
+    imóvel tem ``client_offer_stats`` recalculado; a fila recebe também os
+    clientes dos bairros vizinhos e, se ``faixa_max`` ou ``valor_medio`` mudou,
+    todos os que têm o imóvel entre os candidatos. Roda na transação da
+    escrita; retorna os clientes enfileirados.
+    """
+    ids = indice_clientes.afetados(conn, antes, depois)
+    if ids:
+        client_stats.recalcular_clientes(conn, ids, antes, depois, engine)
+
+    vizinhos = ranking.get_pontuador().vizinhos
+    fila = set(ids)
+    fila.update(indice_clientes.afetados(conn, antes, depois, vizinhos))
+    fila.update(indice_clientes.reordenados(conn, antes, depois, vizinhos))
+    if not fila:
+        return []
+    fila = sorted(fila)
+    cursor.executemany(
+        """
+        INSERT INTO recomendacoes_pendentes (cliente_id) VALUES (%s)
+        ON DUPLICATE KEY UPDATE enfileirado_em = CURRENT_TIMESTAMP(6)
+        """,
+        [(cliente_id,) for cliente_id in fila],
+    )
+    return fila
+
+
+def atualizar_pendentes(app=None, tamanho=None, k=None):
+    """Refaz as recomendações geradas em lote dos clientes pendentes; retorna quantos"""
+    app = app or current_app._get_current_object()
+    tamanho = tamanho or app.config["RECOMENDACAO_LOTE_TAMANHO"]
+    k = k or app.config["RECOMENDACAO_TOP_K"]
+    pontuador = ranking.get_pontuador(app)
+    total = 0
+
+    with app.app_context(), pooled_connection(app) as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT GET_LOCK(%s, 0) AS obtido", (LOCK_PENDENTES,))
+        if not cursor.fetchone()["obtido"]:
+            return 0  # outro worker já está consumindo a fila
+
+        try:
+            while True:
+                cursor.execute(
+                    """
+                    SELECT p.cliente_id, p.enfileirado_em,
+                           c.interesse_tipo, c.interesse_bairro, c.renda_mensal
+                    FROM recomendacoes_pendentes p
+                    JOIN clientes c ON c.id = p.cliente_id
+                    ORDER BY p.enfileirado_em
+                    LIMIT %s
+                    """,
+                    (tamanho,),
+                )
+                pendentes = cursor.fetchall()
+                if not pendentes:
+                    break
+
+                ids = [p["cliente_id"] for p in pendentes]
+                placeholders = ", ".join(["%s"] * len(ids))
+                cursor.execute(
+                    f"""
+                    SELECT id, cliente_id FROM recomendacoes
+                    WHERE cliente_id IN ({placeholders})
+                      AND lote_id IS NOT NULL AND status = 'ativa'
+                    """,
+                    ids,
+                )
+                geradas = {row["cliente_id"]: row["id"] for row in cursor.fetchall()}
+
+                if geradas:
+                    engine = matching.get_engine(conn)
+                    melhores = pontuador.top_k_lote(
+                        engine,
+                        [dict(p, id=p["cliente_id"]) for p in pendentes if p["cliente_id"] in geradas],
+                        k,
+                    )
+                    placeholders_rec = ", ".join(["%s"] * len(geradas))
+                    cursor.execute(
+                        f"""
+                        DELETE FROM recomendacao_estabelecimentos
+                        WHERE recomendacao_id IN ({placeholders_rec})
+                        """,
+                        list(geradas.values()),
+                    )
+                    _inserir_imoveis(cursor, geradas, melhores)
+
+                # Só sai da fila quem não foi enfileirado de novo enquanto isso
+                cursor.executemany(
+                    """
+                    DELETE FROM recomendacoes_pendentes
+                    WHERE cliente_id = %s AND enfileirado_em <= %s
+                    """,
+                    [(p["cliente_id"], p["enfileirado_em"]) for p in pendentes],
+                )
+                conn.commit()
+                total += len(pendentes)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_PENDENTES,))
+            cursor.fetchall()
+
+    if total:
+        logger.info("Recomendações de %d clientes pendentes atualizadas", total)
+    return total
+
+
+def agendar_pendentes(app=None):
+    """Agenda ``atualizar_pendentes`` no executor do processo (uma por vez)"""
+    app = app or current_app._get_current_object()
+    executor = app.extensions["recomendacoes_pendentes"]
+
+    def rodar():
+        try:
+            atualizar_pendentes(app)
+        except Exception:
+            logger.exception("Falha ao atualizar recomendações pendentes")
+
+    executor.submit(rodar)
+
+
+def init_app(app):
+    app.extensions["recomendacoes_pendentes"] = ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="recomendacoes-pendentes"
+    )
@@ -0,0 +1,92 @@
+"""Dados de referência dos formulários: tipos de estabelecimento e bairros.
+
+Carregados uma vez por worker e recarregados quando as versões
+``tipos_estabelecimento`` ou ``estabelecimentos`` mudam. Os bairros são os
+distintos de ``estabelecimentos`` (os únicos que o motor de compatibilidade
+consegue casar), agrupados pela mesma normalização do motor; de cada grupo
+fica a grafia mais usada. Ficam disponíveis nos templates como
+``tipos_estabelecimento()`` e ``bairros()`` e em JSON nas rotas
+``main.referencias_*``.
+"""
+from bisect import bisect_left
+
+from flask import current_app
+
+from core.services.matching import normalizar
+from core.utils.db_connection import get_db_connection
+from core.utils.versioning import VersionedCache
+
+
+class Referencias(VersionedCache):
+    def __init__(self, intervalo=5.0):
+        super().__init__("tipos_estabelecimento", "estabelecimentos", intervalo=intervalo)
+        self._tipos = []
+        self._bairros = ([], [])  # (chaves normalizadas ordenadas, grafias)
+
+    def carregar(self, cursor):
+        cursor.execute("SELECT nome FROM tipos_estabelecimento ORDER BY nome")
+        tipos = [row["nome"] for row in cursor.fetchall()]
+
+        cursor.execute(
+            """
+            SELECT bairro, COUNT(*) AS total
+            FROM estabelecimentos
+            WHERE bairro IS NOT NULL AND bairro <> ''
+            GROUP BY bairro
+            """
+        )
+        grafias = {}
+        for row in cursor.fetchall():
+            chave = normalizar(row["bairro"])
+            if not chave:
+                continue
+            atual = grafias.get(chave)
+            if atual is None or row["total"] > atual[1]:
+                grafias[chave] = (row["bairro"].strip(), row["total"])
+
+        chaves = sorted(grafias)
+        self._tipos = tipos
+        self._bairros = (chaves, [grafias[chave][0] for chave in chaves])
+
+    def tipos(self):
+        return self._tipos
+
+    def bairros(self, prefixo="", limite=None):
+        """Bairros em ordem normalizada; ``prefixo`` filtra ignorando caixa e acento"""
+        chaves, grafias = self._bairros
+        if not prefixo:
+            return grafias[:limite] if limite else list(grafias)
+
+        prefixo = normalizar(prefixo)
+        inicio = bisect_left(chaves, prefixo)
+        resultado = []
+        for i in range(inicio, len(chaves)):
+            if not chaves[i].startswith(prefixo) or (limite and len(resultado) >= limite):
+                break
+            resultado.append(grafias[i])
+        return resultado
+
+
+_referencias = Referencias()
+
+
+def get_referencias(conn=None):
+    """Referências do processo, atualizadas se os dados mudaram"""
+    _referencias.intervalo = current_app.config["MATCHING_REFRESH_SECONDS"]
+    return _referencias.atualizar(conn or get_db_connection())
+
+
+def tipos_estabelecimento():
+    return get_referencias().tipos()
+
+
+def bairros(prefixo="", limite=None):
+    return get_referencias().bairros(prefixo, limite)
+
+
+def invalidar():
+    _referencias.invalidar()
+
+
+def init_app(app):
+    app.jinja_env.globals.update(tipos_estabelecimento=tipos_estabelecimento, bairros=bairros)
@@ -0,0 +1,138 @@
+"""Contagens diárias pré-calculadas para os gráficos do dashboard.
+
+A tabela ``rollup_diario`` guarda, por dia, novos clientes, novas
+recomendações e recomendações por status e por tipo de estabelecimento. Os
+gráficos leem só essa tabela, então o custo não cresce com o histórico.
+
+``atualizar(conn, desde)`` refaz os dias a partir de ``desde`` na mesma
+transação (apaga e reinsere), sob um lock nomeado do MySQL: só uma
+atualização roda por vez, em qualquer worker. As rotas dos gráficos refazem os
+últimos ``ROLLUP_JANELA_DIAS`` dias quando a última atualização passou de
+``ROLLUP_REFRESH_SECONDS``, sem esperar o lock (se outro pedido já está
+refazendo, servem as contagens atuais); ``flask estatisticas rollups`` faz o
+mesmo por cron, esperando o lock, e ``--tudo`` reconstrói o histórico (ex.:
+depois de mudanças de status antigas).
+"""
+import datetime
+
+from core.utils.versioning import bump_version
+
+LOCK = "habitta_rollups"
+
+# métrica -> (coluna de data, FROM/JOIN, expressão da chave, expressão contada)
+METRICAS = {
+    "novos_clientes": ("c.criado_em", "clientes c", "''", "*"),
+    "novas_recomendacoes": ("r.data", "recomendacoes r", "''", "*"),
+    "recomendacoes_status": ("r.data", "recomendacoes r", "r.status", "*"),
+    "recomendacoes_tipo": (
+        "r.data",
+        """recomendacoes r
+        JOIN recomendacao_estabelecimentos re ON re.recomendacao_id = r.id
+        JOIN estabelecimentos e ON e.id = re.estabelecimento_id""",
+        "e.tipo",
+        "DISTINCT r.id",
+    ),
+}
+
+
+def atualizar(conn, desde=None, espera=-1):
+    """Refaz as contagens a partir da data ``desde`` (``None``: todo o histórico).
+
+    Espera o lock por até ``espera`` segundos (negativo: sem limite; 0: não
+    espera). Retorna ``False``, sem mexer em nada, se não o obteve.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK, espera))
+    if not cursor.fetchone()[0]:
+        return False
+
+    try:
+        if desde is None:
+            cursor.execute("DELETE FROM rollup_diario")
+        else:
+            cursor.execute("DELETE FROM rollup_diario WHERE dia >= %s", (desde,))
+
+        for metrica, (coluna, origem, chave, contado) in METRICAS.items():
+            filtro = f"WHERE {coluna} >= %s" if desde is not None else ""
+            cursor.execute(
+                f"""
+                INSERT INTO rollup_diario (metrica, dia, chave, total)
+                SELECT %s, DATE({coluna}), COALESCE({chave}, ''), COUNT({contado})
+                FROM {origem}
+                {filtro}
+                GROUP BY DATE({coluna}), COALESCE({chave}, '')
+                """,
+                (metrica,) if desde is None else (metrica, desde),
+            )
+
+        bump_version(cursor, "rollups")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK,))
+        cursor.fetchall()
+    return True
+
+
+def atualizar_recentes(conn, dias, espera=-1):
+    return atualizar(conn, datetime.date.today() - datetime.timedelta(days=dias - 1), espera)
+
+
+def versao(cursor):
+    """(versão, atualizado_em, segundos desde a atualização); versão 0 se nunca calculadas"""
+    cursor.execute(
+        """
+        SELECT versao, atualizado_em, TIMESTAMPDIFF(SECOND, atualizado_em, NOW())
+        FROM versoes_dados
+        WHERE nome = 'rollups'
+        """
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return 0, None, None
+    return tuple(row.values()) if isinstance(row, dict) else tuple(row)
+
+
+def _dias(desde, ate):
+    return [desde + datetime.timedelta(days=i) for i in range((ate - desde).days + 1)]
+
+
+def serie_diaria(cursor, metricas, desde, ate):
+    """{"labels": [dias], "series": {métrica: [totais]}} com zero nos dias vazios"""
+    placeholders = ", ".join(["%s"] * len(metricas))
+    cursor.execute(
+        f"""
+        SELECT metrica, dia, SUM(total)
+        FROM rollup_diario
+        WHERE metrica IN ({placeholders}) AND dia BETWEEN %s AND %s
+        GROUP BY metrica, dia
+        """,
+        (*metricas, desde, ate),
+    )
+    dias = _dias(desde, ate)
+    posicao = {dia: i for i, dia in enumerate(dias)}
+    series = {metrica: [0] * len(dias) for metrica in metricas}
+    for metrica, dia, total in cursor.fetchall():
+        series[metrica][posicao[dia]] = int(total)
+    return {"labels": [dia.isoformat() for dia in dias], "series": series}
+
+
+def distribuicao(cursor, metrica, desde, ate):
+    """{"labels": [chaves], "valores": [totais]} do período, do maior para o menor"""
+    cursor.execute(
+        """
+        SELECT chave, SUM(total) AS total
+        FROM rollup_diario
+        WHERE metrica = %s AND dia BETWEEN %s AND %s
+        GROUP BY chave
+        ORDER BY total DESC, chave
+        """,
+        (metrica, desde, ate),
+    )
+    rows = cursor.fetchall()
+    return {
+        "labels": [chave or "—" for chave, _ in rows],
+        "valores": [int(total) for _, total in rows],
+    }
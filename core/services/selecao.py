@@ -0,0 +1,156 @@
+"""Seleção manual dos imóveis de uma recomendação.
+
+``aplicar`` recebe um lote de inclusões e remoções e grava tudo com um
+``INSERT`` e um ``DELETE`` de várias linhas, na transação de quem chama; a
+tela de seleção manda os cliques acumulados de uma vez e recebe de volta o
+estado final da seleção.
+
+A tela lista os selecionados fixos no topo (``fixados``, pela chave primária
+de ``recomendacao_estabelecimentos``) e, abaixo, os demais candidatos
+paginados por chave e filtrados por tipo, bairro e faixa de preço
+(``candidatos``), só com as colunas que o card usa.
+"""
+from core.services.matching import normalizar
+from core.utils import pagination
+
+# Colunas do card e do modal de detalhes
+COLUNAS = """
+    e.id, e.nome, e.tipo, e.bairro, e.faixa_min, e.faixa_max, e.valor_medio,
+    e.contato_nome, e.contato_telefone, e.observacoes
+"""
+
+
+def normalizar_ids(valores):
+    """IDs inteiros, sem repetição e na ordem em que chegaram (``ValueError`` se inválidos)"""
+    if valores is None:
+        return []
+    if isinstance(valores, (str, bytes, dict)):
+        raise ValueError("esperada uma lista de IDs")
+    return list(dict.fromkeys(int(valor) for valor in valores))
+
+
+def selecionados(cursor, recomendacao_id):
+    """IDs dos estabelecimentos selecionados na recomendação"""
+    cursor.execute(
+        """
+        SELECT estabelecimento_id FROM recomendacao_estabelecimentos
+        WHERE recomendacao_id = %s
+        ORDER BY estabelecimento_id
+        """,
+        (recomendacao_id,),
+    )
+    return [row["estabelecimento_id"] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
+
+def aplicar(cursor, recomendacao_id, adicionar=(), remover=()):
+    """Inclui ``adicionar`` e exclui ``remover``; um ID nas duas listas é removido.
+
+    Só estabelecimentos existentes são incluídos. Retorna ``(incluidos, removidos)``.
+    """
+    remover = normalizar_ids(remover)
+    adicionar = [i for i in normalizar_ids(adicionar) if i not in remover]
+    incluidos = removidos = 0
+
+    if adicionar:
+        placeholders = ", ".join(["%s"] * len(adicionar))
+        cursor.execute(
+            f"""
+            INSERT IGNORE INTO recomendacao_estabelecimentos (recomendacao_id, estabelecimento_id)
+            SELECT %s, id FROM estabelecimentos WHERE id IN ({placeholders})
+            """,
+            [recomendacao_id, *adicionar],
+        )
+        incluidos = cursor.rowcount
+
+    if remover:
+        placeholders = ", ".join(["%s"] * len(remover))
+        cursor.execute(
+            f"""
+            DELETE FROM recomendacao_estabelecimentos
+            WHERE recomendacao_id = %s AND estabelecimento_id IN ({placeholders})
+            """,
+            [recomendacao_id, *remover],
+        )
+        removidos = cursor.rowcount
+
+    return incluidos, removidos
+
+
+def filtros_sql(filtros):
+    """(where, params) de ``{"tipo", "bairro", "faixa_min", "faixa_max"}``.
+
+    A faixa informada casa com os imóveis cuja faixa de preço a intersecta.
+    """
+    where, params = [], []
+    if filtros.get("tipo"):
+        where.append("e.tipo = %s")
+        params.append(filtros["tipo"])
+    if filtros.get("bairro"):
+        where.append("e.bairro = %s")
+        params.append(filtros["bairro"])
+    if filtros.get("faixa_max") is not None:
+        where.append("e.faixa_min <= %s")
+        params.append(filtros["faixa_max"])
+    if filtros.get("faixa_min") is not None:
+        where.append("(e.faixa_max IS NULL OR e.faixa_max >= %s)")
+        params.append(filtros["faixa_min"])
+    return where, params
+
+
+def fixados(cursor, recomendacao_id):
+    """Imóveis já selecionados, em ordem de nome"""
+    cursor.execute(
+        f"""
+        SELECT {COLUNAS}, 1 AS selecionado
+        FROM recomendacao_estabelecimentos re
+        JOIN estabelecimentos e ON e.id = re.estabelecimento_id
+        WHERE re.recomendacao_id = %s
+        ORDER BY e.nome, e.id
+        """,
+        (recomendacao_id,),
+    )
+    return cursor.fetchall()
+
+
+def candidatos(cursor, recomendacao_id, filtros, token, per_page):
+    """Página dos imóveis não selecionados que passam nos filtros: (pagina, total, exato?)"""
+    where, params = filtros_sql(filtros)
+    where.append(
+        """NOT EXISTS (
+            SELECT 1 FROM recomendacao_estabelecimentos re
+            WHERE re.recomendacao_id = %s AND re.estabelecimento_id = e.id
+        )"""
+    )
+    params.append(recomendacao_id)
+
+    pagina = pagination.paginar(
+        cursor,
+        f"SELECT {COLUNAS}, 0 AS selecionado",
+        "FROM estabelecimentos e",
+        where,
+        params,
+        token,
+        per_page,
+        col_nome="e.nome",
+        col_id="e.id",
+    )
+    # A contagem não depende da seleção: muda a cada clique e só pesaria no cache
+    where_total, params_total = filtros_sql(filtros)
+    total, exato = pagination.contar(
+        cursor, "estabelecimentos", "FROM estabelecimentos e", where_total, params_total
+    )
+    return pagina, total, exato
+
+
+def marcar_compatibilidade(imoveis, cliente):
+    """Preenche ``compat_bairro`` e ``compat_renda`` de cada imóvel para o cliente"""
+    bairro = normalizar(cliente["interesse_bairro"])
+    renda = cliente["renda_mensal"]
+    for imovel in imoveis:
+        imovel["compat_bairro"] = normalizar(imovel["bairro"]) == bairro
+        imovel["compat_renda"] = (
+            renda is not None and imovel["faixa_min"] is not None and imovel["faixa_min"] <= renda
+        ) and (
+            imovel["faixa_max"] is None or renda <= imovel["faixa_max"]
+        )
+    return imoveis
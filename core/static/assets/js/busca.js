@@ -0,0 +1,60 @@
+// Busca da barra superior: sugere clientes e imóveis enquanto se digita.
+// Enter sem escolher uma sugestão envia o formulário (busca na listagem de
+// recomendações).
+(function () {
+    const campo = $('#buscaGlobal');
+    const resultados = $('#buscaGlobalResultados');
+    if (!campo.length) {
+        return;
+    }
+
+    let temporizador = null;
+    let ultimaBusca = '';
+
+    const texto = (valor) => $('<div>').text(valor == null ? '' : valor).html();
+
+    const mostrar = (itens) => {
+        if (!itens.length) {
+            resultados.removeClass('show').empty();
+            return;
+        }
+        resultados.html(itens.map(item => `
+            <a class="dropdown-item d-flex align-items-center" href="${texto(item.url)}">
+                <i class="fas ${item.tipo === 'cliente' ? 'fa-user' : 'fa-building'} fa-fw mr-2 text-gray-400"></i>
+                <div>
+                    <div>${texto(item.texto)}</div>
+                    <small class="text-gray-500">${texto(item.detalhe)}</small>
+                </div>
+            </a>`).join('')).addClass('show');
+    };
+
+    campo.on('input', function () {
+        const busca = campo.val().trim();
+        clearTimeout(temporizador);
+        if (busca.length < 2) {
+            ultimaBusca = '';
+            mostrar([]);
+            return;
+        }
+        temporizador = setTimeout(() => {
+            ultimaBusca = busca;
+            fetch(`${campo.data('url')}?q=${encodeURIComponent(busca)}`, {
+                headers: { 'Accept': 'application/json' }
+            })
+                .then(response => response.json())
+                .then(itens => {
+                    // Ignora respostas de buscas já substituídas
+                    if (busca === ultimaBusca) {
+                        mostrar(itens);
+                    }
+                })
+                .catch(error => console.error('Erro na busca:', error));
+        }, 150);
+    });
+
+    $(document).on('click', function (e) {
+        if (!$(e.target).closest('.navbar-search').length) {
+            resultados.removeClass('show');
+        }
+    });
+})();
@@ -35,14 +35,67 @@
         }
     });
 }
-// Inicialização do DataTable
+// Escapa texto vindo do servidor antes de montar HTML
+const ENTIDADES_HTML = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+
+function escaparHtml(valor) {
+    return String(valor == null ? '' : valor).replace(/[&<>"']/g, c => ENTIDADES_HTML[c]);
+}
+
+const BADGES_TIPO = { comercial: 'success', residencial: 'info', ambos: 'warning' };
+
+// Inicialização do DataTable (server-side: ordenação, busca e paginação no SQL)
 $(document).ready(function () {
-    $('#dataTable').DataTable({
+    const tabela = $('#dataTable');
+    tabela.DataTable({
         "language": {
             "url": "//cdn.datatables.net/plug-ins/1.10.25/i18n/Portuguese-Brasil.json"
         },
+        "processing": true,
+        "serverSide": true,
+        "ajax": ajaxPorChave(tabela.data('url')),
+        "search": { "search": tabela.data('busca') || '' },
+        "searchDelay": 400,
         "order": [[0, "asc"]],
-        "responsive": true
+        "responsive": true,
+        "columns": [
+            { "data": "nome", "render": $.fn.dataTable.render.text() },
+            {
+                "data": "interesse_tipo",
+                "render": function (tipo) {
+                    const texto = tipo ? tipo.charAt(0).toUpperCase() + tipo.slice(1) : '';
+                    return `<span class="badge badge-${BADGES_TIPO[tipo] || 'secondary'}">${escaparHtml(texto)}</span>`;
+                }
+            },
+            { "data": "interesse_bairro", "render": $.fn.dataTable.render.text() },
+            {
+                "data": "renda_mensal",
+                "render": function (renda) {
+                    return `R$ ${parseFloat(renda || 0).toFixed(2)}`;
+                }
+            },
+            {
+                "data": "id",
+                "orderable": false,
+                "render": function (id, type, cliente) {
+                    return `
+                        <button class="btn btn-info btn-sm" onclick="carregarModal('ver', ${id})">
+                            <i class="far fa-eye"></i>
+                        </button>
+                        <button class="btn btn-warning btn-sm" onclick="carregarModal('editar', ${id})">
+                            <i class="far fa-edit"></i>
+                        </button>
+                        <button class="btn btn-danger btn-sm btn-excluir" data-id="${id}"
+                            data-nome="${escaparHtml(cliente.nome)}">
+                            <i class="far fa-trash-alt"></i>
+                        </button>`;
+                }
+            }
+        ]
+    });
+
+    tabela.on('click', '.btn-excluir', function () {
+        confirmarExclusao($(this).data('id'), escaparHtml($(this).data('nome')));
     });
 });
 
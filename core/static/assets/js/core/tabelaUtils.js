@@ -0,0 +1,28 @@
+// Ajax das tabelas server-side (core/utils/datatables.py) com paginação por
+// chave: ao ir para a página seguinte ou anterior, envia a chave da última ou
+// da primeira linha da página atual (apos/antes) e o servidor busca a partir
+// dela em vez de usar OFFSET. Qualquer outro salto vai só com start/length.
+function ajaxPorChave(url) {
+    let atual = null;
+    let pedido = null;
+
+    return {
+        url: url,
+        data: function (d) {
+            // Mesma busca e ordenação: a chave da página atual ainda vale
+            const assinatura = JSON.stringify([d.search.value, d.order]);
+            if (atual && atual.assinatura === assinatura && d.length === atual.length) {
+                if (d.start === atual.start + atual.length && atual.chaves.ultimo) {
+                    d.apos = atual.chaves.ultimo;
+                } else if (d.start === atual.start - atual.length && atual.chaves.primeiro) {
+                    d.antes = atual.chaves.primeiro;
+                }
+            }
+            pedido = { assinatura: assinatura, start: d.start, length: d.length };
+        },
+        dataSrc: function (json) {
+            atual = Object.assign({}, pedido, { chaves: json.chaves || {} });
+            return json.data;
+        }
+    };
+}
@@ -35,14 +35,65 @@ function confirmarExclusao(id, nome) {
         }
     });
 }
-// Inicialização do DataTable
+const ENTIDADES_HTML = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+
+// Escapa texto vindo do servidor antes de montar HTML
+function escaparHtml(valor) {
+    return String(valor == null ? '' : valor).replace(/[&<>"']/g, c => ENTIDADES_HTML[c]);
+}
+
+// Inicialização do DataTable (server-side: ordenação, busca e paginação no SQL)
 $(document).ready(function () {
-    $('#dataTable').DataTable({
+    const tabela = $('#dataTable');
+    tabela.DataTable({
         "language": {
             "url": "//cdn.datatables.net/plug-ins/1.10.25/i18n/Portuguese-Brasil.json"
         },
+        "processing": true,
+        "serverSide": true,
+        "ajax": ajaxPorChave(tabela.data('url')),
+        "searchDelay": 400,
+        "search": { "search": tabela.data('busca') || '' },
         "order": [[0, "asc"]],
-        "responsive": true
+        "responsive": true,
+        "columns": [
+            { "data": "nome", "render": $.fn.dataTable.render.text() },
+            {
+                "data": "tipo",
+                "render": function (tipo) {
+                    const texto = tipo ? tipo.charAt(0).toUpperCase() + tipo.slice(1) : '';
+                    return `<span class="badge badge-${tipo === 'comercial' ? 'success' : 'info'}">${escaparHtml(texto)}</span>`;
+                }
+            },
+            { "data": "bairro", "render": $.fn.dataTable.render.text() },
+            {
+                "data": "faixa_min",
+                "render": function (faixaMin, type, est) {
+                    return `R$ ${parseFloat(faixaMin || 0).toFixed(2)} - R$ ${parseFloat(est.faixa_max || 0).toFixed(2)}`;
+                }
+            },
+            {
+                "data": "id",
+                "orderable": false,
+                "render": function (id, type, est) {
+                    return `
+                        <button class="btn btn-info btn-sm" onclick="carregarModal('ver', ${id})">
+                            <i class="far fa-eye"></i>
+                        </button>
+                        <button class="btn btn-warning btn-sm" onclick="carregarModal('editar', ${id})">
+                            <i class="far fa-edit"></i>
+                        </button>
+                        <button class="btn btn-danger btn-sm btn-excluir" data-id="${id}"
+                            data-nome="${escaparHtml(est.nome)}">
+                            <i class="far fa-trash-alt"></i>
+                        </button>`;
+                }
+            }
+        ]
+    });
+
+    tabela.on('click', '.btn-excluir', function () {
+        confirmarExclusao($(this).data('id'), escaparHtml($(this).data('nome')));
     });
 });
 
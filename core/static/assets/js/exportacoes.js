@@ -0,0 +1,55 @@
+// Exportações em segundo plano: links com data-job-url agendam a geração,
+// acompanham o progresso e baixam o arquivo quando fica pronto. Sem JS o
+// href normal continua exportando direto.
+$(document).on('click', '.js-exportar', function (e) {
+    e.preventDefault();
+    const jobUrl = $(this).data('job-url');
+
+    Swal.fire({
+        title: 'Gerando exportação...',
+        html: 'Preparando arquivo <b id="exportacao-progresso"></b>',
+        allowOutsideClick: false,
+        didOpen: () => Swal.showLoading()
+    });
+
+    // Resposta de erro (404 de job desconhecido, 500...) encerra o acompanhamento
+    const lerJob = (response) => response.json()
+        .catch(() => ({}))
+        .then(job => {
+            if (!response.ok) {
+                throw new Error(job.erro || (response.status === 404
+                    ? 'Exportação não encontrada'
+                    : `Falha ao consultar a exportação (HTTP ${response.status})`));
+            }
+            return job;
+        });
+
+    const acompanhar = (job) => {
+        if (job.status === 'concluido') {
+            Swal.close();
+            window.location.href = job.download_url;
+        } else if (job.status === 'erro') {
+            Swal.fire('Erro!', job.erro || 'Falha ao gerar a exportação', 'error');
+        } else {
+            if (job.progresso !== null) {
+                $('#exportacao-progresso').text(`${job.progresso}%`);
+            }
+            setTimeout(() => {
+                fetch(job.status_url, { headers: { 'Accept': 'application/json' } })
+                    .then(lerJob)
+                    .then(acompanhar)
+                    .catch(falhou);
+            }, 1000);
+        }
+    };
+
+    const falhou = (error) => {
+        console.error('Erro:', error);
+        Swal.fire('Erro!', error instanceof TypeError ? 'Falha na comunicação' : error.message, 'error');
+    };
+
+    fetch(jobUrl, { method: 'POST', headers: { 'Accept': 'application/json' } })
+        .then(lerJob)
+        .then(acompanhar)
+        .catch(falhou);
+});
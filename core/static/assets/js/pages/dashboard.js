@@ -0,0 +1,113 @@
+// Cards do dashboard: a página chega sem os números e cada card busca o seu
+// valor em paralelo; um card que falha mostra "—" sem afetar os demais.
+document.querySelectorAll('[data-widget]').forEach(card => {
+    fetch(card.dataset.url, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json().then(dados => {
+            if (!response.ok) {
+                throw new Error(dados.erro || `HTTP ${response.status}`);
+            }
+            card.textContent = Number(dados.valor).toLocaleString('pt-BR');
+        }))
+        .catch(error => {
+            console.error(`Erro ao carregar ${card.dataset.widget}:`, error);
+            card.textContent = '—';
+            card.title = 'Erro ao carregar dados';
+        });
+});
+
+// Gráficos do dashboard: os dados vêm das rotas /dashboard/graficos/*, que
+// leem as contagens diárias pré-calculadas e respondem com ETag (o navegador
+// revalida e recebe 304 enquanto as contagens não mudam).
+Chart.defaults.global.defaultFontFamily = 'Nunito, -apple-system, system-ui, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif';
+Chart.defaults.global.defaultFontColor = '#858796';
+
+const CORES = ['#4e73df', '#1cc88a', '#36b9cc', '#f6c23e', '#e74a3b', '#858796'];
+
+const buscarGrafico = (url) =>
+    fetch(url, { headers: { 'Accept': 'application/json' }, cache: 'no-cache' })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.json();
+        });
+
+const formatarDia = (iso) => {
+    const [ano, mes, dia] = iso.split('-');
+    return `${dia}/${mes}`;
+};
+
+const graficoDiario = document.getElementById('graficoDiario');
+if (graficoDiario) {
+    buscarGrafico(graficoDiario.dataset.url)
+        .then(dados => {
+            const linha = (label, valores, cor) => ({
+                label: label,
+                data: valores,
+                lineTension: 0.3,
+                backgroundColor: 'rgba(0, 0, 0, 0)',
+                borderColor: cor,
+                pointRadius: 2,
+                pointBackgroundColor: cor,
+                pointBorderColor: cor,
+                pointHitRadius: 10,
+            });
+            new Chart(graficoDiario, {
+                type: 'line',
+                data: {
+                    labels: dados.labels.map(formatarDia),
+                    datasets: [
+                        linha('Novos clientes', dados.series.novos_clientes, CORES[0]),
+                        linha('Novas recomendações', dados.series.novas_recomendacoes, CORES[1]),
+                    ],
+                },
+                options: {
+                    maintainAspectRatio: false,
+                    scales: {
+                        xAxes: [{ gridLines: { display: false }, ticks: { maxTicksLimit: 10 } }],
+                        yAxes: [{ ticks: { beginAtZero: true, precision: 0, maxTicksLimit: 5 } }],
+                    },
+                    tooltips: { mode: 'index', intersect: false },
+                },
+            });
+        })
+        .catch(error => console.error('Erro ao carregar gráfico diário:', error));
+}
+
+const graficoRecomendacoes = document.getElementById('graficoRecomendacoes');
+let pizza = null;
+
+const carregarRecomendacoes = (url) =>
+    buscarGrafico(url)
+        .then(dados => {
+            if (pizza) {
+                pizza.destroy();
+            }
+            pizza = new Chart(graficoRecomendacoes, {
+                type: 'doughnut',
+                data: {
+                    labels: dados.labels,
+                    datasets: [{
+                        data: dados.valores,
+                        backgroundColor: dados.labels.map((_, i) => CORES[i % CORES.length]),
+                        hoverBorderColor: 'rgba(234, 236, 244, 1)',
+                    }],
+                },
+                options: {
+                    maintainAspectRatio: false,
+                    legend: { position: 'bottom' },
+                    cutoutPercentage: 70,
+                },
+            });
+        })
+        .catch(error => console.error('Erro ao carregar gráfico de recomendações:', error));
+
+if (graficoRecomendacoes) {
+    carregarRecomendacoes(graficoRecomendacoes.dataset.url);
+
+    $(document).on('click', '.js-grafico-recomendacoes', function (e) {
+        e.preventDefault();
+        $('#graficoRecomendacoesPor').text($(this).data('por') === 'tipo' ? 'tipo' : 'status');
+        carregarRecomendacoes($(this).data('url'));
+    });
+}
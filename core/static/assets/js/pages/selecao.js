@@ -0,0 +1,153 @@
+// Seleção manual: cada clique muda o card na hora e entra numa fila; a fila é
+// enviada de uma vez (POST JSON) depois de uma pausa curta, e a resposta traz a
+// seleção gravada, que passa a valer na tela. Sem recarregar a página.
+(function () {
+    const lista = document.getElementById('listaSelecao');
+    if (!lista) {
+        return;
+    }
+
+    const ESPERA_MS = 400;
+    const pendentes = new Map(); // id -> true (adicionar) / false (remover)
+    let selecionados = new Set(
+        Array.from(lista.querySelectorAll('.imovel-card[data-selecionado="sim"]'), card => card.dataset.id)
+    );
+    let timer = null;
+    let enviando = false;
+
+    const desenharBotao = (botao, selecionado) => {
+        botao.classList.toggle('btn-danger', selecionado);
+        botao.classList.toggle('btn-success', !selecionado);
+        botao.innerHTML = selecionado
+            ? `<i class="fas fa-times"></i> ${botao.dataset.textoRemover}`
+            : `<i class="fas fa-plus"></i> ${botao.dataset.textoAdicionar}`;
+    };
+
+    const desenharImovel = (id, selecionado) => {
+        const card = lista.querySelector(`.imovel-card[data-id="${id}"]`);
+        if (card) {
+            card.dataset.selecionado = selecionado ? 'sim' : 'nao';
+            const cabecalho = card.querySelector('[data-selecao="cabecalho"]');
+            cabecalho.classList.toggle('bg-success', selecionado);
+            cabecalho.classList.toggle('text-white', selecionado);
+            cabecalho.classList.toggle('bg-light', !selecionado);
+            const preco = card.querySelector('[data-selecao="preco"]');
+            preco.classList.toggle('badge-light', selecionado);
+            preco.classList.toggle('badge-primary', !selecionado);
+        }
+        document.querySelectorAll(`[data-selecao="alternar"][data-id="${id}"]`)
+            .forEach(botao => desenharBotao(botao, selecionado));
+    };
+
+    const desenharProgresso = () => {
+        const progresso = document.getElementById('progressoSelecao');
+        if (!progresso) {
+            return;
+        }
+        const ids = new Set([...selecionados, ...pendentes.keys()]);
+        const total = [...ids].filter(id => (pendentes.has(id) ? pendentes.get(id) : true)).length;
+        const percentual = Math.min(100, Math.round((total / Number(progresso.dataset.total)) * 100));
+        progresso.querySelector('[data-selecao="contagem"]').textContent = `${total}/${progresso.dataset.total}`;
+        const barra = progresso.querySelector('[data-selecao="barra"]');
+        barra.style.width = `${percentual}%`;
+        barra.textContent = `${percentual}%`;
+        progresso.querySelector('[data-selecao="total"]').textContent = total;
+        progresso.querySelector('[data-selecao="finalizar"]').classList.toggle('d-none', total === 0);
+    };
+
+    // Estado exibido = seleção gravada + cliques ainda na fila
+    const desenharTudo = () => {
+        lista.querySelectorAll('.imovel-card').forEach(card => {
+            const id = card.dataset.id;
+            desenharImovel(id, pendentes.has(id) ? pendentes.get(id) : selecionados.has(id));
+        });
+        desenharProgresso();
+    };
+
+    const enviar = () => {
+        timer = null;
+        if (enviando || pendentes.size === 0) {
+            return;
+        }
+        const lote = new Map(pendentes);
+        pendentes.clear();
+        enviando = true;
+
+        const corpo = { adicionar: [], remover: [] };
+        lote.forEach((selecionar, id) => corpo[selecionar ? 'adicionar' : 'remover'].push(Number(id)));
+
+        fetch(lista.dataset.url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' },
+            body: JSON.stringify(corpo),
+        })
+            .then(response => response.json().then(dados => {
+                if (!response.ok) {
+                    throw new Error(dados.erro || `HTTP ${response.status}`);
+                }
+                selecionados = new Set(dados.selecionados.map(String));
+            }))
+            .catch(error => {
+                console.error('Erro ao atualizar seleção:', error);
+                alert(`Não foi possível salvar a seleção: ${error.message}`);
+            })
+            .finally(() => {
+                enviando = false;
+                desenharTudo();
+                if (pendentes.size > 0) {
+                    agendar();
+                }
+            });
+    };
+
+    const agendar = () => {
+        clearTimeout(timer);
+        timer = setTimeout(enviar, ESPERA_MS);
+    };
+
+    document.addEventListener('click', event => {
+        const botao = event.target.closest('[data-selecao="alternar"]');
+        if (!botao) {
+            return;
+        }
+        const id = botao.dataset.id;
+        const atual = pendentes.has(id) ? pendentes.get(id) : selecionados.has(id);
+        if (!atual === selecionados.has(id)) {
+            pendentes.delete(id); // voltou ao estado gravado
+        } else {
+            pendentes.set(id, !atual);
+        }
+        desenharImovel(id, !atual);
+        desenharProgresso();
+        agendar();
+    });
+
+    // Finalizar só depois que a fila foi gravada
+    const finalizar = document.querySelector('[data-selecao="finalizar"]');
+    if (finalizar) {
+        finalizar.addEventListener('submit', event => {
+            if (event.defaultPrevented || (pendentes.size === 0 && !enviando)) {
+                return;
+            }
+            event.preventDefault();
+            event.stopImmediatePropagation();
+            enviar();
+            const aguardar = setInterval(() => {
+                if (pendentes.size === 0 && !enviando) {
+                    clearInterval(aguardar);
+                    finalizar.submit();
+                }
+            }, 100);
+        });
+    }
+
+    // Não perde cliques na fila ao sair da página
+    window.addEventListener('pagehide', () => {
+        if (pendentes.size === 0) {
+            return;
+        }
+        const corpo = { adicionar: [], remover: [] };
+        pendentes.forEach((selecionar, id) => corpo[selecionar ? 'adicionar' : 'remover'].push(Number(id)));
+        navigator.sendBeacon(lista.dataset.url, new Blob([JSON.stringify(corpo)], { type: 'application/json' }));
+    });
+})();
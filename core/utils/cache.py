@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+_AUSENTE = object()
+
+
+class TTLCache:
+    """Cache em memória, limitado em tamanho (LRU) e com expiração por entrada.
+
+    Chaves costumam ser tuplas cujo primeiro elemento é um namespace, o que
+    permite invalidar um grupo inteiro com ``invalidate(namespace)``.
+    ``hits``/``misses`` contam os acertos de ``get`` (veja ``stats()``).
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._dados.get(key, _AUSENTE)
+            if item is _AUSENTE:
+                self.misses += 1
+                return default
+            valor, expira_em = item
+            if expira_em <= time.monotonic():
+                del self._dados[key]
+                self.misses += 1
+                return default
+            self._dados.move_to_end(key)
+            self.hits += 1
+            return valor
+
+    def set(self, key, value, ttl=None):
+        expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._dados[key] = (value, expira_em)
+            self._dados.move_to_end(key)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+
+    def get_or_set(self, key, factory, ttl=None):
+        valor = self.get(key, _AUSENTE)
+        if valor is _AUSENTE:
+            valor = factory()
+            self.set(key, valor, ttl)
+        return valor
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._dados.pop(key, _AUSENTE)
+        return default if item is _AUSENTE else item[0]
+
+    def invalidate(self, namespace):
+        """Remove todas as chaves-tupla que começam com ``namespace``"""
+        with self._lock:
+            for key in [k for k in self._dados if isinstance(k, tuple) and k and k[0] == namespace]:
+                del self._dados[key]
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+    def stats(self):
+        consultas = self.hits + self.misses
+        return {
+            "tamanho": len(self._dados),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": round(self.hits / consultas, 3) if consultas else None,
+        }
+
+    def __len__(self):
+        return len(self._dados)
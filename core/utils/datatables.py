@@ -0,0 +1,164 @@
+"""Protocolo server-side do DataTables (draw, start, length, search, order).
+
+Filtro e ordenação vão para o SQL sobre colunas indexadas. A página é buscada
+com deferred join: primeiro só os ids (percorrendo o índice da ordenação),
+depois as colunas exibidas apenas dessas linhas. Os totais usam as contagens
+em cache de ``core.utils.pagination``.
+
+Avançar ou voltar uma página não usa ``OFFSET``: a resposta traz a chave
+(coluna da ordenação, id) da primeira e da última linha, e o cliente
+(``tabelaUtils.js``) a devolve em ``apos``/``antes``, como na paginação por
+chave de ``core.utils.pagination``; o custo não cresce com a página. Saltos
+para uma página qualquer ou ordenação por várias colunas caem no ``OFFSET``.
+"""
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from core.utils import pagination
+
+MAX_LENGTH = 100
+
+
+def _inteiro(args, nome, padrao):
+    try:
+        return int(args.get(nome, padrao))
+    except (TypeError, ValueError):
+        return padrao
+
+
+def escapar_like(termo):
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def encode_chave(coluna, valor, id):
+    decimal = isinstance(valor, Decimal)
+    payload = json.dumps(
+        [coluna, str(valor) if decimal else valor, id, decimal], separators=(",", ":")
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_chave(token):
+    """(coluna, valor, id) ou None se o token for inválido"""
+    if not token:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        coluna, valor, id, decimal = json.loads(payload)
+        if decimal:
+            valor = Decimal(valor)
+    except (binascii.Error, ValueError, TypeError, ArithmeticError):
+        return None
+    if not isinstance(id, int) or valor is None:
+        return None
+    return coluna, valor, id
+
+
+def parametros(args):
+    """(draw, start, length, busca, [(coluna, 'ASC'|'DESC'), ...]) da requisição"""
+    draw = _inteiro(args, "draw", 0)
+    start = max(0, _inteiro(args, "start", 0))
+    length = _inteiro(args, "length", 10)
+    if length < 1 or length > MAX_LENGTH:
+        length = MAX_LENGTH
+    busca = args.get("search[value]", "").strip()
+
+    ordem = []
+    i = 0
+    while f"order[{i}][column]" in args:
+        indice = args.get(f"order[{i}][column]")
+        coluna = args.get(f"columns[{indice}][data]")
+        direcao = "DESC" if args.get(f"order[{i}][dir]") == "desc" else "ASC"
+        ordem.append((coluna, direcao))
+        i += 1
+    return draw, start, length, busca, ordem
+
+
+def responder(cursor, args, tabela, colunas, ordenaveis,
+              where=(), params=(), ordem_padrao="nome", buscar=None):
+    """Monta a resposta JSON do DataTables para ``tabela``.
+
+    ``colunas`` é a lista do SELECT externo (sobre o alias ``t``);
+    ``ordenaveis`` mapeia o ``data`` de cada coluna do DataTables para a coluna
+    SQL (qualquer outra é ignorada); ``where``/``params`` são filtros fixos da
+    tela. ``buscar(termo)`` devolve o (sql, params) do campo de busca; sem ele a
+    busca é ignorada.
+    """
+    draw, start, length, busca, ordem = parametros(args)
+
+    where = list(where)
+    params = list(params)
+    base = f"FROM {tabela}"
+    total, _ = pagination.contar(cursor, tabela, base, where, params)
+
+    if busca and buscar:
+        condicao, condicao_params = buscar(busca)
+        where.append(condicao)
+        params.extend(condicao_params)
+        filtrados, _ = pagination.contar(cursor, tabela, base, where, params)
+    else:
+        filtrados = total
+
+    ordenacao = [(ordenaveis[c], d) for c, d in ordem if c in ordenaveis]
+    if not ordenacao:
+        ordenacao = [(ordem_padrao, "ASC")]
+    desempate = ordenacao[0][1]
+    order_by_t = ", ".join(f"t.{c} {d}" for c, d in ordenacao) + f", t.id {desempate}"
+
+    # Seek a partir da chave da página vizinha (só com uma coluna de ordenação)
+    coluna, direcao = ordenacao[0]
+    chave, para_tras = None, False
+    if len(ordenacao) == 1:
+        chave = decode_chave(args.get("apos"))
+        if chave is None:
+            chave, para_tras = decode_chave(args.get("antes")), True
+        if chave is not None and chave[0] != coluna:
+            chave = None
+
+    limite = "LIMIT %s OFFSET %s"
+    limite_params = [length, start]
+    if chave is not None:
+        crescente = (direcao == "ASC") != para_tras
+        operador = ">" if crescente else "<"
+        # NULL vem antes de qualquer valor na ordenação do MySQL
+        nulos = "" if crescente else f" OR {coluna} IS NULL"
+        where.append(f"({coluna} {operador} %s OR ({coluna} = %s AND id {operador} %s){nulos})")
+        params.extend([chave[1], chave[1], chave[2]])
+        if para_tras:
+            ordenacao = [(c, "DESC" if d == "ASC" else "ASC") for c, d in ordenacao]
+            desempate = ordenacao[0][1]
+        limite, limite_params = "LIMIT %s", [length]
+    order_by = ", ".join(f"{c} {d}" for c, d in ordenacao) + f", id {desempate}"
+
+    filtro_sql = (" WHERE " + " AND ".join(where)) if where else ""
+    cursor.execute(
+        f"""
+        SELECT {", ".join(colunas)}
+        FROM {tabela} t
+        JOIN (
+            SELECT id FROM {tabela}{filtro_sql}
+            ORDER BY {order_by}
+            {limite}
+        ) AS pagina ON pagina.id = t.id
+        ORDER BY {order_by_t}
+        """,
+        params + limite_params,
+    )
+    linhas = cursor.fetchall()
+
+    resposta = {
+        "draw": draw,
+        "recordsTotal": total,
+        "recordsFiltered": filtrados,
+        "data": linhas,
+    }
+    if len(ordenacao) == 1 and linhas:
+        # Linhas com a coluna NULL não servem de chave: a página vizinha usa OFFSET
+        resposta["chaves"] = {
+            nome: encode_chave(coluna, linha[coluna], linha["id"])
+            for nome, linha in (("primeiro", linhas[0]), ("ultimo", linhas[-1]))
+            if linha.get(coluna) is not None
+        }
+    return resposta
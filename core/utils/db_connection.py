@@ -1,9 +1,188 @@
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+
 import mysql.connector
+from mysql.connector.errors import PoolError
+from flask import current_app, g
+
+from core.utils.db_instrumentation import InstrumentedCursor
+
+
+class PooledConnection:
+    """Conexão emprestada do pool.
+
+    Repassa tudo para a conexão real do mysql.connector. ``close()`` devolve a
+    conexão ao pool em vez de encerrá-la; na conexão da requisição (scoped) ele
+    apenas fecha os cursores, pois a devolução acontece no teardown.
+    """
+
+    def __init__(self, pool, raw, created_at, scoped=False):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._scoped = scoped
+        self._cursors = []
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        self._cursors.append(cursor)
+        if self._pool.instrument:
+            return InstrumentedCursor(cursor, self._pool.slow_query_ms)
+        return cursor
+
+    def _close_cursors(self):
+        for cursor in self._cursors:
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass
+        self._cursors = []
+
+    def close(self):
+        if self._raw is None:
+            return
+        self._close_cursors()
+        if not self._scoped:
+            self.release()
+
+    def release(self):
+        """Devolve a conexão ao pool (idempotente)"""
+        if self._raw is None:
+            return
+        self._close_cursors()
+        raw, self._raw = self._raw, None
+        self._pool.checkin(raw, self._created_at)
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise mysql.connector.errors.OperationalError(
+                "Conexão já devolvida ao pool"
+            )
+        return getattr(self._raw, name)
+
+
+class ConnectionPool:
+    """Pool de conexões MySQL com tamanho fixo, overflow e reciclagem por idade.
+
+    Até ``pool_size`` conexões ficam ociosas aguardando reuso; em picos podem
+    ser abertas mais ``max_overflow`` conexões, que são encerradas ao voltar.
+    Conexões mais velhas que ``recycle`` segundos são descartadas no checkout.
+    """
+
+    def __init__(self, connect_args, pool_size=5, max_overflow=10, recycle=3600, timeout=30,
+                 instrument=True, slow_query_ms=None):
+        self.connect_args = connect_args
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.timeout = timeout
+        self.instrument = instrument
+        self.slow_query_ms = slow_query_ms
+        self._idle = LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size + max_overflow)
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except mysql.connector.Error:
+            pass
+
+    def _expired(self, created_at):
+        return self.recycle and time.monotonic() - created_at > self.recycle
+
+    def checkout(self, scoped=False):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError("Pool de conexões esgotado")
+
+        try:
+            while True:
+                try:
+                    raw, created_at = self._idle.get_nowait()
+                except Empty:
+                    raw = mysql.connector.connect(**self.connect_args)
+                    created_at = time.monotonic()
+                    break
+
+                if self._expired(created_at):
+                    self._discard(raw)
+                    continue
+                break
+        except Exception:
+            self._slots.release()
+            raise
+
+        return PooledConnection(self, raw, created_at, scoped=scoped)
+
+    def checkin(self, raw, created_at):
+        try:
+            # Não deixa estado pendente para o próximo usuário da conexão
+            if raw.unread_result:
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+            reusable = self._idle.qsize() < self.pool_size and not self._expired(created_at)
+        except mysql.connector.Error:
+            reusable = False
+
+        if reusable:
+            self._idle.put((raw, created_at))
+        else:
+            self._discard(raw)
+        self._slots.release()
+
+
+def get_pool(app=None):
+    app = app or current_app
+    return app.extensions["db_pool"]
+
 
 def get_db_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",
-        database="habitta"
-    )
\ No newline at end of file
+    """Retorna a conexão da requisição atual.
+
+    A primeira chamada em uma requisição faz o checkout de uma conexão do pool e
+    a guarda em ``g``; as demais (load_user, avatar, rota) reutilizam a mesma.
+    A devolução ao pool acontece em ``close_db_connection`` no teardown.
+    """
+    if "db_conn" not in g:
+        g.db_conn = get_pool().checkout(scoped=True)
+    return g.db_conn
+
+
+def close_db_connection(exception=None):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        conn.release()
+
+
+@contextmanager
+def pooled_connection(app=None):
+    """Conexão própria do pool para uso fora do ciclo da requisição"""
+    conn = get_pool(app).checkout()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def init_app(app):
+    """Cria o pool a partir da configuração do app e registra o teardown"""
+    app.extensions["db_pool"] = ConnectionPool(
+        {
+            "host": app.config["DB_HOST"],
+            "user": app.config["DB_USER"],
+            "password": app.config["DB_PASSWORD"],
+            "database": app.config["DB_NAME"],
+            # Cursores bufferizados evitam "Unread result found" na conexão
+            # compartilhada; exportações pedem buffered=False explicitamente.
+            "buffered": True,
+        },
+        pool_size=app.config["DB_POOL_SIZE"],
+        max_overflow=app.config["DB_POOL_MAX_OVERFLOW"],
+        recycle=app.config["DB_POOL_RECYCLE"],
+        timeout=app.config["DB_POOL_TIMEOUT"],
+        instrument=app.config["DB_INSTRUMENTATION"],
+        slow_query_ms=app.config["DB_SLOW_QUERY_MS"],
+    )
+    app.teardown_appcontext(close_db_connection)
@@ -0,0 +1,178 @@
+import logging
+import re
+import time
+from functools import lru_cache
+
+from flask import current_app, g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("core.slow_query")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Endpoint executou mais queries do que o orçamento permite"""
+
+
+_COMENTARIOS = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_PARAMETROS = re.compile(r"%\(\w+\)s|%s")
+_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTAS_IN = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_TUPLAS = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_ESPACOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Normaliza a SQL trocando literais e parâmetros por ``?``.
+
+    Queries que diferem apenas nos valores geram a mesma impressão digital,
+    o que permite agrupar o log por formato de query.
+    """
+    sql = _COMENTARIOS.sub(" ", sql)
+    sql = _STRINGS.sub("?", sql)
+    sql = _PARAMETROS.sub("?", sql)
+    sql = _NUMEROS.sub("?", sql)
+    sql = _LISTAS_IN.sub("IN (...)", sql)
+    sql = _TUPLAS.sub(r"\1, ...", sql)
+    return _ESPACOS.sub(" ", sql).strip()
+
+
+class QueryRecord:
+    __slots__ = ("fingerprint", "duration_ms", "rows")
+
+    def __init__(self, fingerprint, duration_ms, rows):
+        self.fingerprint = fingerprint
+        self.duration_ms = duration_ms
+        self.rows = rows
+
+    def as_dict(self):
+        return {
+            "fingerprint": self.fingerprint,
+            "duration_ms": round(self.duration_ms, 2),
+            "rows": self.rows,
+        }
+
+
+def get_query_log():
+    """Queries registradas na requisição atual (lista vazia fora de requisição)"""
+    if not has_request_context():
+        return []
+    if "query_log" not in g:
+        g.query_log = []
+    return g.query_log
+
+
+class InstrumentedCursor:
+    """Cursor que mede cada statement executado.
+
+    Registra impressão digital, duração e linhas de cada ``execute`` no log da
+    requisição e envia ao log de queries lentas o que passar de
+    ``DB_SLOW_QUERY_MS``. Todo o resto é repassado ao cursor original.
+    """
+
+    def __init__(self, cursor, slow_ms):
+        self._cursor = cursor
+        self._slow_ms = slow_ms
+        self._last = None
+
+    def _record(self, operation, started):
+        duration_ms = (time.perf_counter() - started) * 1000
+        record = QueryRecord(fingerprint(operation), duration_ms, max(self._cursor.rowcount, 0))
+        get_query_log().append(record)
+        self._last = record
+
+        if self._slow_ms is not None and duration_ms >= self._slow_ms:
+            slow_query_logger.warning(
+                "Query lenta (%.1f ms, %d linhas)%s: %s",
+                duration_ms,
+                record.rows,
+                f" em {request.endpoint}" if has_request_context() else "",
+                record.fingerprint,
+            )
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._record(operation, started)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._record(operation, started)
+
+    def _update_rows(self):
+        # Em cursores não bufferizados o rowcount só cresce conforme o fetch
+        if self._last is not None:
+            self._last.rows = max(self._cursor.rowcount, self._last.rows)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._update_rows()
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._update_rows()
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._update_rows()
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def query_budget(max_queries):
+    """Define quantas queries o endpoint pode executar por requisição"""
+    def decorator(f):
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+
+def _endpoint_budget(app):
+    view = app.view_functions.get(request.endpoint)
+    budget = getattr(view, "query_budget", None)
+    if budget is None:
+        budget = app.config["DB_QUERY_BUDGETS"].get(request.endpoint)
+    return budget
+
+
+def check_query_budget(response):
+    app = current_app._get_current_object()
+    query_log = get_query_log()
+
+    if query_log:
+        logger.debug(
+            "%s: %d queries, %.1f ms no banco",
+            request.endpoint,
+            len(query_log),
+            sum(q.duration_ms for q in query_log),
+        )
+
+    budget = _endpoint_budget(app)
+    if budget is not None and len(query_log) > budget:
+        message = (
+            f"{request.endpoint} executou {len(query_log)} queries "
+            f"(orçamento: {budget})"
+        )
+        # Em testes estourar o orçamento é falha; em produção só avisamos
+        if app.testing:
+            raise QueryBudgetExceeded(message)
+        logger.warning("%s: %s", message, [q.fingerprint for q in query_log])
+
+    return response
+
+
+def init_app(app):
+    app.after_request(check_query_budget)
@@ -1,49 +1,25 @@
-from functools import lru_cache
 import os
+from flask import current_app
 from werkzeug.utils import secure_filename
 import imghdr
 
 
+AVATAR_PADRAO = "assets/img/undraw_profile.svg"
+
+
 def configure_avatar_handler(flask_app):
     """Configura o handler de avatar no app"""
-    @lru_cache(maxsize=128)
-    def get_user_avatar(user_id):
-        try:
-            from core.utils.db_connection import get_db_connection
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT avatar FROM usuarios WHERE id = %s", (user_id,))
-            result = cursor.fetchone()
-            return result["avatar"] if result and result["avatar"] else "assets/img/undraw_profile.svg"
-        except Exception as e:
-            flask_app.logger.error(f"Erro ao buscar avatar: {str(e)}")
-            return "assets/img/undraw_profile.svg"
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
-            if 'conn' in locals():
-                conn.close()
-
     flask_app.jinja_env.globals.update(get_user_avatar=get_user_avatar)
 
-@lru_cache(maxsize=128)
 def get_user_avatar(user_id):
-    """Obtém o avatar do usuário com cache"""
+    """Obtém o avatar do usuário a partir do cache de usuários (core.models)"""
     try:
-        from core.utils.db_connection import get_db_connection
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT avatar FROM usuarios WHERE id = %s", (user_id,))
-        result = cursor.fetchone()
-        return result["avatar"] if result and result["avatar"] else "assets/img/undraw_profile.svg"
+        from core.models import load_user
+        user = load_user(user_id)
+        return user.avatar if user and user.avatar else AVATAR_PADRAO
     except Exception as e:
-        app.logger.error(f"Erro ao buscar avatar: {str(e)}")
-        return "assets/img/undraw_profile.svg"
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
+        current_app.logger.error(f"Erro ao buscar avatar: {str(e)}")
+        return AVATAR_PADRAO
 
 def validate_image(stream):
     """Valida o tipo real do arquivo de imagem"""
@@ -0,0 +1,161 @@
+"""Fila de e-mails de saída com envio em segundo plano.
+
+As rotas só chamam ``enfileirar(msg)``; uma thread do processo envia em lotes
+de até ``MAIL_BATCH_SIZE`` mensagens por conexão SMTP e reagenda as falhas com
+espera exponencial (``MAIL_RETRY_BACKOFF`` segundos, dobrando a cada falha) até
+``MAIL_MAX_RETRIES`` tentativas.
+
+``MAIL_BACKEND`` escolhe o destino:
+- ``smtp``: servidor configurado em MAIL_SERVER/MAIL_PORT (para testar offline,
+  aponte para um servidor de debug, ex.: ``python -m aiosmtpd -n -l localhost:1025``);
+- ``arquivo``: grava cada mensagem como .eml em ``MAIL_FILE_DIR``;
+- ``console``: escreve a mensagem no log.
+
+A fila é em memória: mensagens ainda não enviadas se perdem se o processo cair.
+"""
+import heapq
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+from core.extensions import mail
+
+logger = logging.getLogger(__name__)
+
+
+class ConexaoArquivo:
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+
+    def __enter__(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, msg):
+        conteudo = msg.as_string()
+        nome = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.eml"
+        with open(os.path.join(self.diretorio, nome), "w", encoding="utf-8") as arquivo:
+            arquivo.write(conteudo)
+
+
+class ConexaoConsole:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, msg):
+        logger.info("E-mail para %s:\n%s", ", ".join(msg.recipients), msg.as_string())
+
+
+class FilaEmails:
+    def __init__(self, app):
+        self.app = app
+        self.tamanho_lote = app.config["MAIL_BATCH_SIZE"]
+        self.max_tentativas = app.config["MAIL_MAX_RETRIES"]
+        self.backoff = app.config["MAIL_RETRY_BACKOFF"]
+        self._fila = queue.Queue(maxsize=app.config["MAIL_QUEUE_MAX"])
+        self._adiados = []  # heap (quando, seq, tentativa, msg); só a thread mexe
+        self._seq = itertools.count()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enfileirar(self, msg):
+        """Coloca a mensagem na fila; levanta queue.Full se estiver cheia"""
+        self._iniciar()
+        self._fila.put_nowait((0, msg))
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._executar, name="fila-emails", daemon=True
+                )
+                self._thread.start()
+
+    def _conectar(self):
+        backend = self.app.config["MAIL_BACKEND"]
+        if backend == "arquivo":
+            diretorio = self.app.config["MAIL_FILE_DIR"] or os.path.join(
+                self.app.instance_path, "emails"
+            )
+            return ConexaoArquivo(diretorio)
+        if backend == "console":
+            return ConexaoConsole()
+        return mail.connect()
+
+    def _proximo_lote(self):
+        agora = time.monotonic()
+        lote = []
+        while self._adiados and self._adiados[0][0] <= agora:
+            _, _, tentativa, msg = heapq.heappop(self._adiados)
+            lote.append((tentativa, msg))
+
+        espera = None
+        if self._adiados:
+            espera = max(0.0, self._adiados[0][0] - agora)
+        try:
+            lote.append(self._fila.get_nowait() if lote else self._fila.get(timeout=espera))
+        except queue.Empty:
+            pass
+
+        while len(lote) < self.tamanho_lote:
+            try:
+                lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _reagendar(self, tentativa, msg):
+        tentativa += 1
+        if tentativa >= self.max_tentativas:
+            logger.error(
+                "E-mail '%s' para %s descartado após %d tentativas",
+                msg.subject, ", ".join(msg.recipients), tentativa,
+            )
+            return
+        quando = time.monotonic() + self.backoff * 2 ** (tentativa - 1)
+        heapq.heappush(self._adiados, (quando, next(self._seq), tentativa, msg))
+
+    def _enviar_lote(self, lote):
+        pendentes = list(lote)
+        with self.app.app_context():
+            try:
+                # Uma conexão para o lote inteiro
+                with self._conectar() as conexao:
+                    while pendentes:
+                        tentativa, msg = pendentes[0]
+                        try:
+                            conexao.send(msg)
+                        except Exception:
+                            logger.exception("Falha ao enviar e-mail '%s'", msg.subject)
+                            self._reagendar(tentativa, msg)
+                        pendentes.pop(0)
+            except Exception:
+                logger.exception("Falha na conexão de envio de e-mails")
+                for tentativa, msg in pendentes:
+                    self._reagendar(tentativa, msg)
+
+    def _executar(self):
+        while True:
+            lote = self._proximo_lote()
+            if lote:
+                self._enviar_lote(lote)
+
+
+def enfileirar(msg):
+    current_app.extensions["mail_queue"].enfileirar(msg)
+
+
+def init_app(app):
+    app.extensions["mail_queue"] = FilaEmails(app)
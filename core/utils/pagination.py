@@ -0,0 +1,113 @@
+"""Paginação por chave (keyset/seek) ordenada por (nome, id).
+
+Em vez de ``LIMIT n OFFSET k``, cada página começa depois da última chave da
+anterior (``nome > x OR (nome = x AND id > y)``), então o custo não cresce com
+o número da página. As chaves viajam na URL como tokens opacos.
+"""
+import base64
+import binascii
+import json
+
+from flask import current_app
+
+from core.utils.cache import TTLCache
+
+contagens = TTLCache(maxsize=512)
+
+
+class Pagina:
+    def __init__(self, itens, proximo=None, anterior=None):
+        self.itens = itens
+        self.proximo = proximo
+        self.anterior = anterior
+
+
+def encode_cursor(nome, id, direcao="proximo"):
+    payload = json.dumps([nome, id, direcao], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """(nome, id, direcao) ou None se o token for inválido"""
+    if not token:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        nome, id, direcao = json.loads(payload)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if direcao not in ("proximo", "anterior") or not isinstance(id, int):
+        return None
+    return nome, id, direcao
+
+
+def paginar(cursor, select, base, where, params, token, per_page,
+            col_nome="nome", col_id="id"):
+    """Executa ``select + base`` com filtros e retorna uma ``Pagina``.
+
+    ``where`` é uma lista de condições combinadas com AND; as linhas precisam
+    ter as chaves ``nome`` e ``id``.
+    """
+    where = list(where)
+    params = list(params)
+    chave = decode_cursor(token)
+    direcao = chave[2] if chave else "proximo"
+
+    if chave:
+        operador = ">" if direcao == "proximo" else "<"
+        where.append(
+            f"({col_nome} {operador} %s OR ({col_nome} = %s AND {col_id} {operador} %s))"
+        )
+        params.extend([chave[0], chave[0], chave[1]])
+
+    ordem = "ASC" if direcao == "proximo" else "DESC"
+    sql = f"{select} {base}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {col_nome} {ordem}, {col_id} {ordem} LIMIT %s"
+
+    cursor.execute(sql, params + [per_page + 1])
+    itens = cursor.fetchall()
+    tem_mais = len(itens) > per_page
+    itens = itens[:per_page]
+    if direcao == "anterior":
+        itens.reverse()
+
+    if not itens:
+        return Pagina(itens)
+
+    primeiro, ultimo = itens[0], itens[-1]
+    ha_proxima = tem_mais if direcao == "proximo" else chave is not None
+    ha_anterior = chave is not None if direcao == "proximo" else tem_mais
+    return Pagina(
+        itens,
+        proximo=encode_cursor(ultimo["nome"], ultimo["id"]) if ha_proxima else None,
+        anterior=encode_cursor(primeiro["nome"], primeiro["id"], "anterior") if ha_anterior else None,
+    )
+
+
+def contar(cursor, namespace, base, where, params, exato=False):
+    """Total de linhas do filtro: (total, exato?).
+
+    Por padrão usa a contagem em cache (``PAGINATION_COUNT_TTL`` segundos);
+    ``exato=True`` sempre executa o COUNT(*).
+    """
+    sql = f"SELECT COUNT(*) AS total {base}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+
+    def executar():
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+        return row["total"] if isinstance(row, dict) else row[0]
+
+    chave = (namespace, sql, tuple(params))
+    if exato:
+        total = executar()
+        contagens.set(chave, total, current_app.config["PAGINATION_COUNT_TTL"])
+        return total, True
+    return contagens.get_or_set(chave, executar, current_app.config["PAGINATION_COUNT_TTL"]), False
+
+
+def invalidar_contagens(namespace):
+    contagens.invalidate(namespace)
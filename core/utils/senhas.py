@@ -0,0 +1,73 @@
+"""Hash e verificação de senhas fora da thread da requisição.
+
+O bcrypt roda em um pool de ``BCRYPT_WORKERS`` threads (a extensão libera o
+GIL durante o hash), então no máximo esse número de hashes consome CPU ao
+mesmo tempo; se a fila não andar em ``BCRYPT_QUEUE_TIMEOUT`` segundos a
+operação falha com ``HashingSobrecarregado`` em vez de empilhar requisições.
+
+O custo vem de ``BCRYPT_LOG_ROUNDS``. Hashes com custo abaixo dele ou acima de
+``BCRYPT_MAX_ROUNDS`` são refeitos no próximo login (``precisa_rehash``).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from core.extensions import bcrypt
+
+
+class HashingSobrecarregado(Exception):
+    """Fila de hashing cheia; a requisição deve ser recusada"""
+
+
+class HashPool:
+    def __init__(self, workers, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # Executando + esperando; além disso recusa em vez de enfileirar
+        self._vagas = threading.BoundedSemaphore(workers * 2)
+
+    def executar(self, funcao, *args):
+        if not self._vagas.acquire(timeout=self.timeout):
+            raise HashingSobrecarregado()
+        try:
+            return self._executor.submit(funcao, *args).result()
+        finally:
+            self._vagas.release()
+
+
+def _pool():
+    return current_app.extensions["hash_pool"]
+
+
+def custo(senha_hash):
+    """Custo (log rounds) de um hash bcrypt no formato $2b$12$..."""
+    try:
+        return int(senha_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def verificar(senha_hash, senha):
+    return _pool().executar(bcrypt.check_password_hash, senha_hash, senha)
+
+
+def gerar_hash(senha):
+    rounds = current_app.config["BCRYPT_LOG_ROUNDS"]
+    return _pool().executar(bcrypt.generate_password_hash, senha, rounds).decode("utf-8")
+
+
+def precisa_rehash(senha_hash):
+    atual = custo(senha_hash)
+    if atual is None:
+        return True
+    return (
+        atual < current_app.config["BCRYPT_LOG_ROUNDS"]
+        or atual > current_app.config["BCRYPT_MAX_ROUNDS"]
+    )
+
+
+def init_app(app):
+    app.extensions["hash_pool"] = HashPool(
+        app.config["BCRYPT_WORKERS"], app.config["BCRYPT_QUEUE_TIMEOUT"]
+    )
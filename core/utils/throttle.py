@@ -0,0 +1,94 @@
+"""Limite de tentativas de login e recuperação de senha, em memória.
+
+Cada chave (CPF, e-mail, IP) tem um token bucket: ``capacidade`` tentativas
+de uma vez, repostas à razão de ``capacidade / janela`` por segundo. O excesso
+é recusado antes de qualquer acesso ao banco ou ao bcrypt. As chaves ficam em
+um OrderedDict limitado a ``THROTTLE_MAX_KEYS``; as menos usadas saem primeiro.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, flash, make_response, render_template, request
+
+
+class Limitador:
+    def __init__(self, capacidade, janela, max_chaves=10000):
+        self.capacidade = capacidade
+        self.taxa = capacidade / janela
+        self.max_chaves = max_chaves
+        self._baldes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def permitir(self, chave):
+        """(permitido, segundos até a próxima tentativa)"""
+        agora = time.monotonic()
+        with self._lock:
+            tokens, atualizado_em = self._baldes.pop(chave, (self.capacidade, agora))
+            tokens = min(self.capacidade, tokens + (agora - atualizado_em) * self.taxa)
+            permitido = tokens >= 1
+            if permitido:
+                tokens -= 1
+            self._baldes[chave] = (tokens, agora)
+            while len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+        return permitido, 0 if permitido else int((1 - tokens) / self.taxa) + 1
+
+    def resetar(self, chave):
+        with self._lock:
+            self._baldes.pop(chave, None)
+
+
+def _limitador(app, tipo):
+    return app.extensions["throttle"][tipo]
+
+
+def _normalizar(tipo, valor):
+    valor = (valor or "").strip().lower()
+    if tipo == "cpf":
+        valor = valor.replace(".", "").replace("-", "")
+    return valor
+
+
+def resetar(tipo, valor):
+    """Zera o contador de uma chave (ex.: CPF após login bem-sucedido)"""
+    _limitador(current_app, tipo).resetar(_normalizar(tipo, valor))
+
+
+def limitar_tentativas(template, campos=()):
+    """Recusa POSTs acima do limite por IP e por cada campo do formulário.
+
+    ``campos`` são nomes de campos que também são tipos em THROTTLE_LIMITS
+    (``cpf``, ``email``); a resposta recusada renderiza ``template`` com 429.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method == "POST" and current_app.config["THROTTLE_ENABLED"]:
+                chaves = [("ip", request.remote_addr or "")]
+                for campo in campos:
+                    valor = _normalizar(campo, request.form.get(campo))
+                    if valor:
+                        chaves.append((campo, valor))
+
+                espera = 0
+                for tipo, valor in chaves:
+                    permitido, segundos = _limitador(current_app, tipo).permitir(valor)
+                    if not permitido:
+                        espera = max(espera, segundos)
+                if espera:
+                    flash(f"Muitas tentativas. Tente novamente em {espera} segundos.", "danger")
+                    response = make_response(render_template(template), 429)
+                    response.headers["Retry-After"] = str(espera)
+                    return response
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def init_app(app):
+    app.extensions["throttle"] = {
+        tipo: Limitador(capacidade, janela, app.config["THROTTLE_MAX_KEYS"])
+        for tipo, (capacidade, janela) in app.config["THROTTLE_LIMITS"].items()
+    }
@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+def bump_version(cursor, *nomes):
+    """Incrementa a versão dos conjuntos de dados (mesma transação da escrita)"""
+    for nome in nomes:
+        cursor.execute(
+            """
+            INSERT INTO versoes_dados (nome, versao) VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE versao = versao + 1
+            """,
+            (nome,),
+        )
+
+
+def get_versions(cursor, *nomes):
+    """Retorna {nome: versao}; conjuntos nunca alterados ficam com versão 0"""
+    placeholders = ", ".join(["%s"] * len(nomes))
+    cursor.execute(
+        f"SELECT nome, versao FROM versoes_dados WHERE nome IN ({placeholders})",
+        nomes,
+    )
+    versoes = {nome: 0 for nome in nomes}
+    for row in cursor.fetchall():
+        nome, versao = (row["nome"], row["versao"]) if isinstance(row, dict) else row
+        versoes[nome] = versao
+    return versoes
+
+
+def get_version(cursor, nome):
+    return get_versions(cursor, nome)[nome]
+
+
+class VersionedCache:
+    """Estrutura em memória reconstruída quando a versão dos dados muda.
+
+    Subclasses implementam ``carregar(cursor)``, que recebe um cursor de
+    dicionário. ``atualizar(conn)`` consulta ``versoes_dados`` no máximo a cada
+    ``intervalo`` segundos e recarrega se algum dos conjuntos observados mudou;
+    ``invalidar()`` força a recarga na próxima chamada (usado pelo worker que
+    fez a escrita); ``atualizar(conn, forcar=True)`` confere a versão sem
+    esperar o intervalo.
+    """
+
+    def __init__(self, *nomes, intervalo=5.0):
+        self.nomes = nomes
+        self.intervalo = intervalo
+        self.versoes = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+
+    def carregar(self, cursor):
+        raise NotImplementedError
+
+    def invalidar(self):
+        self.versoes = None
+
+    def atualizar(self, conn, forcar=False):
+        agora = time.monotonic()
+        if (not forcar and self.versoes is not None
+                and agora - self._verificado_em < self.intervalo):
+            return self
+
+        with self._lock:
+            cursor = conn.cursor(dictionary=True)
+            versoes = get_versions(cursor, *self.nomes)
+            if versoes != self.versoes:
+                self.carregar(cursor)
+                self.versoes = versoes
+            self._verificado_em = agora
+        return self
@@ -0,0 +1,7 @@
+-- Versão por conjunto de dados; cada escrita incrementa a versão da tabela
+-- afetada para que os caches em memória dos workers saibam quando recarregar.
+CREATE TABLE IF NOT EXISTS versoes_dados (
+    nome VARCHAR(64) NOT NULL PRIMARY KEY,
+    versao BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
@@ -0,0 +1,31 @@
+-- Resumo por cliente usado na listagem de recomendações: quantos imóveis
+-- compatíveis (tipo, bairro, faixa_min <= renda) e quantas recomendações.
+-- Mantido incrementalmente pelas rotas de escrita (core/services/client_stats.py);
+-- `flask estatisticas reconstruir` refaz a tabela inteira.
+CREATE TABLE IF NOT EXISTS client_offer_stats (
+    cliente_id INT NOT NULL PRIMARY KEY,
+    total_ofertas INT UNSIGNED NOT NULL DEFAULT 0,
+    total_recomendacoes INT UNSIGNED NOT NULL DEFAULT 0,
+    calculado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_cos_recomendacoes_ofertas (total_recomendacoes, total_ofertas),
+    KEY idx_cos_ofertas (total_ofertas),
+    CONSTRAINT fk_cos_cliente FOREIGN KEY (cliente_id) REFERENCES clientes (id) ON DELETE CASCADE
+);
+
+-- Índices usados para achar os clientes afetados por uma escrita em estabelecimentos
+CREATE INDEX idx_clientes_interesse ON clientes (interesse_tipo, interesse_bairro, renda_mensal);
+CREATE INDEX idx_estabelecimentos_match ON estabelecimentos (tipo, bairro, faixa_min);
+CREATE INDEX idx_recomendacoes_cliente ON recomendacoes (cliente_id);
+
+-- Carga inicial
+INSERT INTO client_offer_stats (cliente_id, total_ofertas, total_recomendacoes, calculado_em)
+SELECT
+    c.id,
+    (SELECT COUNT(*) FROM estabelecimentos e
+      WHERE e.tipo = c.interesse_tipo
+        AND e.bairro = c.interesse_bairro
+        AND e.faixa_min <= c.renda_mensal),
+    (SELECT COUNT(*) FROM recomendacoes r WHERE r.cliente_id = c.id),
+    CURRENT_TIMESTAMP
+FROM clientes c
+ON DUPLICATE KEY UPDATE cliente_id = cliente_id;
@@ -0,0 +1,5 @@
+-- Paginação por chave das listagens de clientes e recomendações:
+-- ORDER BY nome, id com seek em (nome, id) usa estes índices em vez de
+-- ordenar a tabela inteira a cada página.
+CREATE INDEX idx_clientes_nome_id ON clientes (nome, id);
+CREATE INDEX idx_clientes_status_nome_id ON clientes (status, nome, id);
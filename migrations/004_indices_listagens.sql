@@ -0,0 +1,10 @@
+-- Ordenação e busca por prefixo das tabelas server-side (DataTables) de
+-- clientes e estabelecimentos; o id no fim serve de desempate e deixa o
+-- índice cobrir a subconsulta que pagina só os ids.
+CREATE INDEX idx_clientes_tipo_id ON clientes (interesse_tipo, id);
+CREATE INDEX idx_clientes_bairro_id ON clientes (interesse_bairro, id);
+CREATE INDEX idx_clientes_renda_id ON clientes (renda_mensal, id);
+CREATE INDEX idx_estabelecimentos_nome_id ON estabelecimentos (nome, id);
+CREATE INDEX idx_estabelecimentos_tipo_id ON estabelecimentos (tipo, id);
+CREATE INDEX idx_estabelecimentos_bairro_id ON estabelecimentos (bairro, id);
+CREATE INDEX idx_estabelecimentos_faixa_id ON estabelecimentos (faixa_min, id);
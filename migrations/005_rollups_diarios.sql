@@ -0,0 +1,20 @@
+-- Contagens diárias para os gráficos do dashboard. Cada linha é
+-- (métrica, dia, chave) -> total; a chave é o status ou o tipo de
+-- estabelecimento, ou '' nas métricas sem quebra.
+-- Mantida por core/services/rollups.py: os últimos dias são refeitos sob
+-- demanda e `flask estatisticas rollups --tudo` refaz o histórico inteiro.
+CREATE TABLE IF NOT EXISTS rollup_diario (
+    metrica VARCHAR(32) NOT NULL,
+    dia DATE NOT NULL,
+    chave VARCHAR(64) NOT NULL DEFAULT '',
+    total INT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (metrica, dia, chave)
+);
+
+-- Data de cadastro dos clientes (os já existentes ficam com a data da migração)
+ALTER TABLE clientes
+    ADD COLUMN criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- Recontagem dos dias recentes sem varrer as tabelas
+CREATE INDEX idx_clientes_criado_em ON clientes (criado_em);
+CREATE INDEX idx_recomendacoes_data ON recomendacoes (data);
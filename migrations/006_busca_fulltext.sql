@@ -0,0 +1,17 @@
+-- Busca textual de clientes e imóveis (core/services/busca.py).
+-- O parser ngram quebra o texto em pedaços de ngram_token_size caracteres
+-- (padrão 2), então trechos no meio do nome, e-mail ou telefone também são
+-- encontrados pelo índice, sem o LIKE '%...%' que varria a tabela.
+-- O índice é mantido pelo próprio MySQL a cada INSERT/UPDATE.
+--
+-- Stopwords desligadas: com a lista padrão (inglês: a, i, de, la, an, as,
+-- is...) o ngram descarta todo pedaço que contém uma delas, e a maior parte
+-- dos bigramas de nomes em português ("ma", "ia", "an", "de") nunca entraria
+-- no índice. A configuração vale no momento em que o índice é criado ou
+-- reconstruído, por isso o servidor deve rodar com
+-- innodb_ft_enable_stopword = OFF (my.cnf); o SET GLOBAL exige
+-- SYSTEM_VARIABLES_ADMIN e o SET SESSION cobre esta migração.
+SET GLOBAL innodb_ft_enable_stopword = OFF;
+SET SESSION innodb_ft_enable_stopword = OFF;
+CREATE FULLTEXT INDEX ft_clientes_busca ON clientes (nome, email, telefone) WITH PARSER ngram;
+CREATE FULLTEXT INDEX ft_estabelecimentos_busca ON estabelecimentos (nome, bairro) WITH PARSER ngram;
@@ -0,0 +1,23 @@
+-- Geração de recomendações em lote (core/services/recomendacoes_lote.py).
+-- Cada execução tem uma linha aqui; ultimo_cliente_id é gravado na mesma
+-- transação de cada bloco, então uma execução interrompida continua do
+-- último bloco confirmado.
+CREATE TABLE IF NOT EXISTS recomendacoes_lotes (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    status VARCHAR(16) NOT NULL DEFAULT 'executando',
+    ultimo_cliente_id INT NOT NULL DEFAULT 0,
+    clientes_processados INT UNSIGNED NOT NULL DEFAULT 0,
+    recomendacoes_criadas INT UNSIGNED NOT NULL DEFAULT 0,
+    erro TEXT NULL,
+    iniciado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    concluido_em TIMESTAMP NULL
+);
+
+-- Recomendações criadas por um lote (NULL nas criadas pela tela)
+ALTER TABLE recomendacoes
+    ADD COLUMN lote_id INT NULL,
+    ADD KEY idx_recomendacoes_lote (lote_id, cliente_id);
+
+-- Percorre os clientes ativos em ordem de id
+CREATE INDEX idx_clientes_status_id ON clientes (status, id);
@@ -0,0 +1,10 @@
+-- Clientes cuja compatibilidade mudou por uma escrita em estabelecimentos e
+-- que aguardam a atualização das recomendações geradas automaticamente.
+-- Preenchida pelo índice reverso (core/services/indice_clientes.py) e
+-- consumida por core/services/recomendacoes_lote.py.
+CREATE TABLE IF NOT EXISTS recomendacoes_pendentes (
+    cliente_id INT NOT NULL PRIMARY KEY,
+    enfileirado_em TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    KEY idx_rp_enfileirado (enfileirado_em),
+    CONSTRAINT fk_rp_cliente FOREIGN KEY (cliente_id) REFERENCES clientes (id) ON DELETE CASCADE
+);
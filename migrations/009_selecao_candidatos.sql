@@ -0,0 +1,4 @@
+-- Seleção manual de imóveis (recomendacoes.cliente?modo=selecionar): os
+-- candidatos vêm filtrados por tipo e bairro e paginados por (nome, id); com
+-- este índice o seek da página sai direto dele, sem ordenar o filtro inteiro.
+CREATE INDEX idx_estabelecimentos_tipo_bairro_nome_id ON estabelecimentos (tipo, bairro, nome, id);
@@ -0,0 +1,8 @@
+-- Busca de clientes também pelo bairro de interesse (core/services/busca.py):
+-- o índice FULLTEXT ngram passa a cobrir interesse_bairro, que antes só era
+-- buscado por LIKE na listagem.
+-- Recriado sem stopwords, como em 006 (senão bigramas como "de" e "ma" somem).
+SET GLOBAL innodb_ft_enable_stopword = OFF;
+SET SESSION innodb_ft_enable_stopword = OFF;
+DROP INDEX ft_clientes_busca ON clientes;
+CREATE FULLTEXT INDEX ft_clientes_busca ON clientes (nome, email, telefone, interesse_bairro) WITH PARSER ngram;